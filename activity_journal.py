@@ -0,0 +1,173 @@
+import sqlite3
+import threading
+import time
+from state_store import StateStore
+from metrics import histogram
+
+WRITE_SECONDS = histogram("state_write_seconds", "Duration of one state database write transaction")
+
+FSYNC_POLICIES = {
+    # fsync policy -> SQLite synchronous mode
+    "always": "FULL",     # every flushed transaction is durable
+    "compact": "NORMAL",  # durable at WAL checkpoints; a crash can lose the last transactions
+    "never": "OFF",
+}
+
+
+class ActivityJournal:
+    """Write-behind log of file activity into the state database.
+
+    Touches and session rotations are queued in memory, in order, and a
+    background writer applies each batch as one short transaction on a
+    size/time policy. Repeated touches of a path within a batch collapse
+    into a single upsert, so the write cost follows the batch, not the
+    session size.
+    """
+
+    def __init__(self, store=None, flush_interval=1.0, flush_size=64, fsync="compact", max_entries=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync policy must be one of {tuple(FSYNC_POLICIES)}, got {fsync!r}")
+        self.store = store or StateStore(synchronous=FSYNC_POLICIES[fsync])
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self.max_entries = max_entries
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._writer = None
+        self._stopping = False
+
+        self.started_at = time.monotonic()
+        self.records_appended = 0
+        self.records_written = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.bytes_written = 0
+
+    def load(self):
+        """Rebuild the session stores from the database."""
+        return self.store.load_sessions(self.max_entries)
+
+    def start(self):
+        """Start the background writer."""
+        self._stopping = False
+        self._writer = threading.Thread(target=self._run, name="ActivityJournalWriter", daemon=True)
+        self._writer.start()
+
+    def append(self, file_path, touched_at):
+        """Queue one touch record (epoch seconds); never blocks on disk I/O."""
+        self.append_many([(file_path, touched_at)])
+
+    def append_many(self, records):
+        """Queue several (file_path, touched_at) records under one lock acquisition."""
+        with self._cond:
+            self._pending.extend(("touch", path, touched_at) for path, touched_at in records)
+            self.records_appended += len(records)
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify()
+
+    def append_rotation(self, replace):
+        """Queue a session rotation; touches queued before it land in the old session."""
+        with self._cond:
+            self._pending.append(("rotate", replace, None))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.flush_size:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing activity journal: {e}")
+            if stopping:
+                return
+
+    def flush(self):
+        """Apply all pending records in a single transaction.
+
+        If the transaction fails (a locked database, a full disk) the batch
+        goes back to the head of the queue and the error is raised; the next
+        flush retries it.
+        """
+        # The batch is taken under the I/O lock so concurrent flushers apply batches in order
+        with self._io_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                touches, rows, rotations = self._apply(batch)
+            except sqlite3.Error:
+                with self._cond:
+                    self._pending[:0] = batch
+                raise
+            self.records_written += touches
+            self.rows_written += rows
+            self.rotations += rotations
+            self.flushes += 1
+            # Row payload estimate: path plus three integers and the session key
+            self.bytes_written += sum(len(first) + 40 for kind, first, _ in batch if kind == "touch")
+
+    def _apply(self, batch):
+        """Write one batch in a transaction; returns (touches, rows, rotations)."""
+        touches = 0
+        rows = 0
+        rotations = 0
+        started = time.perf_counter()
+        with self.store.transaction() as conn:
+            aggregated = {}
+            for kind, first, second in batch:
+                if kind == "touch":
+                    entry = aggregated.get(first)
+                    if entry is None:
+                        aggregated[first] = [second, second, 1]
+                    else:
+                        entry[0] = min(entry[0], second)
+                        entry[1] = max(entry[1], second)
+                        entry[2] += 1
+                    touches += 1
+                    continue
+                self.store.record_touches(conn, aggregated)
+                rows += len(aggregated)
+                aggregated = {}
+                self.store.rotate_sessions(conn, replace=first)
+                rotations += 1
+            self.store.record_touches(conn, aggregated)
+            rows += len(aggregated)
+        WRITE_SECONDS.observe(time.perf_counter() - started, writer="journal")
+        return touches, rows, rotations
+
+    def compact(self):
+        """Flush, then fold the WAL back into the database file."""
+        self.flush()
+        with self._io_lock:
+            self.store.checkpoint()
+
+    def close(self):
+        """Stop the writer after a final flush."""
+        if self._writer:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._writer.join()
+            self._writer = None
+        else:
+            self.flush()
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "records_appended": self.records_appended,
+            "records_written": self.records_written,
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "bytes_written": self.bytes_written,
+            "writes_per_sec": self.records_written / elapsed,
+        }
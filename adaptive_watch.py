@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from watchdog.events import FileSystemEventHandler
+from snapshot_index import IncrementalPoller
+from watch_roots import normalize
+from metrics import counter, gauge
+
+# Native watches an adaptive root may hold at once
+ADAPTIVE_MAX_WATCHES = 4096
+# A hot directory without a tracked event for this long goes back to sampling
+ADAPTIVE_COOL_AFTER = 600.0
+
+ADAPTIVE_WATCHES = gauge("tracker_adaptive_watches", "Native watches held on hot directories, by root")
+PROMOTIONS = counter("tracker_adaptive_promotions_total", "Directories given a native watch after sampled activity")
+DEMOTIONS = counter("tracker_adaptive_demotions_total", "Hot directories handed back to sampling")
+EVENTS_SAMPLED = counter("tracker_adaptive_sampled_total", "Changes found by stat passes instead of a native watch")
+
+
+class HotDirectoryHandler(FileSystemEventHandler):
+    """Front of the tracker handler on hot directories: notes tracked activity, then forwards."""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_modified(self, event):
+        self.forward(event, self.watcher.handler.on_modified)
+
+    def on_created(self, event):
+        self.forward(event, self.watcher.handler.on_created)
+
+    def forward(self, event, deliver):
+        self.watcher.root.events += 1
+        if not event.is_directory and self.watcher.root.matcher.matches(event.src_path):
+            self.watcher.touch(os.path.dirname(event.src_path))
+        deliver(event)
+
+
+class AdaptiveWatcher(IncrementalPoller):
+    """Native watches only where tracked files change; stat passes everywhere else.
+
+    The whole root is sampled with the incremental snapshot poller, which
+    costs one stat per unchanged directory plus one per tracked file in
+    it. A directory where a pass finds a tracked change is promoted to a
+    non-recursive native watch, so its next events arrive at once. A hot
+    directory with no tracked event for cool_after seconds is demoted, as
+    is the least recently active one when max_watches is reached. Changes
+    in hot directories found by a pass were delivered natively and are
+    dropped, so a write is never counted twice.
+
+    Sampled changes arrive up to one interval late, and repeated writes
+    between two passes count once; sampled and sample_delay report how
+    much activity went that way.
+    """
+
+    def __init__(self, root, handler, observer, interval=30.0, max_watches=ADAPTIVE_MAX_WATCHES,
+                 cool_after=ADAPTIVE_COOL_AFTER, state_dir="."):
+        super().__init__(root, handler, interval, state_dir)
+        self.observer = observer
+        self.max_watches = max_watches
+        self.cool_after = cool_after
+        self.front = HotDirectoryHandler(self)
+        # normalized directory -> [watch, last tracked activity]
+        self.hot = {}
+        self._lock = threading.Lock()
+
+        self.promotions = 0
+        self.demotions = 0
+        self.sampled = 0
+        self.sample_delay = 0.0
+        self.max_sample_delay = 0.0
+
+    def touch(self, directory):
+        with self._lock:
+            entry = self.hot.get(normalize(directory))
+            if entry is not None:
+                entry[1] = time.monotonic()
+
+    def deliver(self, events):
+        now = time.time()
+        promote = {}
+        for _kind, path in events:
+            directory = os.path.dirname(path)
+            key = normalize(directory)
+            if key in self.hot:
+                continue
+            self.root.events += 1
+            self.handler.dispatch_path(path)
+            self.sampled += 1
+            EVENTS_SAMPLED.inc()
+            try:
+                # How late the stat pass was compared with a native event
+                delay = max(now - os.stat(path).st_mtime, 0.0)
+            except OSError:
+                delay = 0.0
+            self.sample_delay += delay
+            self.max_sample_delay = max(self.max_sample_delay, delay)
+            promote[key] = directory
+        for key, directory in promote.items():
+            self.promote(key, directory)
+        self.demote_cold()
+
+    def promote(self, key, directory):
+        with self._lock:
+            if key in self.hot:
+                return
+            if len(self.hot) >= self.max_watches:
+                coldest = min(self.hot, key=lambda hot_key: self.hot[hot_key][1])
+                self._unschedule(coldest)
+        try:
+            watch = self.observer.schedule(self.front, directory, recursive=False)
+        except (OSError, RuntimeError) as e:
+            # Out of watches, or the directory is gone: it stays sampled
+            print(f"Could not watch {directory}, sampling it instead: {e}")
+            return
+        with self._lock:
+            self.hot[key] = [watch, time.monotonic()]
+            self.promotions += 1
+            self._update_watches()
+        PROMOTIONS.inc()
+
+    def demote_cold(self):
+        cutoff = time.monotonic() - self.cool_after
+        with self._lock:
+            for key in [key for key, (_watch, active) in self.hot.items() if active < cutoff]:
+                self._unschedule(key)
+
+    def _unschedule(self, key):
+        # Called with the lock held
+        watch = self.hot.pop(key)[0]
+        try:
+            self.observer.unschedule(watch)
+        except (KeyError, OSError):
+            pass
+        self.demotions += 1
+        DEMOTIONS.inc()
+        self._update_watches()
+
+    def _update_watches(self):
+        self.root.watches = [(entry[0].path, False) for entry in self.hot.values()]
+        ADAPTIVE_WATCHES.set(len(self.hot), root=self.root.path)
+
+    def stop(self):
+        super().stop()
+        # The observer is stopped with the tracker; its watches go with it
+        with self._lock:
+            self.hot.clear()
+            self._update_watches()
+
+    def adaptive_stats(self):
+        return {
+            "watches": len(self.hot),
+            "promotions": self.promotions,
+            "demotions": self.demotions,
+            "sampled": self.sampled,
+            "mean_sample_delay": self.sample_delay / self.sampled if self.sampled else 0.0,
+            "max_sample_delay": self.max_sample_delay,
+        }
@@ -1,10 +1,12 @@
 import sys
-import json
-import random
+import argparse
+import sqlite3
+import threading
+import time
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton, QCheckBox, QMessageBox
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QObject, QEvent, pyqtSignal
 from win32gui import GetForegroundWindow
 from win32process import GetWindowThreadProcessId
 import win32con
@@ -15,56 +17,76 @@ import ntsecuritycon
 import pythoncom
 import pyWinhook as pyhook
 import os
-
-def load_files_during_sleep():
-    # Load files accessed during the last session.
-    try:
-        with open("file_activity.json", "r") as activity_file:
-            tracked_files = json.load(activity_file)
-
-        # Return files from the previous session
-        return list(tracked_files.get("previous_session", {}).keys())
-    except (FileNotFoundError, KeyError, ValueError) as e:
-        print(f"Error loading files during sleep: {e}")
-        return []
-
-def get_incorrect_files():
-    # Get a pool of realistic and believable incorrect file names for an enterprise environment.
-    return [
-        "project_plan_v2.docx",           # Project documentation
-        "api_integration_guide.pdf",      # API documentation
-        "style_guide_v1.css",             # Company style guide
-        "deployment_config.yaml",         # Deployment configuration file
-        "test_suite_results.json",        # Test results
-        "user_auth_handler.py",           # Authentication handler script
-        "error_tracking_service.js",      # Error tracking service script
-        "database_migration.sql",         # Database migration script
-        "dashboard_component.jsx",        # Frontend dashboard component
-        "employee_directory.xlsx",        # Employee directory spreadsheet
-        "meeting_notes_2024-12-15.md",    # Meeting notes markdown file
-        "module_registry.xml",            # Module registry file
-        "team_collaboration_roadmap.pptx",# Team collaboration roadmap
-        "performance_report_2024.pdf",    # Performance report
-        "client_project_overview.html",   # Client project overview webpage
-        "feature_toggle_flags.json",      # Feature toggle configuration
-        "staging_environment.log",        # Staging environment log file
-        "qa_checklist_latest.xlsx",       # QA checklist
-        "access_logs_2024-12-20.txt",     # Access logs
-        "legacy_codebase_review.docx"     # Review document for legacy code
-    ]
+from state_store import StateStore, open_user_store
+from challenge import CORRECT_COUNT, DECOY_COUNT, build_challenge, next_challenge
+from hit_test import MouseFilter
+from scheduler import AdaptiveScheduler
+from metrics import counter, histogram, start_exporter
+
+# 3 correct plus 3 incorrect files
+CHALLENGE_SIZE = CORRECT_COUNT + DECOY_COUNT
+AUTH_ATTEMPTS = counter("auth_attempts_total", "Challenge submissions, by result")
+FIRST_FRAME = histogram("auth_resume_to_first_frame_seconds", "Resume until the challenge was first painted")
+CHALLENGE_TO_UNLOCK = histogram("auth_challenge_to_unlock_seconds", "Challenge shown until answered correctly")
+
+# Child widget events that move the clickable areas on screen
+GEOMETRY_EVENTS = (QEvent.Move, QEvent.Resize, QEvent.Show, QEvent.Hide)
+
+class StandbyChannel(QObject):
+    """Reads supervisor commands from stdin on a helper thread and hands them to the GUI thread."""
+    show_requested = pyqtSignal(float)
+    closed = pyqtSignal()
+
+    def listen(self):
+        threading.Thread(target=self._read, name="StandbyChannel", daemon=True).start()
+
+    def _read(self):
+        for line in sys.stdin:
+            parts = line.split()
+            if parts and parts[0] == "show":
+                self.show_requested.emit(float(parts[1]) if len(parts) > 1 else time.time())
+        self.closed.emit()
 
 class AuthenticationApp(QWidget):
-    def __init__(self):
+    def __init__(self, standby=False, resumed_at=None):
         super().__init__()
         self.hm = pyhook.HookManager()
-        self.block_input_timer = None
+        # Focus enforcement and desktop checks share one backing-off timer
+        self.scheduler = AdaptiveScheduler(parent=self)
         self.auth_successful = False
         self.secure_desktop = None
         self.original_desktop = None
         self.mouse_position = None  # Store initial mouse position
+        # On a shared host the tracker keeps each user's sessions in their own database
+        self.partitioned = os.environ.get("TRACKER_PARTITION_BY_USER") == "1"
+        self.state_store = None  # Opened by load_challenge()
+        self.mouse_filter = MouseFilter(self.clickable_centres)
+        self.activated = False
+        self.activated_at = None
+        self.resumed_at = None  # Wall-clock resume time, reported at the first paint
         self.initUI()
+        # A standby app stays hidden, without hooks, until activate()
+        if not standby:
+            self.activate(resumed_at)
+
+    def activate(self, resumed_at=None):
+        # Load the challenge, lock the session down and show the window
+        if self.activated:
+            return
+        self.activated = True
+        self.activated_at = time.monotonic()
+        self.resumed_at = resumed_at
+        self.load_challenge()
         self.makeSecure()
         self.setupSecureDesktop()
+        self.show()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.resumed_at is not None:
+            FIRST_FRAME.observe(max(time.time() - self.resumed_at, 0.0))
+            print(f"[Auth] First frame painted {(time.time() - self.resumed_at) * 1000:.1f} ms after resume", flush=True)
+            self.resumed_at = None
 
 
     def setupSecureDesktop(self):
@@ -127,10 +149,8 @@ class AuthenticationApp(QWidget):
             )
             win32api.RegCloseKey(key)
 
-            # Set up a watchdog timer to detect desktop switches
-            self.watchdog = QTimer(self)
-            self.watchdog.timeout.connect(self.checkDesktopState)
-            self.watchdog.start(100)
+            # Also watch for desktop switches
+            self.scheduler.add(self.checkDesktopState)
 
         except Exception as e:
             print(f"Error setting up fallback protection: {e}")
@@ -143,8 +163,10 @@ class AuthenticationApp(QWidget):
                 # Force back to our window
                 self.activateWindow()
                 self.raise_()
+                return True
         except Exception:
             pass
+        return False
 
     def initUI(self):
         # Set window properties to be always on top and full screen
@@ -174,16 +196,10 @@ class AuthenticationApp(QWidget):
         self.label.setStyleSheet("color: white; font-size: 14px; font-weight: bold;")
         content_layout.addWidget(self.label)
 
-        self.recent_files = load_files_during_sleep()
-        if not self.recent_files:  # Add some dummy files if none are loaded
-            self.recent_files = ["document1.txt", "document2.txt", "document3.txt"]
-        self.correct_files = self.get_random_correct_files()
-        self.challenge_files = self.generate_challenge_files()
-
-        # Create checkboxes with proper styling
+        # Create checkboxes with proper styling; load_challenge() fills in the names
         self.checkboxes = []
-        for file in self.challenge_files:
-            checkbox = QCheckBox(file)
+        for _ in range(CHALLENGE_SIZE):
+            checkbox = QCheckBox()
             checkbox.setStyleSheet("""
                 QCheckBox {
                     color: white;
@@ -216,6 +232,8 @@ class AuthenticationApp(QWidget):
             }
         """)
         self.submit_btn.clicked.connect(self.verify)
+        for widget in [self.submit_btn] + self.checkboxes:
+            widget.installEventFilter(self)
         content_layout.addWidget(self.submit_btn, alignment=Qt.AlignCenter)
 
         # Center the content widget in the main layout
@@ -226,11 +244,35 @@ class AuthenticationApp(QWidget):
         self.setStyleSheet("background-color: rgba(0, 0, 0, 180);")
         content_widget.setStyleSheet("background-color: rgba(40, 40, 40, 200); padding: 30px; border-radius: 10px;")
 
+    def load_challenge(self):
+        # Looked up on every load: a standby app can start before the tracker
+        # has created this user's database (a fresh partitioned install)
+        if self.state_store is not None:
+            self.state_store.close()
+        self.state_store = open_user_store(partitioned=self.partitioned) or StateStore()
+        # Normally precomputed at suspend; only built here if none was stored
+        try:
+            payload = next_challenge(self.state_store)
+        except sqlite3.Error as e:
+            print(f"Error loading challenge: {e}")
+            payload = build_challenge([])
+        self.correct_files = payload["correct"]
+        self.challenge_files = payload["choices"]
+        for i, checkbox in enumerate(self.checkboxes):
+            checkbox.setChecked(False)
+            if i < len(self.challenge_files):
+                checkbox.setText(self.challenge_files[i])
+                checkbox.show()
+            else:
+                checkbox.hide()
+
     def makeSecure(self):
         # Start timer to enforce focus
-        self.block_input_timer = QTimer(self)
-        self.block_input_timer.timeout.connect(self.enforce_focus)
-        self.block_input_timer.start(100)  # Check every 100ms
+        # Checked every 100ms at first, backing off to 2s while focus holds;
+        # activation changes bring the checks back immediately
+        self.scheduler.add(self.enforce_focus)
+        self.scheduler.start()
+        QApplication.instance().focusChanged.connect(lambda old, new: self.scheduler.poke())
         
         # Set up keyboard hook
         self.hm.KeyDown = self.on_keyboard_event
@@ -247,38 +289,35 @@ class AuthenticationApp(QWidget):
         self.mouse_position = cursor_pos
 
     def on_mouse_event(self, event):
-        # Handle all mouse events including trackpad gestures
-        if not self.auth_successful:
-            # Get the current cursor position
-            current_pos = win32gui.GetCursorPos()
-            
-            # Allow mouse movement only within a small radius of the submit button
-            # and only for left click events
-            if event.MessageName == "mouse_left_down":
-                # Get the global position of the submit button
-                btn_pos = self.submit_btn.mapToGlobal(self.submit_btn.rect().center())
-                btn_x, btn_y = btn_pos.x(), btn_pos.y()
-                
-                # Check if click is within the button area
-                click_x, click_y = current_pos
-                button_radius = 50  # Adjust this value based on your button size
-                
-                if (abs(click_x - btn_x) <= button_radius and 
-                    abs(click_y - btn_y) <= button_radius):
-                    return True
-                
-                # Also allow clicks on checkboxes
-                for checkbox in self.checkboxes:
-                    cb_pos = checkbox.mapToGlobal(checkbox.rect().center())
-                    cb_x, cb_y = cb_pos.x(), cb_pos.y()
-                    if (abs(click_x - cb_x) <= button_radius and 
-                        abs(click_y - cb_y) <= button_radius):
-                        return True
-            
-            # Block all other mouse events
-            return False
-        
-        return True
+        # Runs for every mouse event system-wide; the filter rejects moves
+        # before touching Qt and tests clicks against cached rectangles
+        return self.mouse_filter.allow(event.Message, event.Position)
+
+    def clickable_centres(self):
+        # Global centres of the widgets a locked user may click
+        widgets = [self.submit_btn] + [checkbox for checkbox in self.checkboxes if checkbox.isVisible()]
+        centres = []
+        for widget in widgets:
+            pos = widget.mapToGlobal(widget.rect().center())
+            centres.append((pos.x(), pos.y()))
+        return centres
+
+    def eventFilter(self, obj, event):
+        if event.type() in GEOMETRY_EVENTS:
+            self.mouse_filter.invalidate()
+        return False
+
+    def moveEvent(self, event):
+        self.mouse_filter.invalidate()
+        super().moveEvent(event)
+
+    def resizeEvent(self, event):
+        self.mouse_filter.invalidate()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        self.mouse_filter.invalidate()
+        super().showEvent(event)
 
     def on_keyboard_event(self, event):
         # Handle keyboard events
@@ -301,6 +340,13 @@ class AuthenticationApp(QWidget):
         if current_pid != os.getpid():
             self.activateWindow()
             self.raise_()
+            return True
+        return False
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.ActivationChange and not self.isActiveWindow():
+            self.scheduler.poke()
+        super().changeEvent(event)
 
     def cleanup(self):
         # Restore original desktop state
@@ -333,20 +379,6 @@ class AuthenticationApp(QWidget):
         except Exception as e:
             print(f"Error during cleanup: {e}")
 
-    def get_random_correct_files(self):
-        # Randomly select 3 correct files from recently worked-on files.
-        if len(self.recent_files) < 3:
-            return self.recent_files
-        return random.sample(self.recent_files, 3)
-
-    def generate_challenge_files(self):
-        # Combine correct and incorrect files, then shuffle them.
-        incorrect_files = get_incorrect_files()
-        selected_incorrect_files = random.sample(incorrect_files, 3) 
-        combined_files = self.correct_files + selected_incorrect_files
-        random.shuffle(combined_files)
-        return combined_files
-
     def exit_application(self):
         # Safely exit the application
         try:
@@ -355,11 +387,14 @@ class AuthenticationApp(QWidget):
             self.hm.UnhookMouse()
             
             # Stop all timers
-            if self.block_input_timer:
-                self.block_input_timer.stop()
+            self.scheduler.stop()
+            stats = self.scheduler.stats()
+            print(f"[Auth] Scheduler: {stats['wakeups']} wakeups ({stats['wakeups_per_sec']:.2f}/s), "
+                  f"{stats['actions']} actions, {stats['callback_ms']:.1f} ms in checks")
             
             # Set auth_successful to True and clear window flags
             self.auth_successful = True
+            self.mouse_filter.unlocked = True
             self.setWindowFlags(Qt.Window)
             self.show()  # Refresh window with new flags
             
@@ -381,10 +416,19 @@ class AuthenticationApp(QWidget):
         
         # Check if exactly 3 files are selected
         if len(selected_files) != 3:
+            AUTH_ATTEMPTS.inc(result="incomplete")
             QMessageBox.warning(self, "Access Denied", "Please select exactly 3 files.\nTry again.")
             return
 
         if set(selected_files) == set(self.correct_files):
+            AUTH_ATTEMPTS.inc(result="success")
+            CHALLENGE_TO_UNLOCK.observe(time.monotonic() - self.activated_at)
+            # A challenge is answered once; the next suspend prepares a new one
+            try:
+                self.state_store.clear_challenge()
+            except sqlite3.Error as e:
+                print(f"Error clearing challenge: {e}")
+
             # Temporarily remove the window flags to show the message box
             self.setWindowFlags(Qt.Window)
             self.show()
@@ -408,17 +452,33 @@ class AuthenticationApp(QWidget):
             msg_box.finished.connect(self.exit_application)
             msg_box.exec_()
         else:
+            AUTH_ATTEMPTS.inc(result="failure")
             QMessageBox.warning(self, "Access Denied", "Incorrect challenge response.\nPlease try again.")
 
+
+def main(app_class=AuthenticationApp):
+    parser = argparse.ArgumentParser(description="Task-based authentication challenge")
+    parser.add_argument("--standby", action="store_true",
+                        help="load everything, stay hidden and show the challenge on a 'show' line on stdin")
+    parser.add_argument("--resumed-at", type=float, default=None,
+                        help="wall-clock resume time, for reporting the first painted frame")
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    exporter = start_exporter("auth")
+    auth_app = app_class(standby=args.standby, resumed_at=args.resumed_at)
+    if args.standby:
+        channel = StandbyChannel()
+        channel.show_requested.connect(auth_app.activate)
+        # Losing the supervisor only ends a standby that was never shown
+        channel.closed.connect(lambda: None if auth_app.activated else app.quit())
+        channel.listen()
+        print("[Auth] Standby ready", flush=True)
+
+    exit_code = app.exec_()
+    exporter.stop()
+    sys.exit(exit_code)
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    auth_app = AuthenticationApp()
-    auth_app.show()
-    
-    # Create a timer to process Windows messages
-    message_timer = QTimer()
-    message_timer.timeout.connect(lambda: None)  
-    message_timer.start(50)  
-    
-    
-    sys.exit(app.exec_())
\ No newline at end of file
+    main()
\ No newline at end of file
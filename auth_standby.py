@@ -0,0 +1,43 @@
+import os
+import sys
+from subprocess import Popen, PIPE
+
+AUTH_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "auth_app.py")
+
+
+class StandbyAuthApp:
+    """An auth_app process started ahead of time, fully imported and hidden.
+
+    spawn() pays for the interpreter, the PyQt5/win32 imports, QApplication
+    and the widget tree while nobody is waiting (service startup, suspend);
+    show() on resume only loads the challenge and paints.
+    """
+
+    def __init__(self, args=(), script=AUTH_APP, **popen_kwargs):
+        self.args = list(args)
+        self.script = script
+        self.popen_kwargs = popen_kwargs
+        self.process = None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def spawn(self):
+        if self.alive():
+            return self.process
+        self.process = Popen([sys.executable, self.script, "--standby"] + self.args,
+                             stdin=PIPE, universal_newlines=True, **self.popen_kwargs)
+        return self.process
+
+    def show(self, resumed_at):
+        """Tell the standby process to show the challenge; returns its Popen for waiting."""
+        process, self.process = self.process, None
+        process.stdin.write(f"show {resumed_at}\n")
+        process.stdin.flush()
+        return process
+
+    def terminate(self):
+        if self.alive():
+            self.process.terminate()
+            self.process.wait()
+        self.process = None
@@ -0,0 +1,44 @@
+"""auth_app that answers its own challenge, for headless benchmarks only.
+
+Takes the same arguments as auth_app.py and runs its main() with a
+HeadlessAuthApp subclass, so there is no lockdown either. Right after
+the first frame it ticks the correct files and submits through the real
+button, and the "Access Granted" box is dismissed at once, as nobody is
+there to click it.
+bench_resume_to_unlock.py launches this in place of auth_app.py; the
+service itself never does.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QMessageBox
+
+import auth_app
+from headless_auth_app import HeadlessAuthApp
+
+
+class DismissedMessageBox(QMessageBox):
+    def exec_(self):
+        self.finished.emit(QMessageBox.Ok)
+        return QMessageBox.Ok
+
+
+class AutoAnswerApp(HeadlessAuthApp):
+    def paintEvent(self, event):
+        first_frame = self.resumed_at is not None
+        super().paintEvent(event)
+        if first_frame:
+            QTimer.singleShot(0, self.answer)
+
+    def answer(self):
+        for checkbox in self.checkboxes:
+            checkbox.setChecked(checkbox.text() in self.correct_files)
+        self.submit_btn.click()
+
+
+if __name__ == "__main__":
+    auth_app.QMessageBox = DismissedMessageBox
+    auth_app.main(AutoAnswerApp)
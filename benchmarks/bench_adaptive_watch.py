@@ -0,0 +1,158 @@
+"""Adaptive watch registration vs one recursive native watch over a large tree.
+
+Builds a --dirs tree and runs a FileTracker over it twice: once with the
+plain recursive watch, once with the root adaptive (sampled every
+--interval seconds, hot directories cooling after --cool-after). While
+each runs, writes go to --hot directories at a time, every --rate
+seconds, and the set of active directories moves on every --phase
+seconds so hot directories have to be promoted and later demoted.
+
+Every write creates a new tracked file. A handler hook records each
+path the tracker processed, so "reached" counts the written files it
+saw and "missed" the ones it never did. The adaptive run also reports
+its own estimate: changes that arrived by sampling instead of a watch,
+and how late.
+
+Native watches held are read from /proc/self/fdinfo (one line per
+inotify watch) where that exists. The sandbox default for
+max_user_watches is often far below what a whole system drive needs.
+
+Usage: python benchmarks/bench_adaptive_watch.py [--dirs 5000] [--hot 3] [--phases 3] [--phase 4.0] [--interval 1.0] [--cool-after 2.0]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_tracker import FileTracker
+from watch_roots import WatchRoot
+
+
+class SeenPaths:
+    """Stands in for the fingerprint cache: records every path that passed the rules."""
+
+    def __init__(self):
+        self.paths = set()
+
+    def changed(self, path):
+        self.paths.add(path)
+        return True
+
+
+def inotify_watches():
+    """Native watches held by this process, or None where fdinfo does not show them."""
+    try:
+        names = os.listdir("/proc/self/fdinfo")
+    except OSError:
+        return None
+    count = 0
+    for name in names:
+        try:
+            with open(os.path.join("/proc/self/fdinfo", name)) as file:
+                count += sum(1 for line in file if line.startswith("inotify wd:"))
+        except OSError:
+            continue
+    return count
+
+
+def build_tree(base, dirs):
+    paths = []
+    for i in range(dirs):
+        path = os.path.join(base, f"project{i // 100}", f"package{i % 100}")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "module.py"), "w") as file:
+            file.write("x")
+        paths.append(path)
+    return paths
+
+
+def write_activity(dirs, args, written):
+    step = len(dirs) // (args.phases * args.hot + 1)
+    for phase in range(args.phases):
+        active = [dirs[(phase * args.hot + i) * step] for i in range(args.hot)]
+        until = time.monotonic() + args.phase
+        while time.monotonic() < until:
+            for directory in active:
+                path = os.path.join(directory, f"notes_{len(written)}.txt")
+                with open(path, "w") as file:
+                    file.write("x")
+                written.append(path)
+            time.sleep(args.rate)
+
+
+def run(name, tree, dirs, args, workdir):
+    adaptive = name == "adaptive"
+    root = WatchRoot(tree, adaptive=adaptive, poll_interval=args.interval)
+    seen = SeenPaths()
+    written = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker = FileTracker(watch_roots=[root], state_path=os.path.join(workdir, f"{name}.db"))
+        tracker.handler.fingerprints = seen
+        started = time.perf_counter()
+        tracker.start()
+        start_time = time.perf_counter() - started
+        watcher = tracker.pollers[0] if adaptive else None
+        if watcher:
+            watcher.cool_after = args.cool_after
+            # The first pass only builds the index; activity is measured after it
+            while watcher.cycles == 0:
+                time.sleep(0.01)
+        peak = inotify_watches()
+        writer = threading.Thread(target=write_activity, args=(dirs, args, written))
+        writer.start()
+        while writer.is_alive():
+            watches = inotify_watches()
+            if watches is not None:
+                peak = max(peak or 0, watches)
+            time.sleep(0.05)
+        writer.join()
+        # One more interval, so the last sampled writes are picked up
+        time.sleep(args.interval * 1.5 + tracker.event_queue.coalesce_window)
+        stats = watcher.adaptive_stats() if watcher else None
+        tracker.close()
+
+    reached = sum(1 for path in written if path in seen.paths)
+    line = (f"{name:<9} start {start_time * 1000:>7.1f} ms  native watches {peak if peak is not None else '?':>5}  "
+            f"reached {reached}/{len(written)} written files, {len(written) - reached} missed")
+    if stats:
+        line += (f"\n          {stats['promotions']} promotions, {stats['demotions']} demotions, "
+                 f"{stats['sampled']} changes by sampling, delay mean {stats['mean_sample_delay']:.2f} s "
+                 f"max {stats['max_sample_delay']:.2f} s, first pass {watcher.last_stats.get('cycle_time', 0) * 1000:.0f} ms")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=5000)
+    parser.add_argument("--hot", type=int, default=3, help="directories written to at a time")
+    parser.add_argument("--phases", type=int, default=3, help="times the active directories move")
+    parser.add_argument("--phase", type=float, default=4.0, help="seconds each set of directories stays active")
+    parser.add_argument("--rate", type=float, default=0.1, help="seconds between writes to each active directory")
+    parser.add_argument("--interval", type=float, default=1.0, help="adaptive sampling interval, seconds")
+    parser.add_argument("--cool-after", type=float, default=2.0, help="seconds before a quiet hot directory is demoted")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="adaptive_bench_")
+    try:
+        # The poller keeps its snapshot index in the working directory
+        os.chdir(workdir)
+        tree = os.path.join(workdir, "tree")
+        dirs = build_tree(tree, args.dirs)
+        print(f"{args.dirs} dirs, {args.hot} active at a time, {args.phases} phases of {args.phase:g} s")
+        for name in ("recursive", "adaptive"):
+            run(name, tree, dirs, args, workdir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Idle wakeups while the challenge is on screen: fixed QTimers vs AdaptiveScheduler.
+
+The legacy setup ran enforce_focus and checkDesktopState every 100 ms plus
+a no-op timer every 50 ms. Both setups run here on Qt's offscreen platform
+with checks that find nothing to do, which is the state the app sits in
+while the user reads the challenge.
+
+Usage: python benchmarks/bench_auth_idle.py [--seconds 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+from scheduler import AdaptiveScheduler
+
+
+def run_for(app, seconds):
+    started_wall = time.monotonic()
+    started_cpu = time.process_time()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    return time.monotonic() - started_wall, time.process_time() - started_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    app = QApplication(sys.argv[:1])
+    calls = {"legacy": 0, "adaptive": 0}
+
+    def idle_check(key):
+        calls[key] += 1
+        return False
+
+    timers = []
+    for interval, key in ((100, "legacy"), (100, "legacy"), (50, None)):
+        timer = QTimer()
+        timer.timeout.connect((lambda k=key: idle_check(k)) if key else (lambda: None))
+        timer.start(interval)
+        timers.append(timer)
+    legacy_wall, legacy_cpu = run_for(app, args.seconds)
+    legacy_wakeups = calls["legacy"] + int(legacy_wall * 1000 / 50)
+    for timer in timers:
+        timer.stop()
+
+    scheduler = AdaptiveScheduler()
+    scheduler.add(lambda: idle_check("adaptive"))
+    scheduler.add(lambda: idle_check("adaptive"))
+    scheduler.start()
+    adaptive_wall, adaptive_cpu = run_for(app, args.seconds)
+    scheduler.stop()
+    stats = scheduler.stats()
+
+    print(f"legacy timers     {legacy_wakeups / legacy_wall:>7.2f} wakeups/s  "
+          f"cpu {legacy_cpu / legacy_wall * 100:>5.2f}%")
+    print(f"AdaptiveScheduler {stats['wakeups'] / adaptive_wall:>7.2f} wakeups/s  "
+          f"cpu {adaptive_cpu / adaptive_wall * 100:>5.2f}%  (settled at {stats['interval_ms']} ms, "
+          f"{stats['callback_ms']:.2f} ms in checks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Resume -> first painted challenge frame: cold auth_app launch vs the standby process.
+
+Runs auth_app headlessly on Qt's offscreen platform through
+headless_auth_app.py, so no input hooks or secure desktop are installed. The cold path is what the
+service did before standby mode (a fresh interpreter per resume); the
+standby path spawns the process first and only sends it the show command.
+auth_app itself reports the time from the given resume timestamp to its
+first paintEvent. Where pywin32 and pyWinhook are not installed, the
+auth app runs against the stand-ins from win32_stand_ins.py.
+
+Usage: python benchmarks/bench_auth_startup.py [--cycles 5]
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from subprocess import Popen, PIPE
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import win32_stand_ins
+
+from auth_standby import StandbyAuthApp
+
+HEADLESS_AUTH_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "headless_auth_app.py")
+PAINTED = re.compile(r"First frame painted ([\d.]+) ms")
+
+
+def read_until(process, marker, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    for line in process.stdout:
+        if marker in line:
+            return line
+        if time.monotonic() > deadline:
+            break
+    raise RuntimeError(f"auth_app exited or timed out before printing {marker!r}")
+
+
+def stop(process):
+    process.terminate()
+    process.wait()
+
+
+def cold_cycle(workdir, env):
+    resumed_at = time.time()
+    process = Popen([sys.executable, HEADLESS_AUTH_APP, f"--resumed-at={resumed_at}"],
+                    stdout=PIPE, universal_newlines=True, cwd=workdir, env=env)
+    try:
+        return float(PAINTED.search(read_until(process, "First frame painted")).group(1))
+    finally:
+        stop(process)
+
+
+def standby_cycle(workdir, env):
+    standby = StandbyAuthApp(script=HEADLESS_AUTH_APP, stdout=PIPE, cwd=workdir, env=env)
+    process = standby.spawn()
+    try:
+        read_until(process, "Standby ready")
+        standby.show(time.time())
+        return float(PAINTED.search(read_until(process, "First frame painted")).group(1))
+    finally:
+        stop(process)
+
+
+def summarize(label, samples):
+    print(f"{label:<22} median {statistics.median(samples):>8.1f} ms  "
+          f"min {min(samples):>8.1f} ms  max {max(samples):>8.1f} ms  (n={len(samples)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="auth_startup_")
+    try:
+        stand_ins = win32_stand_ins.install(os.path.join(workdir, "win32_stand_ins"))
+        env = win32_stand_ins.child_env(stand_ins, dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONUNBUFFERED="1"))
+        cold = [cold_cycle(workdir, env) for _ in range(args.cycles)]
+        standby = [standby_cycle(workdir, env) for _ in range(args.cycles)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    summarize("cold launch", cold)
+    summarize("standby show", standby)
+
+
+if __name__ == "__main__":
+    main()
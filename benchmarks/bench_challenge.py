@@ -0,0 +1,84 @@
+"""Challenge construction: resume-path cost and decoy extension matching.
+
+Compares building the challenge on resume (ranked read of the previous
+session plus decoy selection, what auth_app did) with loading the payload
+precomputed at suspend, and checks over many generated challenges that
+decoy extensions follow the real files' extension distribution.
+
+Usage: python benchmarks/bench_challenge.py [--files 5000] [--iterations 2000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from challenge import (RANKED_CANDIDATES, build_challenge, choose_decoys, load_recent_files,
+                       next_challenge, precompute_challenge)
+from state_store import StateStore
+
+
+def seed_session(store, files, rng):
+    extensions = [".py"] * 6 + [".js"] * 2 + [".md", ".docx"]
+    touches = {f"/work/project{i % 30}/module_{i}{rng.choice(extensions)}": [i, i, rng.randrange(1, 50)]
+               for i in range(files)}
+    with store.transaction() as conn:
+        store.record_touches(conn, touches, "previous_session")
+
+
+def per_call(call, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="challenge_bench_")
+    try:
+        store = StateStore(os.path.join(workdir, "tracker_state.db"))
+        seed_session(store, args.files, rng)
+
+        on_resume = per_call(lambda: build_challenge(load_recent_files(store), rng), args.iterations)
+        precompute_challenge(store, rng)
+        precomputed = per_call(lambda: next_challenge(store, rng), args.iterations)
+        at_sleep = per_call(lambda: precompute_challenge(store, rng), max(args.iterations // 10, 1))
+
+        # Decoy extension mix against the candidates they are meant to resemble
+        recent = load_recent_files(store)
+        candidates = recent[:RANKED_CANDIDATES]
+        real = Counter(os.path.splitext(name)[1] for name in candidates)
+        decoys = Counter()
+        overlaps = 0
+        for _ in range(args.iterations):
+            chosen = choose_decoys(candidates, 3, rng, exclude=recent)
+            overlaps += len(set(chosen) & set(recent))
+            decoys.update(os.path.splitext(name)[1] for name in chosen)
+        total_real, total_decoys = sum(real.values()), sum(decoys.values())
+
+        print(f"previous session: {args.files} files, candidates {candidates}")
+        print(f"build on resume      {on_resume * 1e6:>9.1f} us/challenge  ({1 / on_resume:,.0f}/s)")
+        print(f"precomputed payload  {precomputed * 1e6:>9.1f} us/challenge  ({1 / precomputed:,.0f}/s)")
+        print(f"precompute at sleep  {at_sleep * 1e6:>9.1f} us incl. persisting, off the resume path")
+        for extension in sorted(set(real) | set(decoys)):
+            print(f"  {extension:<6} real {real[extension] / total_real:>6.1%}  decoys {decoys[extension] / total_decoys:>6.1%}")
+        print(f"decoys colliding with real files: {overlaps}")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Touch storms with and without the content-fingerprint dedup stage.
+
+Builds a tree of small and large files and replays a storm in which most
+events leave the content as it was:
+
+- AV/sync touches (mtime only)
+- editor autosaves rewriting identical bytes
+- repeated events for one write
+- a minority of real edits
+
+Each event is applied to disk and then handed to process_batch, the same
+way the coalescing queue delivers it. Reports tracker time per event,
+process CPU per event with the cost of the disk actions themselves
+subtracted (journal writer included), what reached the state database and the cache hit rate.
+
+Usage: python benchmarks/bench_fingerprint.py [--files 500] [--events 20000] [--changes 0.1]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_journal import ActivityJournal
+from file_tracker import FileMonitorHandler
+from fingerprint import FingerprintCache
+from state_store import StateStore
+
+
+def build_tree(base, count, rng):
+    paths = []
+    for i in range(count):
+        directory = os.path.join(base, f"project{i % 10}", "src")
+        os.makedirs(directory, exist_ok=True)
+        # One file in five is large enough to be sampled
+        size = rng.randint(2, 8) * 1024 * 1024 if i % 5 == 0 else rng.randint(4, 64) * 1024
+        path = os.path.join(directory, f"file_{i}.py" if i % 5 else f"dataset_{i}.csv")
+        with open(path, "wb") as file:
+            file.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def storm(paths, events, changes, rng):
+    kinds = ["touch", "same", "repeat", "change"]
+    rest = (1.0 - changes) / 3
+    return [(rng.choice(paths), kind) for kind in rng.choices(kinds, [rest, rest, rest, changes], k=events)]
+
+
+def apply(path, kind):
+    if kind == "touch":
+        os.utime(path)
+    elif kind == "same":
+        with open(path, "rb") as file:
+            data = file.read()
+        with open(path, "wb") as file:
+            file.write(data)
+    elif kind == "change":
+        with open(path, "r+b") as file:
+            file.seek(0)
+            file.write(os.urandom(16))
+    # "repeat" is a second event for a write that already happened
+
+
+def apply_only(events):
+    cpu = time.process_time()
+    for path, kind in events:
+        apply(path, kind)
+    return time.process_time() - cpu
+
+
+def replay(workdir, events, dedup):
+    journal = ActivityJournal(StateStore(os.path.join(workdir, f"state_{dedup}.db")))
+    cache = FingerprintCache() if dedup else None
+    handler = FileMonitorHandler(journal.load(), journal=journal, fingerprints=cache)
+    journal.start()
+    elapsed = 0.0
+    cpu = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path, kind in events:
+            apply(path, kind)
+            started = time.perf_counter()
+            handler.process_batch([path])
+            elapsed += time.perf_counter() - started
+        journal.close()
+    # Whole process, so the journal writer is included
+    cpu = time.process_time() - cpu
+    return elapsed / len(events), cpu, journal.stats(), cache.stats() if cache is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--changes", type=float, default=0.1, help="share of events that really change content")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    workdir = tempfile.mkdtemp(prefix="fingerprint_bench_")
+    try:
+        paths = build_tree(os.path.join(workdir, "tree"), args.files, rng)
+        events = storm(paths, args.events, args.changes, rng)
+        # Prime the page cache so both runs read from memory
+        for path in paths:
+            with open(path, "rb") as file:
+                file.read()
+        baseline = apply_only(events)
+        for dedup in (False, True):
+            per_event, cpu, journal, cache = replay(workdir, events, dedup)
+            line = (f"{'dedup' if dedup else 'no dedup':<9} {per_event * 1e6:>6.1f} us/event, "
+                    f"tracker cpu {(cpu - baseline) / len(events) * 1e6:>5.1f} us/event  "
+                    f"{journal['records_written']:>6} records, {journal['rows_written']:>6} rows, "
+                    f"{journal['flushes']:>4} transactions")
+            if cache is not None:
+                line += (f"  hit rate {cache['hit_rate']:.1%} ({cache['stat_hits']} stat, "
+                         f"{cache['content_hits']} content), {cache['bytes_hashed'] / 1e6:.0f} MB hashed")
+            print(line)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Global mouse hook decision cost: per-event recomputation vs the cached MouseFilter.
+
+Replays millions of synthetic hook events (mostly moves, some clicks)
+through a pure-Python copy of the old on_mouse_event logic, with stand-ins
+for GetCursorPos and mapToGlobal, and through hit_test.MouseFilter.
+
+Usage: python benchmarks/bench_hit_test.py [--events 2000000] [--click-ratio 0.02]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hit_test import WM_LBUTTONDOWN, WM_MOUSEMOVE, MouseFilter
+
+BUTTON_RADIUS = 50
+
+
+class FakePoint:
+    __slots__ = ("_x", "_y")
+
+    def __init__(self, x, y):
+        self._x = x
+        self._y = y
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+
+class FakeWidget:
+    """Stands in for a QWidget: mapToGlobal allocates a point like the real call."""
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def rect_center(self):
+        return FakePoint(0, 0)
+
+    def mapToGlobal(self, point):
+        return FakePoint(self.x + point.x(), self.y + point.y())
+
+
+class LegacyHandler:
+    """The old on_mouse_event: cursor query and widget mapping on every event."""
+
+    def __init__(self, button, checkboxes, cursor):
+        self.submit_btn = button
+        self.checkboxes = checkboxes
+        self.cursor = cursor
+        self.auth_successful = False
+
+    def on_mouse_event(self, message_name):
+        if not self.auth_successful:
+            current_pos = self.cursor()
+            if message_name == "mouse_left_down":
+                btn_pos = self.submit_btn.mapToGlobal(self.submit_btn.rect_center())
+                btn_x, btn_y = btn_pos.x(), btn_pos.y()
+                click_x, click_y = current_pos
+                if abs(click_x - btn_x) <= BUTTON_RADIUS and abs(click_y - btn_y) <= BUTTON_RADIUS:
+                    return True
+                for checkbox in self.checkboxes:
+                    cb_pos = checkbox.mapToGlobal(checkbox.rect_center())
+                    cb_x, cb_y = cb_pos.x(), cb_pos.y()
+                    if abs(click_x - cb_x) <= BUTTON_RADIUS and abs(click_y - cb_y) <= BUTTON_RADIUS:
+                        return True
+            return False
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000000)
+    parser.add_argument("--click-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # Challenge layout on a 1920x1080 screen: six checkboxes above a submit button.
+    # Centres differ in x as label widths do, so the rectangles' order by top edge matters
+    checkboxes = [FakeWidget(961 + 9 * (i % 3), 380 + 40 * i) for i in range(6)]
+    button = FakeWidget(960, 660)
+    events = []
+    for _ in range(args.events):
+        click = rng.random() < args.click_ratio
+        if click and rng.random() < 0.5:
+            target = rng.choice(checkboxes + [button])
+            position = (target.x + rng.randrange(-60, 61), target.y + rng.randrange(-30, 31))
+        else:
+            position = (rng.randrange(1920), rng.randrange(1080))
+        events.append((WM_LBUTTONDOWN if click else WM_MOUSEMOVE, position))
+
+    cursor = [(0, 0)]
+    legacy = LegacyHandler(button, checkboxes, lambda: cursor[0])
+    names = {WM_LBUTTONDOWN: "mouse_left_down", WM_MOUSEMOVE: "mouse_move"}
+    started = time.perf_counter()
+    legacy_allowed = 0
+    for message, position in events:
+        cursor[0] = position
+        legacy_allowed += legacy.on_mouse_event(names[message])
+    legacy_time = time.perf_counter() - started
+
+    mouse_filter = MouseFilter(lambda: [(w.x, w.y) for w in [button] + checkboxes])
+    allow = mouse_filter.allow
+    started = time.perf_counter()
+    allowed = 0
+    for message, position in events:
+        allowed += allow(message, position)
+    filter_time = time.perf_counter() - started
+
+    print(f"{args.events:,} events, {args.click_ratio:.0%} clicks")
+    print(f"legacy handler  {legacy_time / args.events * 1e9:>8.0f} ns/event  {args.events / legacy_time:>14,.0f} events/s  allowed {legacy_allowed}")
+    print(f"MouseFilter     {filter_time / args.events * 1e9:>8.0f} ns/event  {args.events / filter_time:>14,.0f} events/s  allowed {allowed}")
+    print(f"filter stats    {mouse_filter.stats()}")
+    if allowed != legacy_allowed:
+        print("WARNING: decisions differ from the legacy handler")
+
+
+if __name__ == "__main__":
+    main()
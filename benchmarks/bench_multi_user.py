@@ -0,0 +1,136 @@
+"""Multi-user load test: one shared session store vs per-user partitions.
+
+Simulates a terminal server: every user has a thread writing events for
+files under their own profile, all into one tracker (the production
+path minus the observer: handler.dispatch_path -> coalescing queue ->
+process_batch -> journal). The shared setup is the tracker as it runs on
+a single-user machine; the partitioned one routes each path to its
+user's own sessions and database.
+
+Reports aggregate throughput, per-user throughput spread (events
+recorded per second of run time) and whether any user's files ended up
+in another user's store.
+
+Usage: python benchmarks/bench_multi_user.py [--users 60] [--events 2000] [--rate 0]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_tracker import FileTracker
+from state_store import StateStore, user_state_path
+from watch_roots import WatchRoot
+
+
+def user_paths(profiles, user, events):
+    base = os.path.join(profiles, user, "projects")
+    return [os.path.join(base, f"app{i % 7}", "src", f"module_{i % 400}.py") for i in range(events)]
+
+
+def produce(handler, paths, rate):
+    interval = 1.0 / rate if rate else 0.0
+    for path in paths:
+        handler.dispatch_path(path)
+        if interval:
+            time.sleep(interval)
+
+
+def record_finish_times(tracker, profiles, finished):
+    """Wrap the queue consumer to note when each user's latest batch was recorded."""
+    consumer = tracker.event_queue.consumer
+    prefix = len(profiles) + 1
+
+    def timed(batch):
+        consumer(batch)
+        now = time.perf_counter()
+        for user in {path[prefix:].split(os.sep, 1)[0] for path in batch}:
+            finished[user] = now
+
+    tracker.event_queue.consumer = timed
+
+
+def run(setup, args, workdir):
+    profiles = os.path.join(workdir, "Users")
+    users = [f"user{u:03d}" for u in range(args.users)]
+    for user in users:
+        os.makedirs(os.path.join(profiles, user), exist_ok=True)
+    options = {"watch_roots": [WatchRoot(profiles)], "queue_size": args.users * args.events,
+               "coalesce_window": 0.05, "backpressure": "block"}
+    if setup == "partitioned":
+        options.update(partition_by_user=True, profiles_dir=profiles, users_dir=os.path.join(workdir, "users"))
+    else:
+        options.update(state_path=os.path.join(workdir, "shared.db"))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker = FileTracker(**options)
+        tracker.start()
+        finished = {}
+        record_finish_times(tracker, profiles, finished)
+        threads = [threading.Thread(target=produce, args=(tracker.handler, user_paths(profiles, user, args.events),
+                                                          args.rate))
+                   for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Drained, recorded and written
+        tracker.stop()
+        elapsed = time.perf_counter() - started
+    durations = {user: finished.get(user, started + elapsed) - started for user in users}
+
+    # What each user's challenge would be built from, read back from disk
+    stored = {}
+    foreign = 0
+    if setup == "partitioned":
+        for user in users:
+            store = StateStore(user_state_path(user, os.path.join(workdir, "users")))
+            rows = store.connection().execute("SELECT path, touches FROM files").fetchall()
+            stored[user] = sum(touches for path, touches in rows)
+            foreign = max(foreign, sum(1 for path, _ in rows if os.sep + user + os.sep not in path))
+    else:
+        store = StateStore(os.path.join(workdir, "shared.db"))
+        rows = store.connection().execute("SELECT path, touches FROM files").fetchall()
+        own = {}
+        for path, touches in rows:
+            user = os.path.relpath(path, profiles).split(os.sep)[0]
+            stored[user] = stored.get(user, 0) + touches
+            own[user] = own.get(user, 0) + 1
+        # Every user's challenge reads the one shared store
+        foreign = len(rows) - min(own.values(), default=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker.close()
+    # Events each user got recorded per second until their last one was
+    per_user = [stored.get(user, 0) / durations[user] for user in users]
+    return elapsed, sorted(per_user), sum(stored.values()), foreign
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--events", type=int, default=2000, help="events per user")
+    parser.add_argument("--rate", type=float, default=0, help="events/sec per user, 0 for as fast as possible")
+    args = parser.parse_args()
+
+    for setup in ("shared", "partitioned"):
+        workdir = tempfile.mkdtemp(prefix="multi_user_bench_")
+        try:
+            elapsed, rates, stored, foreign = run(setup, args, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"{setup:<12} {args.users * args.events / elapsed:>8.0f} events/s overall in {elapsed:.2f}s, "
+              f"{stored} stored; per user min {rates[0]:.0f} / median {statistics.median(rates):.0f} / "
+              f"max {rates[-1]:.0f} events/s; other users' files visible to a user: {foreign}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Micro-benchmark: legacy per-event filtering vs the compiled PathMatcher.
+
+Usage: python benchmarks/bench_path_filter.py [--events N] [--repeat R]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from path_filter import PathMatcher, DEFAULT_ALLOWED_EXTENSIONS
+
+# The list the legacy substring check ran with
+LEGACY_EXCLUDED_DIRS = ['C:\\Windows', 'C:\\Program Files', 'C:\\ProgramData']
+
+
+def legacy_filter(file_path, excluded_dirs, allowed_extensions):
+    # Verbatim copy of the checks FileMonitorHandler.handle_file_event used to run
+    if any(excluded in file_path for excluded in excluded_dirs):
+        return False
+    file_name = os.path.basename(file_path)
+    file_extension = os.path.splitext(file_name)[-1].lower()
+    if file_extension not in allowed_extensions:
+        return False
+    junk_patterns = [
+        ".br[1].js",
+        "[1].js",
+    ]
+    if any(pattern in file_name for pattern in junk_patterns):
+        return False
+    return True
+
+
+def generate_paths(count, seed=1):
+    """Build a mix resembling a build + browser cache storm on a system drive."""
+    rng = random.Random(seed)
+    roots = [
+        "C:\\Windows\\System32\\",
+        "C:\\Program Files\\App\\bin\\",
+        "C:\\Program Files (x86)\\App\\",
+        "C:\\ProgramData\\Cache\\",
+        "C:\\Users\\dev\\AppData\\Local\\Browser\\Cache\\",
+        "C:\\Users\\dev\\projects\\service\\build\\obj\\",
+        "C:\\Users\\dev\\projects\\service\\src\\",
+        "C:\\Users\\dev\\Documents\\",
+    ]
+    names = ["module", "index", "report", "bundle", "style", "data", "notes"]
+    extensions = [".py", ".js", ".obj", ".pdb", ".tmp", ".txt", ".html", ".css", ".dll", ".br[1].js", "[1].js"]
+    paths = []
+    for i in range(count):
+        paths.append(f"{rng.choice(roots)}{rng.choice(names)}{i % 500}{rng.choice(extensions)}")
+    return paths
+
+
+def run(label, func, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(paths) / best
+    print(f"{label:<10} {rate:>14,.0f} events/sec  ({best * 1000:.1f} ms for {len(paths)} events)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = generate_paths(args.events)
+    excluded_dirs = list(LEGACY_EXCLUDED_DIRS)
+    allowed_extensions = list(DEFAULT_ALLOWED_EXTENSIONS)
+    matcher = PathMatcher()
+
+    mismatches = sum(1 for p in paths if legacy_filter(p, excluded_dirs, allowed_extensions) != matcher.matches(p))
+    if mismatches:
+        print(f"warning: {mismatches} paths filtered differently by the two implementations")
+
+    old_rate = run("legacy", lambda p: legacy_filter(p, excluded_dirs, allowed_extensions), paths, args.repeat)
+    new_rate = run("compiled", matcher.matches, paths, args.repeat)
+    print(f"speedup    {new_rate / old_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Resume -> unlock end to end: power broadcasts injected into the real service.
+
+Loads main_service and drives its Win32PowerSource by calling the window
+procedure with PBT_APMSUSPEND / PBT_APMRESUMEAUTOMATIC, the way the
+hidden window would. The supervisor loop is the real one and manages a
+real tracker worker. The auth app runs headlessly: offscreen Qt, and
+launched through auto_answer_app.py, which skips the lockdown, ticks
+the correct files and submits right after its first frame. Where pywin32 and pyWinhook are
+not installed (Linux, CI), stand-ins from win32_stand_ins.py are written
+to the work directory and put on the path of this process and the auth
+app.
+
+Each cycle is suspend, --sleep seconds asleep, then resume. Milestones
+are timed from the resume broadcast:
+- wake detected: the supervisor decided to authenticate
+- auth started: the standby app was told to show, or a cold one spawned
+- first frame: the auth app printed its first painted frame
+- unlocked: the auth app exited after a correct answer
+- tracker restarted: the tracker is watching again
+
+p50/p99 are reported per milestone. With --max-p99-ms the run exits 1
+when resume -> first frame p99 is above it, or when a cycle does not
+complete, so it can serve as a regression gate.
+
+Usage: python benchmarks/bench_resume_to_unlock.py [--cycles 10] [--mode both] [--sleep 2.0] [--max-p99-ms 0]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import win32_stand_ins
+
+AUTO_ANSWER_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "auto_answer_app.py")
+MILESTONES = ["wake_detected", "auth_started", "first_frame", "unlocked", "tracker_restarted"]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def run_mode(mode, workdir, args, env):
+    # Imported late: the stand-ins must be on the path, and main_service opens its store in the cwd
+    from auth_standby import StandbyAuthApp
+    from main_service import Win32PowerSource, TRACKER_OPTIONS
+    from state_store import StateStore, DeviceStateWatcher
+    from supervisor import Supervisor, RestartPolicy
+    from tracker_worker import TrackerWorker
+    from watch_roots import WatchRoot
+
+    class InjectedPowerSource(Win32PowerSource):
+        """Win32PowerSource without its window; the harness calls the window procedure."""
+
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+        def broadcast(self, power_event):
+            self._window_proc(0, self.WM_POWERBROADCAST, power_event, 0)
+
+    class RecordingSupervisor(Supervisor):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.resumed = None
+            self.marks = {}
+            self.cycle_done = threading.Event()
+
+        def begin_cycle(self):
+            self.marks = {}
+            self.cycle_done.clear()
+            self.resumed = time.perf_counter()
+
+        def mark(self, milestone):
+            if self.resumed is not None and milestone not in self.marks:
+                self.marks[milestone] = time.perf_counter() - self.resumed
+
+        def check_wake(self):
+            task = self.auth_task
+            super().check_wake()
+            if self.auth_task is not None and self.auth_task is not task:
+                self.mark("wake_detected")
+
+        def launch_auth_app(self, resumed_at):
+            process, launched = super().launch_auth_app(resumed_at)
+            self.mark("auth_started")
+            self.marks["mode"] = launched
+            threading.Thread(target=self.read_auth_output, args=(process,), daemon=True).start()
+            return process, launched
+
+        def read_auth_output(self, process):
+            for line in process.stdout:
+                if "First frame painted" in line:
+                    self.mark("first_frame")
+            self.mark("unlocked")
+
+        async def authenticate(self, awake):
+            await super().authenticate(awake)
+            self.mark("tracker_restarted")
+            self.cycle_done.set()
+
+    directory = os.path.join(workdir, mode)
+    tree = os.path.join(directory, "profile")
+    os.makedirs(tree)
+    os.chdir(directory)
+    # StandbyAuthApp opens its pipes in text mode itself
+    popen = {"stdout": subprocess.PIPE, "env": env, "stderr": None if args.verbose else subprocess.DEVNULL}
+    store = StateStore()
+    source = InjectedPowerSource(store.path)
+    tracker = TrackerWorker(dict(TRACKER_OPTIONS, watch_roots=[WatchRoot(tree)], state_path=store.path))
+    supervisor = RecordingSupervisor(source, store, DeviceStateWatcher(store), tracker,
+                                     standby=StandbyAuthApp(script=AUTO_ANSWER_APP, **popen) if mode == "standby" else None,
+                                     auth_command=[sys.executable, AUTO_ANSWER_APP],
+                                     auth_popen_kwargs=dict(popen, universal_newlines=True),
+                                     auth_policy=RestartPolicy(initial=0.2))
+    results = []
+    timeouts = []
+
+    def drive():
+        # Tracker worker and standby app load while the first sleep lasts
+        time.sleep(args.sleep)
+        for _ in range(args.cycles):
+            source.broadcast(source.PBT_APMSUSPEND)
+            time.sleep(args.sleep)
+            supervisor.begin_cycle()
+            source.broadcast(source.PBT_APMRESUMEAUTOMATIC)
+            if not supervisor.cycle_done.wait(args.timeout):
+                timeouts.append(dict(supervisor.marks))
+                break
+            results.append(dict(supervisor.marks))
+        supervisor.request_stop()
+
+    output = io.StringIO()
+    driver = threading.Thread(target=drive, daemon=True)
+    with contextlib.redirect_stdout(output):
+        driver.start()
+        asyncio.run(supervisor.run())
+    driver.join()
+    if args.verbose:
+        print(output.getvalue())
+    return results, timeouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--mode", choices=["standby", "cold", "both"], default="both")
+    parser.add_argument("--sleep", type=float, default=2.0, help="seconds between suspend and resume")
+    parser.add_argument("--timeout", type=float, default=60.0, help="longest a cycle may take")
+    parser.add_argument("--max-p99-ms", type=float, default=0, help="fail above this resume -> first frame p99")
+    parser.add_argument("--verbose", action="store_true", help="print the service log and the auth app's stderr")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="resume_unlock_bench_")
+    failed = []
+    try:
+        stand_ins = win32_stand_ins.install(os.path.join(workdir, "win32_stand_ins"))
+        env = win32_stand_ins.child_env(stand_ins, dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONUNBUFFERED="1"))
+        os.chdir(workdir)
+        for mode in (["standby", "cold"] if args.mode == "both" else [args.mode]):
+            results, timeouts = run_mode(mode, workdir, args, env)
+            print(f"{mode}: {len(results)} cycles" + (f", cycle timed out after {sorted(timeouts[0])}" if timeouts else ""))
+            for milestone in MILESTONES:
+                samples = [marks[milestone] * 1000 for marks in results if milestone in marks]
+                if samples:
+                    print(f"  resume -> {milestone.replace('_', ' '):<18} p50 {percentile(samples, 50):>8.1f} ms  "
+                          f"p99 {percentile(samples, 99):>8.1f} ms  (n={len(samples)})")
+            frames = [marks["first_frame"] * 1000 for marks in results if "first_frame" in marks]
+            if timeouts or len(frames) < args.cycles:
+                failed.append(f"{mode}: {args.cycles - len(frames)} of {args.cycles} cycles never showed a frame")
+            elif args.max_p99_ms and percentile(frames, 99) > args.max_p99_ms:
+                failed.append(f"{mode}: first frame p99 {percentile(frames, 99):.1f} ms > {args.max_p99_ms:g} ms")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failed:
+        print(f"FAIL {failure}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
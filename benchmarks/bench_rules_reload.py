@@ -0,0 +1,153 @@
+"""Rules reload latency and event processing while the rules change.
+
+A producer thread pushes batches through FileMonitorHandler.process_batch
+non-stop (8 .py and 24 .txt paths each) while the rules file alternates
+between allowing only .py and only .txt. Every batch must come out
+filtered by one rule set: 8 or 24 paths kept, never anything else. The
+kept paths are observed through the handler's fingerprints hook.
+
+Reports, per reload:
+- write -> swap latency, which includes the watcher's poll interval
+- compile + swap time
+- events processed between the write and the swap
+- batches filtered by a mix of old and new rules
+
+For comparison it times what a rule change cost before: stop the
+tracker and start it again, which re-establishes the recursive observer
+over a --dirs tree. No event is handled in that window.
+
+Usage: python benchmarks/bench_rules_reload.py [--reloads 20] [--interval 0.1] [--dirs 5000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from activity_journal import ActivityJournal
+from file_tracker import FileMonitorHandler, FileTracker
+from rules_config import RulesWatcher
+from state_store import StateStore
+from watch_roots import WatchRoot
+
+RULES = [{"allowed_extensions": [".py"]}, {"allowed_extensions": [".txt"]}]
+
+
+class KeptPaths:
+    """Stands in for the fingerprint cache: records what passed the rules and keeps it from being recorded."""
+
+    def __init__(self):
+        self.kept = 0
+
+    def changed(self, path):
+        self.kept += 1
+        return False
+
+
+def write_rules(path, rules, generation):
+    with open(path, "w") as file:
+        json.dump(rules, file)
+    # Distinct mtimes even on file systems with coarse timestamps
+    stamp = 1_700_000_000_000_000_000 + generation * 1_000_000_000
+    os.utime(path, ns=(stamp, stamp))
+
+
+def produce(handler, kept, batch, stop, log):
+    while not stop.is_set():
+        kept.kept = 0
+        handler.process_batch(batch)
+        log.append((time.perf_counter(), kept.kept))
+
+
+def reload_run(workdir, args):
+    profile = os.path.join(workdir, "profile")
+    batch = [os.path.join(profile, "src", f"module_{i}.py") for i in range(8)]
+    batch += [os.path.join(profile, "notes", f"note_{i}.txt") for i in range(24)]
+    rules_path = os.path.join(workdir, "rules.json")
+    write_rules(rules_path, RULES[0], 0)
+
+    kept = KeptPaths()
+    journal = ActivityJournal(StateStore(os.path.join(workdir, "state.db")))
+    handler = FileMonitorHandler(journal.load(), journal=journal, fingerprints=kept)
+    handler.set_roots([WatchRoot(profile)])
+    watcher = RulesWatcher(rules_path, handler.apply_rules, args.interval)
+    stop = threading.Event()
+    log = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        watcher.start()
+        producer = threading.Thread(target=produce, args=(handler, kept, batch, stop, log))
+        producer.start()
+        windows = []
+        for generation in range(1, args.reloads + 1):
+            time.sleep(args.interval * 2)
+            reloads = watcher.reloads
+            written = time.perf_counter()
+            write_rules(rules_path, RULES[generation % 2], generation)
+            while watcher.reloads == reloads:
+                time.sleep(0.001)
+            windows.append((written, time.perf_counter(), watcher.last_reload_time))
+        stop.set()
+        producer.join()
+        watcher.stop()
+        journal.close()
+
+    during = [sum(1 for at, _ in log if written <= at <= swapped) * len(batch) for written, swapped, _ in windows]
+    mixed = sum(1 for _, count in log if count not in (8, 24))
+    elapsed = log[-1][0] - log[0][0]
+    return {
+        "latency": [swapped - written for written, swapped, _ in windows],
+        "swap": [swap for _, _, swap in windows],
+        "during": during,
+        "events_per_sec": len(log) * len(batch) / elapsed,
+        "batches": len(log),
+        "mixed": mixed,
+    }
+
+
+def restart_run(workdir, dirs):
+    tree = os.path.join(workdir, "tree")
+    for i in range(dirs):
+        os.makedirs(os.path.join(tree, f"project{i // 100}", f"package{i % 100}"), exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker = FileTracker(watch_roots=[WatchRoot(tree)], state_path=os.path.join(workdir, "restart.db"))
+        tracker.start()
+        started = time.perf_counter()
+        tracker.stop()
+        tracker.start()
+        elapsed = time.perf_counter() - started
+        tracker.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reloads", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1, help="rules file poll interval in seconds")
+    parser.add_argument("--dirs", type=int, default=5000, help="directories under the watch for the restart baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rules_bench_")
+    try:
+        result = reload_run(workdir, args)
+        print(f"hot reload  write -> swap median {statistics.median(result['latency']) * 1000:.1f} ms "
+              f"(max {max(result['latency']) * 1000:.1f} ms, poll {args.interval * 1000:.0f} ms), "
+              f"compile + swap median {statistics.median(result['swap']) * 1000:.3f} ms")
+        print(f"            {statistics.median(result['during']):.0f} events processed per reload window "
+              f"(min {min(result['during'])}), {result['events_per_sec']:.0f} events/s throughout, "
+              f"{result['mixed']} of {result['batches']} batches saw mixed rules")
+        restart = restart_run(workdir, args.dirs)
+        print(f"restart     stop + start over {args.dirs} dirs {restart * 1000:.1f} ms, no events handled meanwhile")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
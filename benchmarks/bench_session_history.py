@@ -0,0 +1,92 @@
+"""Session rotation cost vs session size, and the recent-files query used by the challenge.
+
+The legacy rotation re-keyed every row of the current session into
+previous_session (and deleted the old previous one) inside the rotation
+transaction. Generation rotation moves the pointer and starts an empty
+generation. Both are timed on sessions of growing size; then
+recent_files is timed across 1, 3 and 8 retained sessions.
+
+Usage: python benchmarks/bench_session_history.py [--sizes 1000 10000 50000] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import StateStore
+
+
+def legacy_rotate(conn):
+    # What rotate_sessions(replace=True) did before session history
+    conn.execute("DELETE FROM files WHERE session = 'previous_session'")
+    conn.execute("UPDATE files SET session = 'previous_session' WHERE session = 'current_session'")
+
+
+def fill(store, size, session, offset=0):
+    touches = {f"C:\\Users\\dev\\projects\\app{i % 40}\\src\\module_{i + offset}.py": [1, 2 + i, 1 + i % 17]
+               for i in range(size)}
+    with store.transaction() as conn:
+        store.record_touches(conn, touches, session)
+
+
+def time_rotation(store, size, repeat, legacy):
+    timings = []
+    for _ in range(repeat):
+        fill(store, size, "current_session")
+        with store.transaction() as conn:
+            if legacy:
+                # Raw legacy keys, so the generation pointer plays no part
+                conn.execute("UPDATE files SET session = 'current_session' WHERE session = ?",
+                             (str(store.current_generation(conn)),))
+        started = time.perf_counter()
+        with store.transaction() as conn:
+            if legacy:
+                legacy_rotate(conn)
+            else:
+                store.rotate_sessions(conn, replace=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="history_bench_")
+    try:
+        print(f"{'session files':>13}  {'legacy rotate':>13}  {'generation rotate':>17}")
+        for size in args.sizes:
+            legacy = time_rotation(StateStore(os.path.join(workdir, f"legacy_{size}.db")), size, args.repeat, True)
+            store = StateStore(os.path.join(workdir, f"history_{size}.db"))
+            pointer = time_rotation(store, size, args.repeat, False)
+            print(f"{size:>13}  {legacy * 1000:>10.2f} ms  {pointer * 1000:>14.2f} ms")
+
+        # Eight retained sessions of the largest size, overlapping paths
+        size = args.sizes[-1]
+        store = StateStore(os.path.join(workdir, "query.db"), history=8)
+        for generation in range(9):
+            fill(store, size, "current_session", offset=generation * size // 4)
+            with store.transaction() as conn:
+                store.rotate_sessions(conn, replace=True)
+        history = store.generations()
+        print(f"retained {len(history) - 1} completed sessions, {sum(g['files'] for g in history)} rows")
+        for sessions in (1, 3, 8):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                store.recent_files(18, sessions)
+                timings.append(time.perf_counter() - started)
+            print(f"recent_files(18, sessions={sessions})  {statistics.median(timings) * 1000:>8.2f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Memory sizing for long tracker sessions: legacy dict vs SessionStore.
+
+Usage: python benchmarks/bench_session_store.py [--hours 8] [--files-per-hour 2000] [--cap N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore
+
+
+def generate_names(count, seed=3):
+    rng = random.Random(seed)
+    stems = ["main", "utils", "report", "index", "styles", "notes", "config", "handler"]
+    extensions = [".py", ".txt", ".html", ".css", ".js", ".docx", ".xlsx"]
+    return [f"{rng.choice(stems)}_{i}{rng.choice(extensions)}" for i in range(count)]
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return kept, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=8)
+    parser.add_argument("--files-per-hour", type=int, default=2000)
+    parser.add_argument("--cap", type=int, default=None)
+    args = parser.parse_args()
+
+    count = int(args.hours * args.files_per_hour)
+    # Names arrive as fresh strings from the observer, as they do in production
+    names = generate_names(count)
+    base = int(time.time())
+
+    def build_legacy():
+        session = {}
+        for i, name in enumerate(names):
+            session["".join(name)] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(base + i))
+        return session
+
+    def build_store():
+        store = SessionStore(args.cap)
+        for i, name in enumerate(names):
+            store.touch("".join(name), base + i)
+        return store
+
+    legacy, legacy_bytes, legacy_time = measure(build_legacy)
+    store, store_bytes, store_time = measure(build_store)
+    usage = store.memory_usage()
+
+    print(f"{count} files over {args.hours:g}h")
+    print(f"legacy dict   {legacy_bytes / 1024:>10.1f} KiB  {legacy_bytes / len(legacy):>6.0f} B/file  {legacy_time * 1000:.1f} ms")
+    print(f"SessionStore  {store_bytes / 1024:>10.1f} KiB  {store_bytes / max(len(store), 1):>6.0f} B/file  {store_time * 1000:.1f} ms")
+    print(f"store report  {usage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Snapshot index persistence on a drive-sized tree: full JSON rewrite vs per-directory rows.
+
+Builds a --dirs tree with --files tracked files each and indexes it once.
+Each following pass edits --changes files in different directories, then
+scans and saves the index twice:
+- legacy: the whole index rewritten as one JSON file, as the poller did
+  every pass that found anything
+- rows: SnapshotIndex.save(), which writes only the directories that
+  changed since the last save
+
+Reported per pass: scan time, stats made, and for each save the time and
+the bytes written (JSON file size; WAL size for the rows).
+
+Usage: python benchmarks/bench_snapshot_index.py [--dirs 50000] [--files 4] [--passes 5] [--changes 10]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot_index import SnapshotIndex
+from watch_roots import WatchRoot
+
+
+def legacy_save(path, dirs):
+    """The former SnapshotIndex.save: the whole index as JSON, renamed into place."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"version": 1, "dirs": dirs}, file)
+    os.replace(tmp_path, path)
+
+
+def build_tree(base, dirs, files):
+    paths = []
+    for i in range(dirs):
+        directory = os.path.join(base, f"d{i // 1000}", f"d{i // 50}", f"d{i}")
+        os.makedirs(directory, exist_ok=True)
+        for j in range(files):
+            with open(os.path.join(directory, f"file{j}.txt"), "w") as file:
+                file.write("x")
+        paths.append(directory)
+    return paths
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=50000)
+    parser.add_argument("--files", type=int, default=4, help="tracked files per directory")
+    parser.add_argument("--passes", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=10, help="files edited before each pass")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="snapshot_index_bench_")
+    try:
+        tree = os.path.join(workdir, "tree")
+        started = time.perf_counter()
+        dirs = build_tree(tree, args.dirs, args.files)
+        print(f"{args.dirs} dirs, {args.dirs * args.files} files built in {time.perf_counter() - started:.1f}s")
+        root = WatchRoot(tree)
+        index = SnapshotIndex(os.path.join(workdir, "index.db")).load()
+        json_path = os.path.join(workdir, "index.json")
+
+        started = time.perf_counter()
+        index.scan(root.path, root.matcher, root.exclude, root.recursive)
+        scan_time = time.perf_counter() - started
+        started = time.perf_counter()
+        index.save()
+        print(f"first pass: scan {scan_time:.2f}s, rows save {time.perf_counter() - started:.2f}s, "
+              f"index {file_size(index.path) / 1e6:.1f} MB")
+
+        results = {"scan": [], "stats": [], "legacy": [], "legacy_bytes": [], "rows": [], "rows_bytes": []}
+        for cycle in range(args.passes):
+            step = max(len(dirs) // args.changes, 1)
+            for i in range(args.changes):
+                path = os.path.join(dirs[(i * step + cycle) % len(dirs)], "file0.txt")
+                with open(path, "w") as file:
+                    file.write(f"edit {cycle}")
+            started = time.perf_counter()
+            _events, stats = index.scan(root.path, root.matcher, root.exclude, root.recursive)
+            results["scan"].append(time.perf_counter() - started)
+            results["stats"].append(stats["files_statted"] + stats["dirs_scanned"] + stats["dirs_skipped"])
+
+            started = time.perf_counter()
+            legacy_save(json_path, index.dirs)
+            results["legacy"].append(time.perf_counter() - started)
+            results["legacy_bytes"].append(file_size(json_path))
+
+            # An emptied WAL holds exactly the pages this save writes
+            index._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            started = time.perf_counter()
+            index.save()
+            results["rows"].append(time.perf_counter() - started)
+            results["rows_bytes"].append(file_size(index.path + "-wal"))
+        index.close()
+
+        print(f"{args.passes} passes, {args.changes} files edited before each:")
+        print(f"  scan          {statistics.median(results['scan']) * 1000:>9.1f} ms  "
+              f"{statistics.median(results['stats']):>9.0f} stats")
+        for name in ("legacy", "rows"):
+            print(f"  {name + ' save':<13} {statistics.median(results[name]) * 1000:>9.1f} ms  "
+                  f"{statistics.median(results[name + '_bytes']) / 1024:>9.1f} KiB written")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
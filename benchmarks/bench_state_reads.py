@@ -0,0 +1,102 @@
+"""Device state reads in the service loop: 1s JSON polling vs DeviceStateWatcher.
+
+Replays one simulated hour against a real state database: the tracker's
+journal flushes while the user works, a few suspend/resume cycles write
+device state, and the service loop wakes on every directory change plus a
+safety timeout. The legacy loop wakes and parses device_state.json every
+second regardless.
+
+Usage: python benchmarks/bench_state_reads.py [--hours 1] [--cycles 4] [--active 0.5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import StateStore, DeviceStateWatcher
+
+SAFETY_TIMEOUT = 60
+
+
+def legacy_read(path):
+    with open(path, "r") as file:
+        state = json.load(file)
+    awake = datetime.fromisoformat(state["last_awake"]) if state.get("last_awake") else None
+    sleep = datetime.fromisoformat(state["last_sleep"]) if state.get("last_sleep") else None
+    return awake, sleep
+
+
+def time_per_call(call, repeat=2000):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=1)
+    parser.add_argument("--cycles", type=int, default=4, help="suspend/resume cycles per hour")
+    parser.add_argument("--active", type=float, default=0.5, help="fraction of seconds with tracker flushes")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="state_reads_")
+    try:
+        store = StateStore(os.path.join(workdir, "tracker_state.db"))
+        store.update_device_state(last_awake=datetime.now().isoformat(), last_sleep=None)
+        json_path = os.path.join(workdir, "device_state.json")
+        with open(json_path, "w") as file:
+            json.dump(store.load_device_state(), file)
+        watcher = DeviceStateWatcher(store)
+        watcher.refresh()
+
+        # Timeline of one-second ticks: what happened on the state directory
+        rng = random.Random(args.seed)
+        seconds = int(args.hours * 3600)
+        state_writes = set(rng.sample(range(seconds), min(seconds, 2 * int(args.cycles * args.hours))))
+        wakeups = detected = writes = 0
+        idle = 0
+        for second in range(seconds):
+            event = False
+            if rng.random() < args.active:
+                with store.transaction() as conn:
+                    store.record_touches(conn, {f"/work/file{rng.randrange(500)}.py": [second, second, 1]})
+                event = True
+            if second in state_writes:
+                writes += 1
+                key = "last_sleep" if writes % 2 else "last_awake"
+                store.update_device_state(**{key: datetime.now().isoformat()})
+                event = True
+            idle += 1
+            if event or idle >= SAFETY_TIMEOUT:
+                idle = 0
+                wakeups += 1
+                detected += watcher.refresh()
+        stats = watcher.stats()
+
+        legacy_cost = time_per_call(lambda: legacy_read(json_path))
+        unchanged_cost = time_per_call(watcher.refresh)
+        changed_cost = time_per_call(lambda: (store.stamp_device_state(), watcher.refresh()), 500)
+
+        hours = seconds / 3600
+        print(f"simulated {hours:g}h, {len(state_writes)} device state writes, tracker active {args.active:.0%}")
+        print(f"legacy 1s poll   {seconds / (hours * 3600):>8.3f} wakeups/s  {seconds / hours:>8.0f} reads/hour  "
+              f"{legacy_cost * 1e6:>7.1f} us/check")
+        print(f"watcher          {wakeups / (hours * 3600):>8.3f} wakeups/s  {stats['reads'] / hours:>8.0f} reads/hour  "
+              f"{unchanged_cost * 1e6:>7.1f} us/check unchanged, {changed_cost * 1e6:.1f} us changed")
+        print(f"changes detected {detected} of {len(state_writes)}")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
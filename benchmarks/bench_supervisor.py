@@ -0,0 +1,137 @@
+"""Power event latency while the challenge is on screen: blocking loop vs asyncio supervisor.
+
+Runs the whole supervisor on a SimulatedPowerSource with a real tracker
+worker and a stand-in auth app (a child that sleeps for --auth seconds).
+A resume starts the challenge; a suspend and a resume then arrive while
+it is still open. The legacy model is the old service loop: it waits on
+the auth process and only drains the message queue afterwards.
+
+The run also kills the tracker worker and makes the first auth app
+crash, to show both being restarted.
+
+Usage: python benchmarks/bench_supervisor.py [--auth 3.0] [--verbose]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import queue
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import StateStore, DeviceStateWatcher
+from supervisor import Supervisor, SimulatedPowerSource, RestartPolicy, RESTARTS, SUSPEND, RESUME, STOP
+from tracker_worker import TrackerWorker
+from watch_roots import WatchRoot
+
+# Exits 1 the first time (a crash), then sleeps like a user solving the challenge
+FAKE_AUTH = (
+    "import os, sys, time;"
+    "marker = sys.argv[1];"
+    "crashed = os.path.exists(marker);"
+    "open(marker, 'a').close();"
+    "sys.exit(1) if not crashed else time.sleep(float(sys.argv[2]))"
+)
+
+
+class RecordingSource(SimulatedPowerSource):
+    def __init__(self, script):
+        super().__init__(script)
+        self.emitted = []
+
+    def emit(self, event):
+        if event in (SUSPEND, RESUME):
+            self.emitted.append(time.perf_counter())
+        super().emit(event)
+
+
+class RecordingSupervisor(Supervisor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handled = []
+
+    async def handle(self, event):
+        if event in (SUSPEND, RESUME):
+            self.handled.append(time.perf_counter())
+        await super().handle(event)
+
+
+def legacy(script, auth_seconds):
+    """The old loop: wait() on the auth app, then pump whatever queued up meanwhile."""
+    events = queue.Queue()
+
+    def play():
+        for delay, event in script:
+            time.sleep(delay)
+            events.put((event, time.perf_counter()))
+
+    threading.Thread(target=play, daemon=True).start()
+    latencies = []
+    auth_done = False
+    while len(latencies) < len(script):
+        event, emitted = events.get()
+        latencies.append(time.perf_counter() - emitted)
+        if event == RESUME and not auth_done:
+            subprocess.run([sys.executable, "-c", f"import time; time.sleep({auth_seconds})"])
+            auth_done = True
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--auth", type=float, default=3.0, help="seconds the stand-in auth app stays open")
+    parser.add_argument("--verbose", action="store_true", help="print the supervisor's log")
+    args = parser.parse_args()
+
+    # Resume opens the challenge; a suspend and a resume arrive while it is open
+    script = [(0.5, RESUME), (1.0, SUSPEND), (0.5, RESUME)]
+    legacy_latencies = legacy(script, args.auth)
+
+    workdir = tempfile.mkdtemp(prefix="supervisor_bench_")
+    try:
+        tree = os.path.join(workdir, "tree")
+        os.makedirs(tree)
+        store = StateStore(os.path.join(workdir, "state.db"))
+        tracker = TrackerWorker({"watch_roots": [WatchRoot(tree)], "state_path": store.path})
+        source = RecordingSource(script + [(args.auth + 3.0, STOP)])
+        auth_command = [sys.executable, "-c", FAKE_AUTH, os.path.join(workdir, "crashed"), str(args.auth)]
+        supervisor = RecordingSupervisor(source, store, DeviceStateWatcher(store), tracker,
+                                         auth_command=auth_command,
+                                         tracker_policy=RestartPolicy(initial=0.2),
+                                         auth_policy=RestartPolicy(initial=0.2))
+
+        async def run():
+            # Kill the tracker worker while the challenge is open
+            asyncio.get_running_loop().call_later(1.2, lambda: tracker.process and tracker.process.kill())
+            await supervisor.run()
+
+        output = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        latencies = [handled - emitted for emitted, handled in zip(source.emitted, supervisor.handled)]
+        log = output.getvalue()
+        if args.verbose:
+            print(log)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"legacy loop     event latency mean {statistics.mean(legacy_latencies) * 1000:>8.1f} ms, "
+          f"max {max(legacy_latencies) * 1000:>8.1f} ms")
+    print(f"asyncio         event latency mean {statistics.mean(latencies) * 1000:>8.1f} ms, "
+          f"max {max(latencies) * 1000:>8.1f} ms  ({len(latencies)} events, run {elapsed:.1f}s)")
+    print(f"restarts        auth {RESTARTS.value(child='auth')}, tracker {RESTARTS.value(child='tracker')}; "
+          f"tracker running after auth: {'File tracker ready' in log.split('Starting file tracker after auth.')[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Suspend handling: tracker killed vs flush+rotate handshake with a deadline.
+
+Runs the supervisor on a SimulatedPowerSource with a real tracker worker
+and an auth app that unlocks at once. Each cycle resumes (the tracker
+starts after the unlock), writes --files files into the watched tree and
+suspends --gap seconds after the last write, while the tracker still
+holds touches it has not written.
+
+- legacy: what the service did before; the tracker is terminated on
+  suspend
+- handshake: the suspend command with the default deadline
+- deadline: the same with --tight-deadline, to show the kill fallback
+  bounding the suspend
+
+Reports suspend handling time (broadcast to handled), how the tracker
+ended each suspend, and what reached the state database: touches kept
+and sessions rotated.
+
+Usage: python benchmarks/bench_suspend.py [--cycles 5] [--files 200] [--gap 0.1] [--tight-deadline 0.005]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import StateStore, DeviceStateWatcher
+from supervisor import Supervisor, SimulatedPowerSource, RestartPolicy, SUSPEND, RESUME, STOP, SUSPEND_DEADLINE
+from tracker_worker import TrackerWorker
+from watch_roots import WatchRoot
+
+# Tracker start after the unlock, with room to spare
+SETTLE = 1.0
+
+
+class TimedSupervisor(Supervisor):
+    def __init__(self, *args, tree=None, files=0, legacy=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tree = tree
+        self.files = files
+        self.legacy = legacy
+        self.cycle = 0
+        self.written = 0
+        self.suspends = []
+        self.outcomes = []
+
+    async def handle(self, event):
+        if event == RESUME:
+            # The power source only moves on once this cycle's files are written
+            asyncio.get_running_loop().call_later(SETTLE, self.write_files)
+        if event == SUSPEND:
+            started = time.perf_counter()
+            await super().handle(event)
+            self.suspends.append(time.perf_counter() - started)
+            return
+        await super().handle(event)
+
+    def write_files(self):
+        self.cycle += 1
+        for i in range(self.files):
+            with open(os.path.join(self.tree, f"cycle{self.cycle}_notes_{i}.txt"), "w") as file:
+                file.write("x")
+        self.written += self.files
+
+    async def suspend_tracker(self):
+        if not self.legacy:
+            outcome = await super().suspend_tracker()
+        else:
+            # The old path: the tracker process was terminated on suspend
+            self.tracking = False
+            if self.tracker.alive():
+                self.tracker.process.terminate()
+                self.tracker.process.join()
+                self.tracker.running = False
+            outcome = "terminated"
+        self.outcomes.append(outcome)
+        return outcome
+
+    async def shutdown(self):
+        # Counted before the shutdown's own close() adds a rotation
+        conn = self.store.connection()
+        self.kept = conn.execute("SELECT count(*) FROM files").fetchone()[0]
+        # Generation 1 is created ended
+        self.rotated = conn.execute("SELECT count(*) FROM generations WHERE ended_at IS NOT NULL").fetchone()[0] - 1
+        await super().shutdown()
+
+
+def run(setup, args, workdir):
+    directory = os.path.join(workdir, setup)
+    tree = os.path.join(directory, "profile")
+    os.makedirs(tree)
+    store = StateStore(os.path.join(directory, "state.db"))
+    tracker = TrackerWorker({"watch_roots": [WatchRoot(tree)], "state_path": store.path})
+    # Resume, unlock, files written, suspend shortly after the last write
+    script = [(1.0, RESUME), (SETTLE + args.gap, SUSPEND)] * args.cycles
+    deadline = args.tight_deadline if setup == "deadline" else SUSPEND_DEADLINE
+    supervisor = TimedSupervisor(SimulatedPowerSource(script + [(1.5, STOP)]), store, DeviceStateWatcher(store),
+                                 tracker, auth_command=[sys.executable, "-c", "pass"],
+                                 tracker_policy=RestartPolicy(initial=0.2), suspend_deadline=deadline,
+                                 tree=tree, files=args.files, legacy=setup == "legacy")
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(supervisor.run())
+    return supervisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--files", type=int, default=200, help="files written per awake period")
+    parser.add_argument("--gap", type=float, default=0.1, help="seconds from the last write to the suspend")
+    parser.add_argument("--tight-deadline", type=float, default=0.005,
+                        help="suspend deadline for the kill fallback run, seconds")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="suspend_bench_")
+    try:
+        for setup in ("legacy", "handshake", "deadline"):
+            supervisor = run(setup, args, workdir)
+            outcomes = {outcome: supervisor.outcomes.count(outcome) for outcome in sorted(set(supervisor.outcomes))}
+            print(f"{setup:<10} suspend median {statistics.median(supervisor.suspends) * 1000:>7.1f} ms, "
+                  f"max {max(supervisor.suspends) * 1000:>7.1f} ms  tracker {outcomes}  "
+                  f"{supervisor.kept}/{supervisor.written} files in the database, {supervisor.rotated} sessions rotated")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
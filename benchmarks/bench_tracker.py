@@ -0,0 +1,294 @@
+"""Synthetic event replay and throughput benchmark for file_tracker.
+
+Generates realistic event streams over a synthetic tree and drives the
+tracker either directly (FileMonitorHandler callbacks, no filesystem
+events) or through a real watchdog observer on a temp directory.
+
+Usage: python benchmarks/bench_tracker.py [--mode direct|observer|both]
+           [--workload NAME ...] [--events N] [--output results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent
+from watchdog.observers import Observer
+
+from activity_journal import ActivityJournal
+from event_queue import CoalescingQueue
+from file_tracker import FileMonitorHandler, transfer_session_data
+from state_store import StateStore
+from watch_roots import WatchRoot, schedule_roots
+
+WORKLOADS = ("build_storm", "browser_cache", "editor_autosave", "mixed")
+
+
+def build_tree(base, projects=20, modules_per_project=25):
+    """Create the directory skeleton the workloads write into."""
+    layout = {"projects": [], "build": [], "cache": [], "docs": os.path.join(base, "Documents")}
+    os.makedirs(layout["docs"], exist_ok=True)
+    for p in range(projects):
+        project = os.path.join(base, "projects", f"service{p}")
+        for sub in ("src", "tests", "static"):
+            os.makedirs(os.path.join(project, sub), exist_ok=True)
+        layout["projects"].append(project)
+        for m in range(modules_per_project // 5 + 1):
+            build = os.path.join(project, "build", "obj", f"m{m}")
+            os.makedirs(build, exist_ok=True)
+            layout["build"].append(build)
+    for c in range(16):
+        cache = os.path.join(base, "AppData", "Browser", "Cache", f"{c:02x}")
+        os.makedirs(cache, exist_ok=True)
+        layout["cache"].append(cache)
+    return layout
+
+
+def build_storm(layout, count, rng):
+    # Compilers write many intermediates, some tracked sources get regenerated
+    events = []
+    extensions = [".obj", ".pdb", ".o", ".tmp", ".d", ".py", ".js"]
+    while len(events) < count:
+        directory = rng.choice(layout["build"])
+        name = f"unit{rng.randrange(400)}{rng.choice(extensions)}"
+        events.append(("created", os.path.join(directory, name)))
+        events.extend(("modified", os.path.join(directory, name)) for _ in range(rng.randrange(1, 4)))
+    return events[:count]
+
+
+def browser_cache(layout, count, rng):
+    # Hashed blobs plus the cached scripts the junk patterns exist for
+    events = []
+    names = ["f_{:06x}", "data_{:x}", "bundle.br[1].js", "app{}[1].js", "{:08x}.html", "index_{}.css"]
+    while len(events) < count:
+        name = rng.choice(names).format(rng.randrange(1 << 20))
+        path = os.path.join(rng.choice(layout["cache"]), name)
+        events.append(("created", path))
+        events.append(("modified", path))
+    return events[:count]
+
+
+def editor_autosave(layout, count, rng):
+    # A handful of open files, each save firing several callbacks
+    open_files = []
+    for _ in range(12):
+        project = rng.choice(layout["projects"])
+        ext = rng.choice([".py", ".js", ".css", ".html", ".txt"])
+        open_files.append(os.path.join(project, rng.choice(["src", "static", "tests"]), f"edit{rng.randrange(50)}{ext}"))
+    open_files.append(os.path.join(layout["docs"], "notes.docx"))
+    events = []
+    while len(events) < count:
+        path = rng.choice(open_files)
+        events.extend(("modified", path) for _ in range(rng.randrange(2, 5)))
+    return events[:count]
+
+
+def mixed(layout, count, rng):
+    parts = [build_storm(layout, count // 2, rng), browser_cache(layout, count // 3, rng),
+             editor_autosave(layout, count - count // 2 - count // 3, rng)]
+    events = [event for part in parts for event in part]
+    rng.shuffle(events)
+    return events
+
+
+GENERATORS = {
+    "build_storm": build_storm,
+    "browser_cache": browser_cache,
+    "editor_autosave": editor_autosave,
+    "mixed": mixed,
+}
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def open_journal(workdir):
+    return ActivityJournal(StateStore(os.path.join(workdir, "tracker_state.db")))
+
+
+def state_bytes(journal):
+    total = 0
+    for path in (journal.store.path, journal.store.path + "-wal"):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def run_direct(workdir, layout, events):
+    """Call the handler callbacks synchronously, one event at a time."""
+    journal = open_journal(workdir)
+    tracked_files = journal.load()
+    handler = FileMonitorHandler(tracked_files, journal=journal)
+    journal.start()
+    callbacks = {"created": (handler.on_created, FileCreatedEvent), "modified": (handler.on_modified, FileModifiedEvent)}
+    prepared = [(callbacks[kind][0], callbacks[kind][1](path)) for kind, path in events]
+
+    latencies = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    for callback, event in prepared:
+        t0 = time.perf_counter()
+        callback(event)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    t0 = time.perf_counter()
+    transfer_session_data(tracked_files, journal)
+    transfer_time = time.perf_counter() - t0
+    journal.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "events": len(events),
+        "events_per_sec": len(events) / elapsed,
+        "latency_p50_us": percentile(latencies, 0.50) * 1e6,
+        "latency_p99_us": percentile(latencies, 0.99) * 1e6,
+        "transfer_session_ms": transfer_time * 1000,
+        "peak_memory_kib": peak / 1024,
+        "state_bytes_written": journal.bytes_written,
+        "state_file_bytes": state_bytes(journal),
+        "files_tracked": len(tracked_files["previous_session"]),
+    }
+
+
+class TimingHandler:
+    """Sits in front of the tracker handler to timestamp event arrival."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.arrivals = {}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _arrive(self, event):
+        now = time.perf_counter()
+        with self.lock:
+            self.count += 1
+            self.arrivals.setdefault(event.src_path, now)
+
+    def on_modified(self, event):
+        self._arrive(event)
+        self.handler.on_modified(event)
+
+    def on_created(self, event):
+        self._arrive(event)
+        self.handler.on_created(event)
+
+    def set_roots(self, roots):
+        self.handler.set_roots(roots)
+
+
+def run_observer(workdir, layout, events, settle=2.0):
+    """Perform the workload as real file writes under a watchdog observer."""
+    journal = open_journal(workdir)
+    tracked_files = journal.load()
+    queue = CoalescingQueue(coalesce_window=0.05)
+    handler = FileMonitorHandler(tracked_files, journal=journal, event_queue=queue)
+    timing = TimingHandler(handler)
+    journal.start()
+    queue.start(handler.process_batch)
+    root = WatchRoot(os.path.join(workdir, "tree"))
+
+    observer = Observer()
+    t0 = time.perf_counter()
+    schedule_roots(observer, timing, [root])
+    observer.start()
+    startup = time.perf_counter() - t0
+
+    tracemalloc.start()
+    writes = {}
+    started = time.perf_counter()
+    for kind, path in events:
+        writes.setdefault(path, time.perf_counter())
+        with open(path, "a") as file:
+            file.write("x")
+    write_elapsed = time.perf_counter() - started
+
+    # Wait until the observer has gone quiet
+    deadline = time.perf_counter() + settle
+    last_count = -1
+    while time.perf_counter() < deadline and timing.count != last_count:
+        last_count = timing.count
+        time.sleep(0.2)
+    observer.stop()
+    observer.join()
+    queue.stop()
+    elapsed = time.perf_counter() - started
+    t0 = time.perf_counter()
+    transfer_session_data(tracked_files, journal)
+    transfer_time = time.perf_counter() - t0
+    journal.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = [timing.arrivals[path] - written for path, written in writes.items() if path in timing.arrivals]
+    return {
+        "events": len(events),
+        "observer_events": timing.count,
+        "observer_startup_ms": startup * 1000,
+        "write_events_per_sec": len(events) / write_elapsed,
+        "events_per_sec": timing.count / elapsed,
+        "latency_p50_us": percentile(latencies, 0.50) * 1e6,
+        "latency_p99_us": percentile(latencies, 0.99) * 1e6,
+        "transfer_session_ms": transfer_time * 1000,
+        "peak_memory_kib": peak / 1024,
+        "state_bytes_written": journal.bytes_written,
+        "state_file_bytes": state_bytes(journal),
+        "files_tracked": len(tracked_files["previous_session"]),
+        "queue": queue.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("direct", "observer", "both"), default="both")
+    parser.add_argument("--workload", nargs="*", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    modes = ["direct", "observer"] if args.mode == "both" else [args.mode]
+    results = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "events": args.events, "runs": []}
+    for workload in args.workload:
+        for mode in modes:
+            workdir = tempfile.mkdtemp(prefix="tracker_bench_")
+            try:
+                layout = build_tree(os.path.join(workdir, "tree"))
+                events = GENERATORS[workload](layout, args.events, random.Random(args.seed))
+                runner = run_direct if mode == "direct" else run_observer
+                # The tracker prints every detection; keep that out of the timings
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = runner(workdir, layout, events)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            result.update({"workload": workload, "mode": mode})
+            results["runs"].append(result)
+            print(f"{workload:<16} {mode:<8} {result['events_per_sec']:>12,.0f} ev/s  "
+                  f"p50 {result['latency_p50_us']:>9.1f}us  p99 {result['latency_p99_us']:>9.1f}us  "
+                  f"peak {result['peak_memory_kib']:>8.0f} KiB  state {result['state_bytes_written']:>9} B")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Resume -> tracker-ready latency: legacy os.system spawn vs the warm tracker worker.
+
+The legacy path is what main_service did after every authentication: a
+multiprocessing.Process whose target shells out to a fresh interpreter
+running file_tracker, ready once the observer is started. The warm path
+sends a start command to an already loaded TrackerWorker.
+
+Usage: python benchmarks/bench_tracker_startup.py [--cycles 10] [--dirs 200]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tracker_worker import TrackerWorker
+from watch_roots import WatchRoot
+
+LEGACY_SCRIPT = (
+    "import os, sys; sys.path.insert(0, {root!r});"
+    "open('tracker.pid', 'w').write(str(os.getpid()));"
+    "from file_tracker import monitor_system; from watch_roots import WatchRoot;"
+    "monitor_system(watch_roots=[WatchRoot({tree!r})])"
+)
+
+
+def build_tree(base, dirs):
+    for i in range(dirs):
+        os.makedirs(os.path.join(base, f"project{i % 20}", f"pkg{i}"), exist_ok=True)
+
+
+def run_legacy_tracker(workdir, command):
+    # Same shape as main_service.run_file_tracker, with output kept for the ready marker
+    os.chdir(workdir)
+    os.system(f"{command} > tracker.log 2>&1")
+
+
+def pid_alive(pid):
+    if os.name == "nt":
+        return None
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def legacy_cycle(workdir, tree, timeout=60.0):
+    for name in ("tracker.log", "tracker.pid"):
+        try:
+            os.remove(os.path.join(workdir, name))
+        except FileNotFoundError:
+            pass
+    script = LEGACY_SCRIPT.format(root=ROOT, tree=tree)
+    command = f'"{sys.executable}" -u -c "{script}"'
+    log = os.path.join(workdir, "tracker.log")
+
+    started = time.perf_counter()
+    process = multiprocessing.Process(target=run_legacy_tracker, args=(workdir, command))
+    process.start()
+    ready = None
+    while time.perf_counter() - started < timeout:
+        try:
+            with open(log, "r") as file:
+                if "Observer started" in file.read():
+                    ready = time.perf_counter() - started
+                    break
+        except FileNotFoundError:
+            pass
+        time.sleep(0.002)
+
+    # What the service did next: terminate() the wrapper process
+    process.terminate()
+    process.join()
+    with open(os.path.join(workdir, "tracker.pid")) as file:
+        pid = int(file.read())
+    time.sleep(0.2)
+    orphaned = pid_alive(pid)
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        pass
+    return ready, orphaned
+
+
+def summarize(label, samples):
+    samples = [s * 1000 for s in samples if s is not None]
+    if not samples:
+        print(f"{label:<28} no samples")
+        return
+    print(f"{label:<28} median {statistics.median(samples):>9.1f} ms  "
+          f"min {min(samples):>9.1f} ms  max {max(samples):>9.1f} ms  (n={len(samples)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--legacy-cycles", type=int, default=3)
+    parser.add_argument("--dirs", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tracker_startup_")
+    try:
+        tree = os.path.join(workdir, "tree")
+        build_tree(tree, args.dirs)
+
+        legacy = [legacy_cycle(workdir, tree) for _ in range(args.legacy_cycles)]
+
+        worker = TrackerWorker({"watch_roots": [WatchRoot(tree)],
+                                "state_path": os.path.join(workdir, "worker_state.db")})
+        spawn_time = worker.spawn()
+        warm = []
+        for _ in range(args.cycles):
+            warm.append(worker.start())
+            worker.stop()
+        worker.shutdown()
+
+        summarize("legacy spawn -> ready", [ready for ready, _ in legacy])
+        orphans = [orphaned for _, orphaned in legacy]
+        if None not in orphans:
+            print(f"{'legacy terminate()':<28} {sum(orphans)} of {len(orphans)} trackers left running")
+        summarize("warm worker first load", [spawn_time])
+        summarize("warm start -> ready", warm)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""auth_app without the lockdown, for headless benchmarks only.
+
+Takes the same arguments as auth_app.py and runs its main() with an
+AuthenticationApp subclass that installs no input hooks and no secure
+desktop, so it can run on Qt's offscreen platform. bench_auth_startup.py
+launches this in place of auth_app.py; the service itself never does.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth_app
+
+
+class HeadlessAuthApp(auth_app.AuthenticationApp):
+    def makeSecure(self):
+        pass
+
+    def setupSecureDesktop(self):
+        pass
+
+
+if __name__ == "__main__":
+    auth_app.main(HeadlessAuthApp)
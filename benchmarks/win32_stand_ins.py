@@ -0,0 +1,63 @@
+"""Stand-ins for the Windows-only modules auth_app imports, for headless runs on Linux/CI.
+
+Benchmarks that start auth_app call install() with a directory under
+their work directory. Missing modules get a stand-in file there, the
+directory goes on this process's path, and child_env() puts it on the
+path of the auth app. Nothing is written where pywin32 and pyWinhook
+are installed.
+"""
+import importlib.util
+import os
+import sys
+
+WIN32_MODULES = ["win32api", "win32con", "win32event", "win32file", "win32gui", "win32process",
+                 "win32security", "ntsecuritycon", "pythoncom", "pyWinhook"]
+
+WIN32_STAND_IN = '''"""Stand-in for a Windows-only module, written by benchmarks/win32_stand_ins.py."""
+
+
+class StandIn:
+    def __call__(self, *args, **kwargs):
+        return StandIn()
+
+    def __getattr__(self, name):
+        return StandIn()
+
+    def __or__(self, other):
+        return self
+
+    __ror__ = __or__
+
+    def __int__(self):
+        return 0
+
+    __index__ = __int__
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return StandIn()
+'''
+
+
+def install(directory):
+    """Write stand-ins for the missing Windows modules; returns the directory, or None if none were needed."""
+    missing = [name for name in WIN32_MODULES if importlib.util.find_spec(name) is None]
+    if not missing:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    for name in missing:
+        with open(os.path.join(directory, name + ".py"), "w") as file:
+            file.write(WIN32_STAND_IN)
+    sys.path.insert(0, directory)
+    print(f"pywin32 stand-ins for: {', '.join(sorted(missing))}")
+    return directory
+
+
+def child_env(directory, env=None):
+    """Environment for a child process that sees the stand-ins in directory (when there are any)."""
+    env = dict(os.environ if env is None else env)
+    if directory:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [directory, env.get("PYTHONPATH")]))
+    return env
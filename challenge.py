@@ -0,0 +1,133 @@
+import os
+import random
+import time
+from collections import Counter
+
+# Correct answers are drawn from this many of the most worked-on files
+RANKED_CANDIDATES = 6
+CORRECT_COUNT = 3
+DECOY_COUNT = 3
+CHALLENGE_VERSION = 1
+# Completed sessions the candidates are ranked across
+RECENT_SESSIONS = 3
+
+# Used when the recent sessions recorded nothing
+FALLBACK_FILES = ["document1.txt", "document2.txt", "document3.txt"]
+
+# Realistic and believable incorrect file names for an enterprise environment
+DECOY_FILES = [
+    "project_plan_v2.docx",           # Project documentation
+    "api_integration_guide.pdf",      # API documentation
+    "style_guide_v1.css",             # Company style guide
+    "deployment_config.yaml",         # Deployment configuration file
+    "test_suite_results.json",        # Test results
+    "user_auth_handler.py",           # Authentication handler script
+    "error_tracking_service.js",      # Error tracking service script
+    "database_migration.sql",         # Database migration script
+    "dashboard_component.jsx",        # Frontend dashboard component
+    "employee_directory.xlsx",        # Employee directory spreadsheet
+    "meeting_notes_2024-12-15.md",    # Meeting notes markdown file
+    "module_registry.xml",            # Module registry file
+    "team_collaboration_roadmap.pptx",# Team collaboration roadmap
+    "performance_report_2024.pdf",    # Performance report
+    "client_project_overview.html",   # Client project overview webpage
+    "feature_toggle_flags.json",      # Feature toggle configuration
+    "staging_environment.log",        # Staging environment log file
+    "qa_checklist_latest.xlsx",       # QA checklist
+    "access_logs_2024-12-20.txt",     # Access logs
+    "legacy_codebase_review.docx"     # Review document for legacy code
+]
+DECOY_STEMS = [os.path.splitext(name)[0] for name in DECOY_FILES]
+
+
+def load_recent_files(store, limit=RANKED_CANDIDATES * 3, sessions=RECENT_SESSIONS):
+    """Basenames of the files worked on most during the last few sessions, best first."""
+    # Read off the ranking index of the stored session history, not the whole sessions
+    file_names = []
+    for path in store.recent_files(limit, sessions):
+        file_name = os.path.basename(path)
+        if file_name not in file_names:
+            file_names.append(file_name)
+    return file_names
+
+
+def pick_correct_files(recent_files, rng):
+    if len(recent_files) < CORRECT_COUNT:
+        return list(recent_files)
+    return rng.sample(recent_files[:RANKED_CANDIDATES], CORRECT_COUNT)
+
+
+def choose_decoys(real_files, count, rng, exclude=()):
+    """Decoy names whose extensions follow the distribution of the real files.
+
+    Each decoy's extension is drawn with the weight it has among real_files;
+    a pool name with that extension is used when one is left, otherwise a
+    pool stem gets the extension, so a session of .py files is not answered
+    by spotting the only .py names on screen.
+    """
+    taken = set(exclude) | set(real_files)
+    weights = Counter(os.path.splitext(name)[1].lower() for name in real_files)
+    if not weights:
+        return rng.sample([name for name in DECOY_FILES if name not in taken], count)
+    extensions = list(weights)
+    by_extension = {}
+    for name in DECOY_FILES:
+        by_extension.setdefault(os.path.splitext(name)[1].lower(), []).append(name)
+
+    decoys = []
+    stems = list(DECOY_STEMS)
+    while len(decoys) < count:
+        extension = rng.choices(extensions, [weights[e] for e in extensions])[0]
+        candidates = [name for name in by_extension.get(extension, ()) if name not in taken]
+        if candidates:
+            name = rng.choice(candidates)
+        else:
+            name = rng.choice(stems) + extension
+            if name in taken:
+                name = f"{rng.choice(stems)}_{rng.randrange(2, 10)}{extension}"
+            if name in taken:
+                continue
+        taken.add(name)
+        decoys.append(name)
+    return decoys
+
+
+def build_challenge(recent_files, rng=None):
+    """A ready-to-render challenge payload from the ranked recent files."""
+    rng = rng or random.SystemRandom()
+    recent_files = recent_files or FALLBACK_FILES
+    correct = pick_correct_files(recent_files, rng)
+    decoys = choose_decoys(recent_files[:RANKED_CANDIDATES], DECOY_COUNT, rng, exclude=recent_files)
+    choices = correct + decoys
+    rng.shuffle(choices)
+    return {
+        "version": CHALLENGE_VERSION,
+        "created": int(time.time()),
+        "correct": correct,
+        "choices": choices,
+    }
+
+
+def precompute_challenge(store, rng=None):
+    """Build the next challenge from the stored session history and persist it."""
+    payload = build_challenge(load_recent_files(store), rng)
+    store.save_challenge(payload)
+    return payload
+
+
+def is_valid(payload):
+    return (
+        isinstance(payload, dict)
+        and payload.get("version") == CHALLENGE_VERSION
+        and isinstance(payload.get("correct"), list)
+        and isinstance(payload.get("choices"), list)
+        and set(payload["correct"]) <= set(payload["choices"])
+    )
+
+
+def next_challenge(store, rng=None):
+    """The precomputed challenge, or one built now if none was stored."""
+    payload = store.load_challenge()
+    if is_valid(payload):
+        return payload
+    return precompute_challenge(store, rng)
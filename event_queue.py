@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+
+BACKPRESSURE_POLICIES = ("drop_oldest", "block")
+
+
+class CoalescingQueue:
+    """Bounded hand-off between the observer thread and the tracker logic.
+
+    The observer thread only appends raw paths. A worker thread waits out the
+    coalescing window after the first queued event, collapses repeated events
+    for the same path and hands the batch to the consumer in one call.
+    """
+
+    def __init__(self, maxsize=10000, coalesce_window=0.25, policy="drop_oldest"):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"policy must be one of {BACKPRESSURE_POLICIES}, got {policy!r}")
+        self.maxsize = maxsize
+        self.coalesce_window = coalesce_window
+        self.policy = policy
+        self.consumer = None
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches = 0
+        self.max_depth = 0
+
+    def put(self, path):
+        """Queue a raw event path; applies the backpressure policy when full."""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._items) >= self.maxsize and not self._stopping:
+                        self._cond.wait()
+                    if self._stopping:
+                        # Woken by stop(): the worker may have drained for the last time
+                        self.received += 1
+                        self.dropped += 1
+                        return
+            self._items.append(path)
+            self.received += 1
+            if len(self._items) > self.max_depth:
+                self.max_depth = len(self._items)
+            self._cond.notify_all()
+
+    def start(self, consumer):
+        """Start the worker; consumer is called with a list of distinct paths."""
+        self.consumer = consumer
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name="EventCoalescer", daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items and not self._stopping:
+                    self._cond.wait()
+                if not self._items and self._stopping:
+                    return
+                stopping = self._stopping
+            if not stopping and self.coalesce_window:
+                # Let the burst that woke us finish before draining it
+                time.sleep(self.coalesce_window)
+            self.drain()
+
+    def drain(self):
+        """Coalesce everything queued so far and deliver it as one batch."""
+        with self._cond:
+            items = self._items
+            self._items = deque()
+            self._cond.notify_all()
+        if not items:
+            return
+        # dict.fromkeys keeps the first occurrence order of each path
+        batch = list(dict.fromkeys(items))
+        self.delivered += len(batch)
+        self.batches += 1
+        try:
+            self.consumer(batch)
+        except Exception as e:
+            print(f"Error processing event batch: {e}")
+
+    def stop(self):
+        """Deliver whatever is still queued and stop the worker."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._worker:
+            self._worker.join()
+            self._worker = None
+
+    def depth(self):
+        return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            # Events that reached the coalescer per event handed to the consumer
+            "coalesce_ratio": (self.received - self.dropped) / self.delivered if self.delivered else 0.0,
+        }
@@ -1,139 +1,457 @@
 import time
-import json
 import os
+import sqlite3
+import threading
+from contextlib import nullcontext
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from datetime import datetime
+from event_queue import CoalescingQueue
+from activity_journal import ActivityJournal, FSYNC_POLICIES
+from session_store import SessionStore
+from state_store import StateStore, USERS_DIR
+from watch_roots import default_watch_roots, schedule_roots
+from snapshot_index import IncrementalPoller
+from adaptive_watch import AdaptiveWatcher
+from fingerprint import FingerprintCache
+from user_partitions import UserRouter, PROFILES_DIR
+from rules_config import RulesWatcher, RULES_PATH
+from warm_start import WarmStartScan, WARM_START_BUDGET, WARM_START_DEPTH
+from challenge import precompute_challenge, RECENT_SESSIONS
+from metrics import counter, gauge, histogram, start_exporter
+from path_filter import PathMatcher, DEFAULT_ALLOWED_EXTENSIONS, DEFAULT_EXCLUDED_DIRS, DEFAULT_JUNK_PATTERNS
+
+EVENTS_RECEIVED = counter("tracker_events_total", "Event paths handed to the tracker logic")
+EVENTS_FILTERED = counter("tracker_events_filtered_total", "Event paths rejected by the include/exclude/junk rules")
+FILES_DETECTED = counter("tracker_files_detected_total", "Files new to the current session")
+BATCH_SECONDS = histogram("tracker_batch_seconds", "Time to filter and record one event batch")
+TRANSFER_SECONDS = histogram("tracker_session_transfer_seconds", "Session rotation including its state write")
+SESSION_FILES = gauge("tracker_session_files", "Files held in each session")
 
 class FileMonitorHandler(FileSystemEventHandler):
-    def __init__(self, tracked_files, reset_threshold=3):
+    def __init__(self, tracked_files, reset_threshold=3, journal=None, event_queue=None, fingerprints=None):
         super().__init__()
         self.tracked_files = tracked_files
-        self.allowed_extensions = ['.py', '.docx', '.xlsx', '.txt', '.html', '.css', '.js']
-        self.excluded_dirs = ['C:\\Windows', 'C:\\Program Files', 'C:\\ProgramData']
+        self.journal = journal
+        self.state_store = journal.store if journal else StateStore()
+        self.event_queue = event_queue
+        # Optional FingerprintCache: drops events that left the content unchanged
+        self.fingerprints = fingerprints
+        self.lock = threading.Lock()
+        self.allowed_extensions = list(DEFAULT_ALLOWED_EXTENSIONS)
+        self.excluded_dirs = list(DEFAULT_EXCLUDED_DIRS)
+        self.junk_patterns = list(DEFAULT_JUNK_PATTERNS)
         self.reset_threshold = reset_threshold
+        # Rules are compiled once per rule change, not per event
+        self.matcher = PathMatcher(self.allowed_extensions, self.excluded_dirs, self.junk_patterns)
+        self.roots = []
+        # Contents of the rules file in force, None for the built-in rules
+        self.rules = None
+        # (default matcher, ((root, matcher), ...)), replaced whole on every change
+        self.ruleset = (self.matcher, ())
+
+    def set_roots(self, roots):
+        # Longest root first so nested roots win over the ones containing them
+        self.roots = sorted(roots, key=lambda root: len(root.key), reverse=True)
+        self.apply_rules(self.rules)
+
+    def apply_rules(self, rules):
+        """Compile rules (None for the built-in ones) and swap them in with one assignment.
+
+        A batch reads the rule set once, so events in flight are filtered
+        by the old rules or the new ones, never a mix of both.
+        """
+        if rules is None:
+            matcher = PathMatcher(DEFAULT_ALLOWED_EXTENSIONS, DEFAULT_EXCLUDED_DIRS, DEFAULT_JUNK_PATTERNS)
+        else:
+            matcher = PathMatcher(rules["allowed_extensions"], rules["excluded_dirs"], rules["junk_patterns"])
+        roots = tuple((root, root.compile(rules)) for root in self.roots)
+        self.ruleset = (matcher, roots)
+        self.rules = rules
+        self.matcher = matcher
+        self.allowed_extensions = list(matcher.allowed_extensions)
+        self.excluded_dirs = list(matcher.excluded_dirs)
+        self.junk_patterns = list(matcher.junk_patterns)
+        # Pollers and the warm-start scan read the root's own matcher
+        for root, root_matcher in roots:
+            root.matcher = root_matcher
+
+    def matcher_for(self, file_path, ruleset=None):
+        matcher, roots = ruleset or self.ruleset
+        for root, root_matcher in roots:
+            if root.contains(file_path):
+                return root_matcher
+        return matcher
 
     def on_modified(self, event):
         if not event.is_directory:
-            self.handle_file_event(event.src_path)
+            self.dispatch_path(event.src_path)
 
     def on_created(self, event):
         if not event.is_directory:
-            self.handle_file_event(event.src_path)
+            self.dispatch_path(event.src_path)
 
-    def handle_file_event(self, file_path):
-        if any(excluded in file_path for excluded in self.excluded_dirs):
-            return
+    def dispatch_path(self, file_path):
+        # With a queue the observer thread only enqueues; the worker does the rest
+        if self.event_queue:
+            self.event_queue.put(file_path)
+        else:
+            self.handle_file_event(file_path)
 
-        file_name = os.path.basename(file_path)
-        file_extension = os.path.splitext(file_name)[-1].lower()
+    def process_batch(self, file_paths):
+        # Consumer for the coalescing queue: filter, record, then persist once
+        started = time.perf_counter()
+        current_time = int(time.time())
+        touched = []
+        detected = []
+        ruleset = self.ruleset
+        matcher, roots = ruleset
+        matched = [file_path for file_path in file_paths
+                   if (self.matcher_for(file_path, ruleset) if roots else matcher).matches(file_path)]
+        filtered = len(file_paths) - len(matched)
+        if self.fingerprints is not None:
+            # Reads file content, so it runs before the lock is taken
+            matched = [file_path for file_path in matched if self.fingerprints.changed(file_path)]
+        with self.lock:
+            current_session = self.tracked_files.setdefault("current_session", SessionStore())
+            for file_path in matched:
+                # Full paths, so two main.py files in different projects stay apart
+                if current_session.touch(file_path, current_time):
+                    detected.append(file_path)
+                touched.append((file_path, current_time))
+            if touched and self.journal:
+                self.journal.append_many(touched)
+        EVENTS_RECEIVED.inc(len(file_paths))
+        if filtered:
+            EVENTS_FILTERED.inc(filtered)
+        if detected:
+            FILES_DETECTED.inc(len(detected))
+        BATCH_SECONDS.observe(time.perf_counter() - started)
 
-        if file_extension not in self.allowed_extensions:
-            return
-
-        # Exclude junk file patterns (e.g., browser cache, temporary files)
-        junk_patterns = [
-            ".br[1].js",  # Browser cache files
-            "[1].js",     # Temporary JavaScript files
-        # add more pattern later
-        ]
-        if any(pattern in file_name for pattern in junk_patterns):
-            return
+        for file_path in detected:
+            print(f"File Detected: {os.path.basename(file_path)}")
+        if detected and not self.journal:
+            self.save_tracked_files()
 
-        # Log relevant file
-        current_time = time.strftime("%Y-%m-%dT%H:%M:%S")
-        if "current_session" not in self.tracked_files:
-            self.tracked_files["current_session"] = {}
+    def handle_file_event(self, file_path):
+        self.process_batch([file_path])
 
-        if file_name not in self.tracked_files["current_session"]:
-            self.tracked_files["current_session"][file_name] = current_time
-            print(f"File Detected: {file_name}")
-
-            self.save_tracked_files()
+    def needs_seed(self):
+        """True while the stored history holds nothing a challenge could be built from."""
+        return not self.state_store.recent_files(1, RECENT_SESSIONS)
 
+    def seed(self, files):
+        """Record warm-start [(mtime, path)] as the previous session; returns the files recorded."""
+        touches = {}
+        with self.lock:
+            # A real session may have completed while the scan ran
+            if not self.needs_seed():
+                return 0
+            previous = self.tracked_files.setdefault("previous_session", SessionStore())
+            for mtime, file_path in files:
+                previous.touch(file_path, mtime, first_seen=mtime)
+                touches[file_path] = [int(mtime), int(mtime), 1]
+            if self.journal:
+                # Queued rotations land first, so "previous" is still the same generation
+                self.journal.flush()
+            with self.state_store.transaction() as conn:
+                self.state_store.record_touches(conn, touches, "previous_session")
+        precompute_challenge(self.state_store)
+        return len(touches)
 
     def save_tracked_files(self):
+        # Without a journal the whole state is written synchronously
         try:
-            with open("file_activity.json", "w") as file:
-                json.dump(self.tracked_files, file, indent=4)
-        except IOError as e:
+            with self.lock:
+                self.state_store.save_sessions(self.tracked_files)
+        except sqlite3.Error as e:
             print(f"Error saving file activity: {e}")
 
-def update_device_state(state_type):
-    try:
-        with open("device_state.json", "r") as state_file:
-            device_state = json.load(state_file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        device_state = {"last_awake": None, "last_sleep": None}
-
+def update_device_state(state_type, store=None):
+    store = store or StateStore()
     current_time = datetime.now().isoformat()
-    
-    if state_type == "awake":
-        # Only update wake time if we were previously sleeping
-        if device_state.get("last_sleep"):
-            device_state["last_awake"] = current_time
-    elif state_type == "sleep":
-        device_state["last_sleep"] = current_time
+
+    with store.transaction() as conn:
+        device_state = store.load_device_state() or {"last_awake": None, "last_sleep": None}
+        if state_type == "awake":
+            # Only update wake time if we were previously sleeping
+            if device_state.get("last_sleep"):
+                device_state["last_awake"] = current_time
+        elif state_type == "sleep":
+            device_state["last_sleep"] = current_time
+        store.save_device_state(device_state, conn)
+    # Committed: wake the DeviceStateWatcher
+    store.stamp_device_state()
+
+    if state_type == "sleep":
         # Transfer current session data to previous session when going to sleep
         transfer_session_data(tracked_files)
 
-    with open("device_state.json", "w") as state_file:
-        json.dump(device_state, state_file, indent=4)
+def transfer_session_data(tracked_files, journal=None, lock=None):
+    with TRANSFER_SECONDS.time():
+        _transfer_session_data(tracked_files, journal, lock)
+    for key, store in tracked_files.items():
+        SESSION_FILES.set(len(store), session=key)
 
-def transfer_session_data(tracked_files):
-    if "current_session" not in tracked_files:
-        tracked_files["current_session"] = {}
-    if "previous_session" not in tracked_files:
-        tracked_files["previous_session"] = {}
+def _transfer_session_data(tracked_files, journal, lock):
+    # lock is the handler's lock when the tracker is still receiving events
+    with lock or nullcontext():
+        if "current_session" not in tracked_files:
+            tracked_files["current_session"] = SessionStore()
+        if "previous_session" not in tracked_files:
+            tracked_files["previous_session"] = SessionStore()
 
-    current_session_files = tracked_files["current_session"]
+        current_session_files = tracked_files["current_session"]
+        replace = len(current_session_files) >= 3
 
-    if len(current_session_files) >= 3:
-        print("Transferring current session data to previous session (replacing previous session)...")
-        tracked_files["previous_session"] = current_session_files
-    else:
-        print("Merging current session data into previous session...")
-        tracked_files["previous_session"].update(current_session_files)
+        if replace:
+            print("Transferring current session data to previous session (replacing previous session)...")
+            tracked_files["previous_session"] = current_session_files
+        else:
+            print("Merging current session data into previous session...")
+            tracked_files["previous_session"].update(current_session_files)
 
-    tracked_files["current_session"] = {}
+        tracked_files["current_session"] = SessionStore(current_session_files.max_entries)
+        if journal:
+            # Queued behind every touch of the old session, ahead of the new one
+            journal.append_rotation(replace)
 
+    store = journal.store if journal else StateStore()
     try:
-        with open("file_activity.json", "w") as file:
-            json.dump(tracked_files, file, indent=4)
+        if journal:
+            journal.flush()
+        else:
+            with store.transaction() as conn:
+                store.rotate_sessions(conn, replace)
+                store.save_sessions(tracked_files, conn)
         print("Session data successfully updated.")
-    except IOError as e:
+    except sqlite3.Error as e:
         print(f"Error transferring session data: {e}")
+        return
+
+    # The previous session just changed, so prepare the next challenge now
+    # rather than on the resume critical path
+    try:
+        precompute_challenge(store)
+        print("Next challenge prepared.")
+    except sqlite3.Error as e:
+        print(f"Error preparing challenge: {e}")
 
-def monitor_system():
-    folder_to_watch = "C:\\"
-    print(f"Monitoring system-wide: {folder_to_watch}")
+def report_root_rates(roots):
+    for root in roots:
+        print(f"Root {root.path}: {root.events} events, {root.event_rate():.2f} events/sec "
+              f"across {len(root.watches)} watches")
 
-    tracked_files = {"previous_session": {}, "current_session": {}}
+def report_pollers(pollers):
+    for poller in pollers:
+        stats = poller.last_stats
+        if stats:
+            print(f"Poller {poller.root.path}: cycle {stats['cycle_time']:.2f}s, "
+                  f"{stats['dirs_scanned']} dirs scanned, {stats['dirs_skipped']} skipped, "
+                  f"index {stats['index_dirs']} dirs / {stats['index_files']} files / {stats['index_bytes']} bytes")
+        if isinstance(poller, AdaptiveWatcher):
+            stats = poller.adaptive_stats()
+            print(f"Adaptive {poller.root.path}: {stats['watches']} native watches, "
+                  f"{stats['promotions']} promotions, {stats['demotions']} demotions, "
+                  f"{stats['sampled']} changes caught by sampling instead of a watch "
+                  f"(mean delay {stats['mean_sample_delay']:.1f}s, max {stats['max_sample_delay']:.1f}s)")
 
-    try:
-        with open("file_activity.json", "r") as file:
-            tracked_files = json.load(file)
-            if not isinstance(tracked_files, dict):
-                tracked_files = {"previous_session": {}, "current_session": {}}
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Initializing file_activity.json...")
-        with open("file_activity.json", "w") as file:
-            json.dump(tracked_files, file, indent=4)
-
-    event_handler = FileMonitorHandler(tracked_files)
-    observer = Observer()
-    observer.schedule(event_handler, folder_to_watch, recursive=True)
-    observer.start()
+class FileTracker:
+    """The tracker as a component: start() begins watching, stop() releases the watches.
+
+    The journal, both session stores and the compiled rules outlive a
+    stop(), so a stopped tracker starts again without reloading state or
+    re-importing anything; only the observer and pollers are rebuilt.
+
+    With partition_by_user the handler is a UserRouter and every user under
+    profiles_dir gets their own sessions and database in users_dir. dedup
+    drops events whose file content did not change (see fingerprint.py).
+    adaptive_watches makes the default roots adaptive: native watches only
+    on directories with recent tracked activity, stat passes elsewhere.
+    warm_start walks the roots once on the first start() if the history is
+    empty and records the most recently modified files as the previous
+    session, so the first challenge does not fall back to placeholders.
+    With rules_path the path rules come from that file and are swapped into
+    the running handler when it changes, without touching the observer.
+    """
+
+    def __init__(self, fsync_policy="compact", max_session_entries=50000,
+                 queue_size=10000, coalesce_window=0.25, backpressure="drop_oldest",
+                 watch_roots=None, state_path=None, partition_by_user=False,
+                 profiles_dir=PROFILES_DIR, users_dir=USERS_DIR, dedup=False, warm_start=False,
+                 warm_start_workers=None, warm_start_budget=WARM_START_BUDGET, warm_start_depth=WARM_START_DEPTH,
+                 rules_path=None, adaptive_watches=False):
+        self.roots = watch_roots if watch_roots is not None else default_watch_roots(adaptive_watches)
+        self.event_queue = CoalescingQueue(queue_size, coalesce_window, backpressure)
+        self.fingerprints = FingerprintCache() if dedup else None
+        if partition_by_user:
+            self.journal = None
+            self.tracked_files = {}
+            self.handler = UserRouter(FileMonitorHandler, profiles_dir, users_dir, fsync_policy,
+                                      max_session_entries, event_queue=self.event_queue,
+                                      handler_options={"fingerprints": self.fingerprints})
+        else:
+            store = StateStore(state_path, synchronous=FSYNC_POLICIES[fsync_policy]) if state_path else None
+            self.journal = ActivityJournal(store, fsync=fsync_policy, max_entries=max_session_entries)
+            self.tracked_files = self.journal.load()
+            self.handler = FileMonitorHandler(self.tracked_files, journal=self.journal, event_queue=self.event_queue,
+                                              fingerprints=self.fingerprints)
+            self.journal.start()
+        self.observer = None
+        self.pollers = []
+        self.last_start_time = None
+        self.warm_start = warm_start
+        self.warm_start_options = {"workers": warm_start_workers, "budget": warm_start_budget,
+                                   "max_depth": warm_start_depth}
+        self.warm_scan = None
+        self.warm_thread = None
+        self.rules_watcher = RulesWatcher(rules_path, self.handler.apply_rules) if rules_path else None
+
+    @property
+    def running(self):
+        return self.observer is not None
+
+    def start(self):
+        """Schedule the watches; returns the seconds until the observer was running."""
+        if self.running:
+            return 0.0
+        started = time.perf_counter()
+        for root in self.roots:
+            if root.polling:
+                mode = f"polling every {root.poll_interval:g}s"
+            elif root.adaptive:
+                mode = f"adaptive, sampled every {root.poll_interval:g}s"
+            else:
+                mode = "recursive" if root.recursive else "top level only"
+            print(f"Monitoring {root.path} ({mode})")
+        self.event_queue.start(self.handler.process_batch)
+        if self.rules_watcher:
+            self.rules_watcher.start()
+        # Observer threads cannot be restarted, so every start gets a fresh one
+        self.observer = Observer()
+        # The rules watcher has read the file by now, so its exclusions shape the plan
+        watch_count = schedule_roots(self.observer, self.handler, self.roots, self.handler.rules)
+        self.observer.start()
+        self.pollers = [IncrementalPoller(root, self.handler, root.poll_interval) for root in self.roots if root.polling]
+        self.pollers += [AdaptiveWatcher(root, self.handler, self.observer, root.poll_interval)
+                         for root in self.roots if root.adaptive]
+        for poller in self.pollers:
+            poller.start()
+        self.last_start_time = time.perf_counter() - started
+        print(f"Observer started with {watch_count} watches in {self.last_start_time:.2f}s")
+        if self.warm_start and self.warm_thread is None:
+            # Off the start path: the watches are live while the scan runs
+            key = self.handler.user_of if not self.journal else None
+            self.warm_scan = WarmStartScan(self.roots, key=key, **self.warm_start_options)
+            self.warm_thread = threading.Thread(target=self._warm_start, name="WarmStart", daemon=True)
+            self.warm_thread.start()
+        return self.last_start_time
+
+    def _warm_start(self):
+        try:
+            if not self.handler.needs_seed():
+                return
+            found = self.warm_scan.run()
+            self.warm_scan.report()
+            seeded = self.handler.seed(found.get(None, []) if self.journal else found)
+            print(f"Warm start recorded {seeded} recently modified files")
+        except sqlite3.Error as e:
+            print(f"Error recording warm-start files: {e}")
+
+    def stop(self):
+        """Release the watches and flush everything recorded so far."""
+        if not self.running:
+            return
+        if self.warm_scan:
+            # Keeps what was found so far
+            self.warm_scan.stop()
+        if self.warm_thread:
+            self.warm_thread.join()
+        self.observer.stop()
+        self.observer.join()
+        self.observer = None
+        for poller in self.pollers:
+            poller.stop()
+        if self.rules_watcher:
+            self.rules_watcher.stop()
+        self.event_queue.stop()
+        if self.journal:
+            self.journal.flush()
+        else:
+            self.handler.flush()
+        print("Monitoring stopped.")
+
+    def suspend(self):
+        """Stop, end the session and make it durable before sleep; returns the seconds it took.
+
+        The tracker stays loaded, so the next start() needs no respawn.
+        """
+        started = time.perf_counter()
+        self.stop()
+        if self.journal:
+            transfer_session_data(self.tracked_files, self.journal, self.handler.lock)
+            self.journal.compact()
+        else:
+            self.handler.rotate(transfer_session_data)
+        return time.perf_counter() - started
+
+    def close(self):
+        """Stop, move the current session into the previous one and close the journal."""
+        self.stop()
+        if self.journal:
+            transfer_session_data(self.tracked_files, self.journal, self.handler.lock)
+            self.journal.compact()
+            self.journal.close()
+        else:
+            self.handler.close(transfer_session_data)
+        self.report()
+
+    def report(self):
+        stats = self.event_queue.stats()
+        print(f"Queue: {stats['received']} events, {stats['delivered']} after coalescing "
+              f"(ratio {stats['coalesce_ratio']:.2f}), {stats['dropped']} dropped, max depth {stats['max_depth']}")
+        if self.journal:
+            stats = self.journal.stats()
+            print(f"Journal: {stats['records_written']} records, {stats['bytes_written']} bytes written, "
+                  f"{stats['writes_per_sec']:.2f} writes/sec in {stats['flushes']} transactions")
+        if self.fingerprints is not None:
+            stats = self.fingerprints.stats()
+            print(f"Fingerprints: {stats['hits']} of {stats['lookups']} events unchanged "
+                  f"(hit rate {stats['hit_rate']:.1%}), {stats['bytes_hashed']} bytes hashed, "
+                  f"{stats['entries']} cached")
+        report_root_rates(self.roots)
+        report_pollers(self.pollers)
+        for key, store in self.tracked_files.items():
+            usage = store.memory_usage()
+            print(f"Session {key}: {usage['entries']} files, {usage['bytes']} bytes "
+                  f"({usage['bytes_per_entry']:.0f} bytes/file), {usage['evictions']} evicted")
+        if not self.journal:
+            for user, stats in self.handler.stats().items():
+                print(f"User {user}: {stats['files']} files this session, {stats['records']} records written")
+            if self.handler.unrouted:
+                print(f"{self.handler.unrouted} events outside every user profile were dropped")
+
+def monitor_system(fsync_policy="compact", max_session_entries=50000,
+                   queue_size=10000, coalesce_window=0.25, backpressure="drop_oldest",
+                   watch_roots=None, report_interval=300, rules_path=RULES_PATH):
+    tracker = FileTracker(fsync_policy, max_session_entries, queue_size, coalesce_window,
+                          backpressure, watch_roots, rules_path=rules_path)
+    exporter = start_exporter("tracker")
+    tracker.start()
 
     try:
+        last_report = time.monotonic()
         while True:
             time.sleep(10)
+            if time.monotonic() - last_report >= report_interval:
+                report_root_rates(tracker.roots)
+                report_pollers(tracker.pollers)
+                last_report = time.monotonic()
     except KeyboardInterrupt:
-        observer.stop()
-        print("Monitoring stopped.")
-        transfer_session_data(tracked_files)
+        pass
 
-    observer.join()
+    tracker.close()
+    exporter.stop()
 
 if __name__ == "__main__":
     update_device_state("awake")
@@ -0,0 +1,108 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from metrics import counter
+
+# Files up to this size are hashed whole; larger ones by sampled blocks
+SAMPLE_THRESHOLD = 256 * 1024
+SAMPLE_BLOCK = 16 * 1024
+SAMPLE_BLOCKS = 8
+
+EVENTS_UNCHANGED = counter("tracker_fingerprint_unchanged_total", "Events dropped because the file content had not changed")
+BYTES_HASHED = counter("tracker_fingerprint_bytes_hashed_total", "Bytes read to fingerprint files")
+
+
+def fingerprint(path, size, threshold=SAMPLE_THRESHOLD, block=SAMPLE_BLOCK, blocks=SAMPLE_BLOCKS):
+    """blake2b digest of the content, sampled for large files; returns (digest, bytes read)."""
+    digest = blake2b(digest_size=16)
+    digest.update(size.to_bytes(8, "little"))
+    with open(path, "rb") as file:
+        if size <= threshold:
+            data = file.read()
+            digest.update(data)
+            return digest.digest(), len(data)
+        # First and last block plus evenly spaced ones in between
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for i in range(blocks):
+                offset = (size - block) * i // (blocks - 1)
+                digest.update(view[offset:offset + block])
+    return digest.digest(), blocks * block
+
+
+class FingerprintCache:
+    """Tells real content changes apart from events that left the file as it was.
+
+    A path whose size and mtime match the cached entry is unchanged without
+    reading it (repeated events for one write). Otherwise the content is
+    fingerprinted and compared, which catches saves and touches that
+    rewrite the same bytes. The first event for a path, and any file that
+    cannot be read, always counts as a change. Least recently seen paths
+    are evicted past max_entries.
+    """
+
+    def __init__(self, max_entries=20000, threshold=SAMPLE_THRESHOLD, block=SAMPLE_BLOCK, blocks=SAMPLE_BLOCKS):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.block = block
+        self.blocks = blocks
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.stat_hits = 0
+        self.content_hits = 0
+        self.hashes = 0
+        self.bytes_hashed = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def changed(self, path):
+        self.lookups += 1
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return True
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            self.stat_hits += 1
+            EVENTS_UNCHANGED.inc()
+            return False
+        try:
+            digest, read = fingerprint(path, stat.st_size, self.threshold, self.block, self.blocks)
+        except (OSError, ValueError):
+            return True
+        self.hashes += 1
+        self.bytes_hashed += read
+        BYTES_HASHED.inc(read)
+        with self._lock:
+            self._entries[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if entry is not None and entry[2] == digest:
+            self.content_hits += 1
+            EVENTS_UNCHANGED.inc()
+            return False
+        return True
+
+    def stats(self):
+        hits = self.stat_hits + self.content_hits
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+            "stat_hits": self.stat_hits,
+            "content_hits": self.content_hits,
+            "hashes": self.hashes,
+            "bytes_hashed": self.bytes_hashed,
+            "evictions": self.evictions,
+        }
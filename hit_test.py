@@ -0,0 +1,67 @@
+WM_MOUSEMOVE = 0x0200
+WM_LBUTTONDOWN = 0x0201
+
+# Half-size of the square around each clickable widget's centre that accepts clicks
+CLICK_RADIUS = 50
+
+
+def build_rects(centres, radius=CLICK_RADIUS):
+    """(left, top, right, bottom) squares around each centre, sorted by top edge."""
+    return sorted(((x - radius, y - radius, x + radius, y + radius) for x, y in centres), key=lambda rect: rect[1])
+
+
+class MouseFilter:
+    """Decides, inside the low-level mouse hook, which events reach the desktop.
+
+    While locked only left clicks inside the precomputed rectangles pass;
+    everything else, moves first, is rejected before any Qt or win32 call.
+    The rectangles come from centres() (the only part that touches Qt) and
+    are rebuilt lazily after invalidate(), which the app calls on geometry
+    and show events.
+    """
+
+    def __init__(self, centres, radius=CLICK_RADIUS):
+        self.centres = centres
+        self.radius = radius
+        self.unlocked = False
+        self.rects = None
+        self.bounds = None
+        self.events = 0
+        self.clicks = 0
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self.rects = None
+
+    def rebuild(self):
+        self.rects = build_rects(self.centres(), self.radius)
+        if self.rects:
+            self.bounds = (min(r[0] for r in self.rects), min(r[1] for r in self.rects),
+                           max(r[2] for r in self.rects), max(r[3] for r in self.rects))
+        else:
+            self.bounds = (0, 0, -1, -1)
+        self.rebuilds += 1
+
+    def allow(self, message, position):
+        """True to pass the event on, False to swallow it."""
+        self.events += 1
+        if self.unlocked:
+            return True
+        if message != WM_LBUTTONDOWN:
+            return False
+        self.clicks += 1
+        if self.rects is None:
+            self.rebuild()
+        x, y = position
+        left, top, right, bottom = self.bounds
+        if x < left or x > right or y < top or y > bottom:
+            return False
+        for left, top, right, bottom in self.rects:
+            if top > y:
+                break
+            if left <= x <= right and y <= bottom:
+                return True
+        return False
+
+    def stats(self):
+        return {"events": self.events, "clicks": self.clicks, "rebuilds": self.rebuilds}
@@ -1,23 +1,59 @@
-import multiprocessing
-import time
+import asyncio
 import os
-import sys
-import json
 import signal
-from subprocess import Popen
-from datetime import datetime
+import threading
 import win32api
 import win32con
+import win32event
+import win32file
 import win32gui
-import win32ts
-
-class PowerStateMonitor:
-    def __init__(self, tracker_process_ref):
+from state_store import StateStore, DeviceStateWatcher
+from tracker_worker import TrackerWorker
+from auth_standby import StandbyAuthApp
+from metrics import start_exporter
+from rules_config import RULES_PATH
+from supervisor import Supervisor, PowerEventSource, SUSPEND, RESUME, STATE_CHANGED
+
+# Device state, handled-wake marker and file sessions share one database
+state_store = StateStore()
+# In-memory device state, re-read only when some process writes it
+device_state = DeviceStateWatcher(state_store)
+
+# Shared (terminal server) hosts keep each user's sessions apart; dedup
+# drops events from saves and scans that leave the content unchanged;
+# warm start seeds an empty history from a scan of recently modified files;
+# edits to the rules file apply to the running tracker; adaptive watches
+# keep native watches to active directories and sample the rest
+TRACKER_OPTIONS = {
+    "rules_path": RULES_PATH,
+    "partition_by_user": os.environ.get("TRACKER_PARTITION_BY_USER") == "1",
+    "dedup": os.environ.get("TRACKER_DEDUP") == "1",
+    "warm_start": os.environ.get("TRACKER_WARM_START") != "0",
+    "adaptive_watches": os.environ.get("TRACKER_ADAPTIVE_WATCHES") == "1",
+}
+
+# Longest the event thread sleeps without a window message or state directory change
+STATE_WAIT_TIMEOUT_MS = 60000
+
+class Win32PowerSource(PowerEventSource):
+    """Power broadcasts and state directory changes, pumped on their own thread.
+
+    The hidden window and the directory change handle belong to the event
+    thread, so the supervisor's loop is never inside a Win32 wait and a
+    long-running auth app cannot hold broadcasts in the message queue.
+    """
+
+    def __init__(self, state_path):
+        super().__init__()
         self.WM_POWERBROADCAST = 0x0218
         self.PBT_APMRESUMEAUTOMATIC = 0x0012
         self.PBT_APMSUSPEND = 0x0004
-        self.tracker_process_ref = tracker_process_ref
-        
+        self.state_path = state_path
+        self.hwnd = None
+        self.thread = None
+        self._stopped = threading.Event()
+        self._ready = threading.Event()
+
     def create_window(self):
         """Create a hidden window to receive power broadcasts"""
         wc = win32gui.WNDCLASS()
@@ -40,199 +76,80 @@ class PowerStateMonitor:
         """Window procedure to handle power broadcast messages"""
         if msg == self.WM_POWERBROADCAST:
             if wparam == self.PBT_APMRESUMEAUTOMATIC:
-                self._on_resume()
+                self.emit(RESUME)
             elif wparam == self.PBT_APMSUSPEND:
-                self._on_suspend()
+                self.emit(SUSPEND)
         return win32gui.DefWindowProc(hwnd, msg, wparam, lparam)
 
-    def _on_suspend(self):
-        """Handle system suspend event"""
-        print("[Service] System entering sleep state")
-        # Stop file tracker if running
-        if self.tracker_process_ref.get('process') and self.tracker_process_ref['process'].is_alive():
-            print("[Service] Stopping file tracker before sleep")
-            self.tracker_process_ref['process'].terminate()
-            self.tracker_process_ref['process'].join()
-            self.tracker_process_ref['process'] = None
-
-        current_state = load_device_state()
-        if current_state:
-            current_state["last_sleep"] = datetime.now().isoformat()
-            save_device_state(current_state)
-
-    def _on_resume(self):
-        """Handle system resume event"""
-        print("[Service] System resuming from sleep state")
-        current_state = load_device_state()
-        if current_state:
-            current_state["last_awake"] = datetime.now().isoformat()
-            save_device_state(current_state)
-            
-        # Clear the handled_state.json to force authentication
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="PowerEvents", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        try:
+            self.hwnd = self.create_window()
+        finally:
+            self._ready.set()
+        change_handle = watch_state_directory(self.state_path)
         try:
-            os.remove("handled_state.json")
-        except FileNotFoundError:
-            pass
-
-def initialize_device_state():
-    """Initialize the device state file with default values."""
-    current_time = datetime.now().isoformat()
-    initial_state = {
-        "last_awake": current_time,
-        "last_sleep": None
-    }
+            while not self._stopped.is_set():
+                if wait_for_wakeup(change_handle):
+                    self.emit(STATE_CHANGED)
+                win32gui.PumpWaitingMessages()
+        finally:
+            if change_handle:
+                win32file.FindCloseChangeNotification(change_handle)
+            win32gui.DestroyWindow(self.hwnd)
+
+    def stop(self):
+        self._stopped.set()
+        if self.hwnd:
+            # Wake the message wait so the thread sees the stop
+            win32gui.PostMessage(self.hwnd, win32con.WM_NULL, 0, 0)
+        if self.thread:
+            self.thread.join(5)
+
+def watch_state_directory(path):
+    """Change notification on the directory holding the state database, or None."""
+    directory = os.path.dirname(os.path.abspath(path))
     try:
-        with open("device_state.json", "w") as state_file:
-            json.dump(initial_state, state_file, indent=4)
-        return initial_state
-    except IOError as e:
-        print(f"[Service] Error initializing device state: {e}")
+        return win32file.FindFirstChangeNotification(
+            directory, False, win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_SIZE
+        )
+    except win32api.error as e:
+        print(f"[Service] State directory notifications unavailable, polling instead: {e}")
         return None
 
-def load_device_state(set_awake=False):
-    """Load the device state, initialize if not present."""
-    try:
-        with open("device_state.json", "r") as state_file:
-            state = json.load(state_file)
-            if "last_awake" not in state or "last_sleep" not in state:
-                return initialize_device_state()
-            
-            if set_awake:
-                state["last_awake"] = datetime.now().isoformat()
-                save_device_state(state)
-            
-            return state
-    except (FileNotFoundError, json.JSONDecodeError):
-        return initialize_device_state()
-
-def save_device_state(state):
-    """Save the device state."""
-    try:
-        with open("device_state.json", "w") as state_file:
-            json.dump(state, state_file, indent=4)
-    except IOError as e:
-        print(f"[Service] Error saving device state: {e}")
+def wait_for_wakeup(change_handle, timeout_ms=STATE_WAIT_TIMEOUT_MS):
+    """Block until a window message arrives, the state directory changes or the timeout passes.
 
-def load_last_handled_awake():
-    """Load the last handled wake-up timestamp from a file."""
-    try:
-        with open("handled_state.json", "r") as state_file:
-            state = json.load(state_file)
-            return datetime.fromisoformat(state.get("last_handled_awake"))
-    except (FileNotFoundError, ValueError, json.JSONDecodeError):
-        return None
-
-def save_last_handled_awake(timestamp):
-    """Save the last handled wake-up timestamp to a file."""
-    try:
-        with open("handled_state.json", "w") as state_file:
-            json.dump({"last_handled_awake": timestamp.isoformat()}, state_file)
-    except IOError as e:
-        print(f"[Service] Error saving handled state: {e}")
-
-def run_file_tracker():
-    """Run the file tracker."""
-    print("[Service] Starting file tracker...")
-    os.system("python file_tracker.py")
-
-def launch_auth_app():
-    """Run the authentication app and block until it exits."""
-    print("[Service] Starting auth app...")
-    process = Popen([sys.executable, "auth_app.py"])
-    process.wait()
-    print("[Service] Auth app exited.")
-
-def cleanup_handler(tracker_process_ref=None):
-    """Handle cleanup when service is shutting down."""
-    print("[Service] Performing cleanup...")
-    
-    # Stop the file tracker if it's running
-    if tracker_process_ref and tracker_process_ref.get('process') and tracker_process_ref['process'].is_alive():
-        print("[Service] Stopping file tracker...")
-        tracker_process_ref['process'].terminate()
-        tracker_process_ref['process'].join()
-
-    # Update device state with sleep time
-    current_state = load_device_state()
-    if current_state:
-        current_state["last_sleep"] = datetime.now().isoformat()
-        save_device_state(current_state)
-        print("[Service] Updated device state with sleep time")
+    Returns True if the state directory changed.
+    """
+    handles = [change_handle] if change_handle else []
+    result = win32event.MsgWaitForMultipleObjects(handles, False, timeout_ms, win32event.QS_ALLINPUT)
+    if change_handle and result == win32event.WAIT_OBJECT_0:
+        win32file.FindNextChangeNotification(change_handle)
+        return True
+    return False
 
 def monitor_device_state():
-    print("[Service] Initializing device state monitoring...")
-    handled_awake = load_last_handled_awake()
-    tracker_process_ref = {'process': None}  # Using a dict to store the process reference
-    power_monitor = PowerStateMonitor(tracker_process_ref)
-    monitor_window = power_monitor.create_window()
-    
-    print("[Service] Loaded last handled awake:", handled_awake)
-
-    # Set new wake time on startup
-    current_state = load_device_state(set_awake=True)
-    print("[Service] Set new wake time on startup")
+    supervisor = Supervisor(Win32PowerSource(state_store.path), state_store, device_state,
+                            TrackerWorker(TRACKER_OPTIONS), StandbyAuthApp())
+    exporter = start_exporter("service")
 
     def signal_handler(signum, frame):
         print("[Service] Received shutdown signal...")
-        cleanup_handler(tracker_process_ref)
-        win32gui.DestroyWindow(monitor_window)
-        sys.exit(0)
+        supervisor.request_stop()
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
-
-    while True:
-        try:
-            win32gui.PumpWaitingMessages()
-            current_state = load_device_state()
-
-            if not current_state:
-                print("[Service] Unable to load device state, retrying in 5 seconds...")
-                time.sleep(5)
-                continue
-
-            current_awake = datetime.fromisoformat(current_state["last_awake"]) if current_state.get("last_awake") else None
-            current_sleep = datetime.fromisoformat(current_state["last_sleep"]) if current_state.get("last_sleep") else None
-
-            is_new_wake = (
-                current_awake and 
-                (
-                    (not current_sleep) or
-                    (current_awake > current_sleep)
-                ) and
-                (not handled_awake or current_awake > handled_awake)
-            )
-
-            if is_new_wake:
-                print(f"[Service] Device wake detected at {current_awake}")
-                handled_awake = current_awake
-                save_last_handled_awake(handled_awake)
-
-                if tracker_process_ref.get('process') and tracker_process_ref['process'].is_alive():
-                    print("[Service] Stopping file tracker before auth.")
-                    tracker_process_ref['process'].terminate()
-                    tracker_process_ref['process'].join()
-
-                launch_auth_app()
-
-                print("[Service] Starting file tracker after auth.")
-                tracker_process_ref['process'] = multiprocessing.Process(target=run_file_tracker)
-                tracker_process_ref['process'].start()
-
-                current_state["last_sleep"] = None
-                save_device_state(current_state)
-
-        except Exception as e:
-            print(f"[Service] Error in monitor loop: {e}")
-            time.sleep(5)
-            continue
-
-        time.sleep(1)
+    try:
+        asyncio.run(supervisor.run())
+    finally:
+        exporter.stop()
 
 if __name__ == "__main__":
     print("[Service] Starting main service...")
-    try:
-        monitor_device_state()
-    except KeyboardInterrupt:
-        print("[Service] Stopping service...")
-        cleanup_handler()
\ No newline at end of file
+    monitor_device_state()
+    print("[Service] Stopping service...")
@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import get_ident
+
+# Seconds; covers hook callbacks through resume-to-unlock
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_DIR = os.environ.get("TRACKER_METRICS_DIR", "metrics")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value, quote=True):
+    # Text format escapes: backslash and newline always, double quotes in label values
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values.
+
+    Every thread adds into its own cell, so inc() never takes a lock; the
+    cells are summed when the metrics are exported.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._cells = {}
+
+    def _cell(self):
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), {})
+        return cell
+
+    def inc(self, amount=1, **labels):
+        cell = self._cells.get(get_ident()) or self._cell()
+        key = _label_key(labels)
+        cell[key] = cell.get(key, 0) + amount
+
+    def _totals(self):
+        totals = {}
+        for cell in list(self._cells.values()):
+            for key, value in dict(cell).items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def value(self, **labels):
+        return self._totals().get(_label_key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self._totals().items()]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[_label_key(labels)] = value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in dict(self._values).items()]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with per-thread cells like Counter."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._cells = {}
+
+    def observe(self, value, **labels):
+        cell = self._cells.get(get_ident())
+        if cell is None:
+            cell = self._cells.setdefault(get_ident(), {})
+        key = _label_key(labels)
+        series = cell.get(key)
+        if series is None:
+            series = cell[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _totals(self):
+        totals = {}
+        for cell in list(self._cells.values()):
+            for key, (counts, total, count) in dict(cell).items():
+                merged = totals.get(key)
+                if merged is None:
+                    merged = totals[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return totals
+
+    def count(self, **labels):
+        series = self._totals().get(_label_key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        result = []
+        for key, (counts, total, count) in self._totals().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                result.append((self.name + "_bucket", key + (("le", le),), cumulative))
+            result.append((self.name + "_sum", key, total))
+            result.append((self.name + "_count", key, count))
+        return result
+
+
+class Registry:
+    """Process-wide set of metrics, created on first use by name."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, *args):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, *args)
+        if not isinstance(metric, cls):
+            raise ValueError(f"metric {name} already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets)
+
+    def to_prometheus(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {_escape(metric.help, quote=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        data = {}
+        for metric in list(self._metrics.values()):
+            data[metric.name] = {
+                "type": metric.kind,
+                "help": metric.help,
+                "samples": [{"name": name, "labels": dict(key), "value": value}
+                            for name, key, value in metric.samples()],
+            }
+        return data
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class MetricsExporter:
+    """Rewrites a metrics file every interval seconds for a local scraper.
+
+    The file is written next to its final name and swapped in with
+    os.replace, so a reader never sees a half-written file. A .json path
+    gets JSON, anything else the Prometheus text format (suitable for the
+    node_exporter textfile collector).
+    """
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.path.endswith(".json"):
+            content = json.dumps(self.registry.to_dict(), indent=1)
+        else:
+            content = self.registry.to_prometheus()
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(content)
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+
+    def stop(self):
+        """Stop and write a final snapshot."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.write()
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+
+def start_exporter(component, directory=METRICS_DIR, interval=15.0):
+    """Export this process's metrics to <directory>/<component>.prom."""
+    gauge("process_start_time_seconds", "Unix time the process started").set(time.time(), component=component)
+    return MetricsExporter(os.path.join(directory, f"{component}.prom"), interval).start()
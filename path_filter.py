@@ -0,0 +1,82 @@
+import re
+
+DEFAULT_ALLOWED_EXTENSIONS = ['.py', '.docx', '.xlsx', '.txt', '.html', '.css', '.js']
+# Matched per folder, so sibling trees such as Program Files (x86) need their own entry
+DEFAULT_EXCLUDED_DIRS = ['C:\\Windows', 'C:\\Program Files', 'C:\\Program Files (x86)', 'C:\\ProgramData']
+DEFAULT_JUNK_PATTERNS = [
+    ".br[1].js",  # Browser cache files
+    "[1].js",     # Temporary JavaScript files
+]
+
+_TERMINAL = object()
+
+
+def split_path(path, maxsplit=-1):
+    """Split a path into lower-cased components, accepting either separator."""
+    return path.replace("/", "\\").lower().split("\\", maxsplit)
+
+
+class PathMatcher:
+    """Compiled form of the tracker's path rules, built once and reused per event."""
+
+    def __init__(self, allowed_extensions=None, excluded_dirs=None, junk_patterns=None):
+        if allowed_extensions is None:
+            allowed_extensions = DEFAULT_ALLOWED_EXTENSIONS
+        if excluded_dirs is None:
+            excluded_dirs = DEFAULT_EXCLUDED_DIRS
+        if junk_patterns is None:
+            junk_patterns = DEFAULT_JUNK_PATTERNS
+
+        self.allowed_extensions = frozenset(ext.lower() for ext in allowed_extensions)
+        self.excluded_dirs = tuple(excluded_dirs)
+        self.junk_patterns = tuple(junk_patterns)
+
+        # Prefix trie over path components, a root is excluded with everything below it
+        self.excluded_trie = {}
+        self.excluded_depth = 0
+        for excluded in self.excluded_dirs:
+            node = self.excluded_trie
+            parts = split_path(excluded.rstrip("\\/"))
+            for part in parts:
+                node = node.setdefault(part, {})
+            node[_TERMINAL] = True
+            self.excluded_depth = max(self.excluded_depth, len(parts))
+
+        # One alternation for all junk name fragments instead of a scan per pattern
+        if self.junk_patterns:
+            self.junk_regex = re.compile("|".join(re.escape(p) for p in self.junk_patterns))
+        else:
+            self.junk_regex = None
+
+    def is_excluded(self, file_path):
+        """Return True if the path lies under one of the excluded roots."""
+        node = self.excluded_trie
+        if not node:
+            return False
+        # Only the leading components can ever reach a terminal node
+        for part in split_path(file_path, self.excluded_depth):
+            node = node.get(part)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def is_junk(self, file_name):
+        """Return True if the file name matches a junk pattern."""
+        return self.junk_regex is not None and self.junk_regex.search(file_name) is not None
+
+    def matches(self, file_path):
+        """Return True if an event for this path should be tracked."""
+        # Cheapest and most selective check first: most events are for untracked types.
+        # No allowed extension contains a separator, so the tail after the last dot is enough.
+        dot = file_path.rfind(".")
+        if dot < 0 or file_path[dot:].lower() not in self.allowed_extensions:
+            return False
+        start = max(file_path.rfind("\\"), file_path.rfind("/")) + 1
+        # Same rule as os.path.splitext: leading dots do not start an extension
+        if dot <= start or not file_path[start:dot].strip("."):
+            return False
+        if self.junk_regex is not None and self.junk_regex.search(file_path, start) is not None:
+            return False
+        return not self.is_excluded(file_path)
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+from path_filter import DEFAULT_ALLOWED_EXTENSIONS, DEFAULT_EXCLUDED_DIRS, DEFAULT_JUNK_PATTERNS
+from metrics import counter, histogram
+
+# Tracker path rules, re-read while the tracker runs
+RULES_PATH = os.environ.get("TRACKER_RULES_PATH", "tracker_rules.json")
+RULES_CHECK_INTERVAL = 2.0
+
+RULE_DEFAULTS = {
+    "allowed_extensions": DEFAULT_ALLOWED_EXTENSIONS,
+    "excluded_dirs": DEFAULT_EXCLUDED_DIRS,
+    "junk_patterns": DEFAULT_JUNK_PATTERNS,
+}
+
+RELOADS = counter("tracker_rules_reloads_total", "Rule sets compiled and swapped into the handler")
+RELOAD_ERRORS = counter("tracker_rules_reload_errors_total", "Rules files that could not be read; the old rules stay")
+RELOAD_SECONDS = histogram("tracker_rules_reload_seconds", "Time from noticing a rules file change to the swap")
+
+
+def load_rules(path):
+    """Read a rules file into {key: [str]}; keys it leaves out keep their defaults.
+
+    Raises ValueError for content that is not a JSON object of string lists.
+    """
+    with open(path, "r") as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError("rules file must hold a JSON object")
+    unknown = set(data) - set(RULE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown rules: {', '.join(sorted(unknown))}")
+    rules = {}
+    for key, default in RULE_DEFAULTS.items():
+        value = data.get(key, default)
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{key} must be a list of strings")
+        rules[key] = list(value)
+    return rules
+
+
+class RulesWatcher:
+    """Polls the rules file and hands every new version to apply(rules).
+
+    A check is one stat() while the file is unchanged. apply gets None
+    when the file is missing, which means the built-in rules; a file that
+    does not parse is reported and the rules in force stay. The first
+    check runs in start(), so the tracker's first events already use the
+    file's rules.
+    """
+
+    def __init__(self, path, apply, interval=RULES_CHECK_INTERVAL):
+        self.path = path
+        self.apply = apply
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self.last_reload_time = None
+        self._signature = None
+        self._started = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """Reload if the file changed since the last check; returns True if rules were swapped."""
+        signature = self.signature()
+        if self._started and signature == self._signature:
+            return False
+        first = not self._started
+        self._started = True
+        self._signature = signature
+        if signature is None and first:
+            # No file: the handler already runs the built-in rules
+            return False
+        started = time.perf_counter()
+        try:
+            rules = load_rules(self.path) if signature is not None else None
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            RELOAD_ERRORS.inc()
+            print(f"Rules file {self.path} not applied, keeping the current rules: {e}")
+            return False
+        self.apply(rules)
+        self.last_reload_time = time.perf_counter() - started
+        RELOAD_SECONDS.observe(self.last_reload_time)
+        self.reloads += 1
+        RELOADS.inc()
+        print(f"Rules {'reloaded from ' + self.path if rules else 'reset to the built-in defaults'} "
+              f"in {self.last_reload_time * 1000:.1f} ms")
+        return True
+
+    def start(self):
+        self.check()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="RulesWatcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error checking rules file: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,79 @@
+import time
+from PyQt5.QtCore import QObject, QTimer
+
+
+class AdaptiveScheduler(QObject):
+    """One single-shot timer for all of the auth app's periodic checks.
+
+    Each task returns True when it had to act. While every task reports
+    nothing to do the interval doubles, up to max_interval; it drops back to
+    min_interval when a task acts or when poke() reports a focus or
+    activation change, so the checks run often only while something happens.
+    """
+
+    def __init__(self, min_interval=100, max_interval=2000, parent=None):
+        super().__init__(parent)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.tasks = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._run)
+        self.active = False
+
+        self.started_at = None
+        self.wakeups = 0
+        self.actions = 0
+        self.pokes = 0
+        self.callback_time = 0.0
+
+    def add(self, task):
+        self.tasks.append(task)
+
+    def start(self):
+        self.active = True
+        self.started_at = time.monotonic()
+        self.interval = self.min_interval
+        self.timer.start(self.interval)
+
+    def stop(self):
+        self.active = False
+        self.timer.stop()
+
+    def poke(self):
+        """Something changed: run the checks on the next event loop pass and poll closely again."""
+        if not self.active:
+            return
+        self.pokes += 1
+        self.interval = self.min_interval
+        self.timer.start(0)
+
+    def _run(self):
+        self.wakeups += 1
+        started = time.perf_counter()
+        acted = False
+        for task in self.tasks:
+            try:
+                acted = bool(task()) or acted
+            except Exception as e:
+                print(f"Error in scheduled check: {e}")
+        self.callback_time += time.perf_counter() - started
+        if acted:
+            self.actions += 1
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        if self.active:
+            self.timer.start(self.interval)
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9) if self.started_at else 0.0
+        return {
+            "wakeups": self.wakeups,
+            "wakeups_per_sec": self.wakeups / elapsed if elapsed else 0.0,
+            "actions": self.actions,
+            "pokes": self.pokes,
+            "callback_ms": self.callback_time * 1000,
+            "interval_ms": self.interval,
+        }
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+from array import array
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def format_timestamp(epoch):
+    return time.strftime(TIME_FORMAT, time.localtime(epoch))
+
+
+def parse_timestamp(value):
+    """Accept either an epoch integer or the legacy strftime string."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(time.mktime(time.strptime(value, TIME_FORMAT)))
+    except (TypeError, ValueError):
+        return int(time.time())
+
+
+class FileRecord:
+    """Read-only view of one tracked file, built on demand from the store's arrays."""
+
+    __slots__ = ("path", "first_seen", "last_seen", "touches")
+
+    def __init__(self, path, first_seen, last_seen, touches):
+        self.path = path
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.touches = touches
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def to_dict(self):
+        return {
+            "first_seen": format_timestamp(self.first_seen),
+            "last_seen": format_timestamp(self.last_seen),
+            "touches": self.touches,
+        }
+
+
+class SessionStore:
+    """Files seen during one session, keyed by full path and capped with LRU eviction.
+
+    Each file gets a slot in parallel arrays (path, epoch first/last seen,
+    touch count) instead of a dict of strftime strings; the path -> slot dict
+    is kept in touch order, so the least recently touched file is always first
+    in line for eviction and its slot is reused by the next new file.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._slots = {}
+        self._paths = []
+        self._first_seen = array("q")
+        self._last_seen = array("q")
+        self._touches = array("L")
+        self._free = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, path):
+        return path in self._slots
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def paths(self):
+        return list(self._slots)
+
+    def _record(self, slot):
+        return FileRecord(self._paths[slot], self._first_seen[slot], self._last_seen[slot], self._touches[slot])
+
+    def get(self, path):
+        slot = self._slots.get(path)
+        return None if slot is None else self._record(slot)
+
+    def records(self):
+        return [self._record(slot) for slot in self._slots.values()]
+
+    def touch(self, path, timestamp=None, count=1, first_seen=None):
+        """Record activity on a file; return True if it was not in the session yet."""
+        now = int(time.time()) if timestamp is None else int(timestamp)
+        slots = self._slots
+        slot = slots.pop(path, None)
+        if slot is not None:
+            slots[path] = slot
+            self._touches[slot] += count
+            if now > self._last_seen[slot]:
+                self._last_seen[slot] = now
+            if first_seen is not None and first_seen < self._first_seen[slot]:
+                self._first_seen[slot] = first_seen
+            return False
+
+        # The dict key and the paths array share one string object, so
+        # interning would only add an entry to the interpreter's intern table.
+        first = now if first_seen is None else int(first_seen)
+        if self._free:
+            slot = self._free.pop()
+            self._paths[slot] = path
+            self._first_seen[slot] = first
+            self._last_seen[slot] = now
+            self._touches[slot] = count
+        else:
+            slot = len(self._paths)
+            self._paths.append(path)
+            self._first_seen.append(first)
+            self._last_seen.append(now)
+            self._touches.append(count)
+        slots[path] = slot
+
+        if self.max_entries is not None and len(slots) > self.max_entries:
+            evicted = slots.pop(next(iter(slots)))
+            self._paths[evicted] = None
+            self._free.append(evicted)
+            self.evictions += 1
+        return True
+
+    def update(self, other):
+        """Merge another store in, adding touch counts and keeping the widest seen range."""
+        for record in other.records():
+            self.touch(record.path, record.last_seen, record.touches, record.first_seen)
+
+    def to_dict(self):
+        return {record.path: record.to_dict() for record in self.records()}
+
+    @classmethod
+    def from_dict(cls, data, max_entries=None):
+        store = cls(max_entries)
+        if isinstance(data, dict):
+            for path, value in data.items():
+                if isinstance(value, dict):
+                    first_seen = parse_timestamp(value.get("first_seen"))
+                    last_seen = parse_timestamp(value.get("last_seen", value.get("first_seen")))
+                    store.touch(path, last_seen, int(value.get("touches", 1)), first_seen)
+                else:
+                    # Legacy layout: basename -> first-seen time
+                    store.touch(path, parse_timestamp(value))
+        return store
+
+    def memory_usage(self):
+        """Approximate bytes held by the store, for sizing long sessions."""
+        total = sys.getsizeof(self._slots) + sys.getsizeof(self._paths) + sys.getsizeof(self._free)
+        total += sum(sys.getsizeof(a) for a in (self._first_seen, self._last_seen, self._touches))
+        total += sum(sys.getsizeof(path) for path in self._slots)
+        entries = len(self._slots)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "bytes": total,
+            "bytes_per_entry": total / entries if entries else 0,
+        }
+
+
+def new_activity(max_entries=None):
+    return {"previous_session": SessionStore(max_entries), "current_session": SessionStore(max_entries)}
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from watch_roots import normalize
+
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    files TEXT NOT NULL,
+    subdirs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def rules_key(matcher):
+    """The rules a matcher was compiled from, as a string to compare indexes by."""
+    return json.dumps([sorted(matcher.allowed_extensions), sorted(matcher.excluded_dirs),
+                       sorted(matcher.junk_patterns)])
+
+
+class SnapshotIndex:
+    """Persisted directory snapshot keyed by each directory's own mtime.
+
+    Only directories whose mtime changed since the last cycle are listed
+    again; unchanged directories cost one stat plus a stat per tracked file
+    they hold, to catch in-place writes that do not touch the directory.
+
+    The index is a SQLite database with one row per directory, and save()
+    writes only the directories that changed since the last save, so a
+    pass over a drive where little changed writes a few rows, not the index.
+
+    Listings depend on the rules (which files are kept, which directories
+    are pruned), so the index records the rules it was built under. The
+    first pass under other rules lists every directory again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = {}
+        self.rules = None
+        self.last_scan_ns = None
+        self._matcher = None
+        self._rules_changed = False
+        self._changed = set()
+        self._removed = set()
+        self._conn = None
+
+    @property
+    def dirty(self):
+        return bool(self._changed or self._removed or self._rules_changed)
+
+    def _connection(self):
+        if self._conn is None:
+            # The poller thread does the scans; stop() may save from another thread
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def load(self):
+        self.dirs = {}
+        try:
+            conn = self._connection()
+            if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                conn.execute("DELETE FROM dirs")
+                conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            for path, mtime, files, subdirs in conn.execute("SELECT path, mtime, files, subdirs FROM dirs"):
+                self.dirs[path] = {"mtime": mtime, "files": json.loads(files), "subdirs": json.loads(subdirs)}
+            row = conn.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+            self.rules = row[0] if row else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Snapshot index {self.path} unreadable, starting a new one: {e}")
+            self.dirs = {}
+            self.rules = None
+        self._matcher = None
+        self._rules_changed = False
+        self._changed.clear()
+        self._removed.clear()
+        return self
+
+    def save(self):
+        """Write the directories changed or removed since the last save in one transaction."""
+        if not self.dirty:
+            return
+        conn = self._connection()
+        rows = []
+        for path in self._changed:
+            entry = self.dirs[path]
+            rows.append((path, entry["mtime"], json.dumps(entry["files"]), json.dumps(entry["subdirs"])))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM dirs WHERE path = ?", [(path,) for path in self._removed])
+            conn.executemany("INSERT OR REPLACE INTO dirs (path, mtime, files, subdirs) VALUES (?, ?, ?, ?)", rows)
+            if self._rules_changed:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules', ?)", (self.rules,))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._changed.clear()
+        self._removed.clear()
+        self._rules_changed = False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def file_count(self):
+        return sum(len(entry["files"]) for entry in self.dirs.values())
+
+    def _rules_differ(self, matcher):
+        """Adopt the matcher's rules; True if the index was built under other ones."""
+        if matcher is self._matcher:
+            return False
+        self._matcher = matcher
+        key = rules_key(matcher)
+        if key == self.rules:
+            return False
+        self.rules = key
+        self._rules_changed = True
+        return True
+
+    def scan(self, root_path, matcher, excluded=(), recursive=True):
+        """Walk the tree once; return ([(kind, path)], stats) for changes since the last scan.
+
+        Directories the matcher excludes are pruned, as are the excluded
+        paths given. Under new rules every directory is listed again; a file
+        that only now matches is indexed without an event unless it changed
+        after the previous scan.
+        """
+        excluded = {normalize(path) for path in excluded}
+        relist = self._rules_differ(matcher) and bool(self.dirs)
+        baseline = not self.dirs
+        # With new rules a file missing from the index may be old; only report recent ones
+        since = self.last_scan_ns if relist else None
+        started_ns = time.time_ns()
+        events = []
+        seen = set()
+        scanned = skipped = files_statted = 0
+        stack = [root_path]
+
+        while stack:
+            directory = stack.pop()
+            try:
+                dir_mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(directory)
+            entry = self.dirs.get(directory)
+
+            if entry is not None and entry["mtime"] == dir_mtime and not relist:
+                skipped += 1
+                files = entry["files"]
+                for name, (mtime, size) in list(files.items()):
+                    path = os.path.join(directory, name)
+                    files_statted += 1
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if st.st_mtime_ns != mtime or st.st_size != size:
+                        files[name] = [st.st_mtime_ns, st.st_size]
+                        events.append(("modified", path))
+                        self._changed.add(directory)
+                if recursive:
+                    stack.extend(os.path.join(directory, name) for name in entry["subdirs"])
+                continue
+
+            scanned += 1
+            old_files = entry["files"] if entry is not None else {}
+            files = {}
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for item in entries:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                if normalize(item.path) not in excluded and not matcher.is_excluded(item.path):
+                                    subdirs.append(item.name)
+                            elif matcher.matches(item.path):
+                                st = item.stat(follow_symlinks=False)
+                                files[item.name] = [st.st_mtime_ns, st.st_size]
+                                files_statted += 1
+                                previous = old_files.get(item.name)
+                                if previous is None:
+                                    if not baseline and (not relist or (since is not None and st.st_mtime_ns >= since)):
+                                        events.append(("created", item.path))
+                                elif previous != files[item.name]:
+                                    events.append(("modified", item.path))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            self.dirs[directory] = {"mtime": dir_mtime, "files": files, "subdirs": subdirs}
+            self._changed.add(directory)
+            self._removed.discard(directory)
+            if recursive:
+                stack.extend(os.path.join(directory, name) for name in subdirs)
+
+        # Directories that disappeared (or became excluded) drop out of the index
+        for directory in [d for d in self.dirs if d not in seen]:
+            del self.dirs[directory]
+            self._changed.discard(directory)
+            self._removed.add(directory)
+
+        self.last_scan_ns = started_ns
+        stats = {
+            "relisted": relist,
+            "dirs_scanned": scanned,
+            "dirs_skipped": skipped,
+            "files_statted": files_statted,
+            "events": len(events),
+        }
+        return events, stats
+
+
+def index_path_for(root, state_dir="."):
+    digest = hashlib.sha1(root.key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(state_dir, f"snapshot_index_{digest}.db")
+
+
+class IncrementalPoller:
+    """Polling backend for one WatchRoot, for drives without change notification."""
+
+    def __init__(self, root, handler, interval=30.0, state_dir="."):
+        self.root = root
+        self.handler = handler
+        self.interval = interval
+        self.index = SnapshotIndex(index_path_for(root, state_dir)).load()
+        self.last_stats = {}
+        self.cycles = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.root.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"Poller[{self.root.path}]", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Error polling {self.root.path}: {e}")
+            self._stop.wait(self.interval)
+
+    def poll_once(self):
+        started = time.perf_counter()
+        events, stats = self.index.scan(self.root.path, self.root.matcher, self.root.exclude, self.root.recursive)
+        self.deliver(events)
+        if self.index.dirty:
+            self.index.save()
+        stats["cycle_time"] = time.perf_counter() - started
+        stats["index_dirs"] = len(self.index.dirs)
+        stats["index_files"] = self.index.file_count()
+        try:
+            stats["index_bytes"] = os.path.getsize(self.index.path)
+        except OSError:
+            stats["index_bytes"] = 0
+        self.cycles += 1
+        self.last_stats = stats
+        return stats
+
+    def deliver(self, events):
+        for _kind, path in events:
+            self.root.events += 1
+            self.handler.dispatch_path(path)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.index.close()
@@ -0,0 +1,506 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing.connection import wait
+from subprocess import Popen
+
+from auth_standby import AUTH_APP
+from metrics import counter, histogram
+from tracker_worker import SPAWN_LOCK
+
+SUSPEND = "suspend"
+RESUME = "resume"
+# The state database was written by another process
+STATE_CHANGED = "state_changed"
+STOP = "stop"
+
+# Longest the supervisor sleeps without an event before re-checking the device state
+STATE_WAIT_TIMEOUT = 60.0
+# Longest a suspend waits for the tracker to rotate and flush before killing it
+SUSPEND_DEADLINE = float(os.environ.get("TRACKER_SUSPEND_DEADLINE", "2.0"))
+STATS_INTERVAL = 3600
+
+POWER_EVENTS = counter("service_power_events_total", "Power broadcasts handled, by event")
+EVENT_SECONDS = histogram("service_event_seconds", "Power event emitted until the supervisor handled it")
+LOOP_WAKEUPS = counter("service_loop_wakeups_total", "Times the supervisor woke up")
+STATE_READS = counter("service_device_state_reads_total", "Device state rows read from the database")
+WAKES_DETECTED = counter("service_wakes_detected_total", "Wakes that required authentication")
+RESTARTS = counter("service_restarts_total", "Child processes restarted after exiting unexpectedly, by child")
+RESUME_TO_UNLOCK = histogram("service_resume_to_unlock_seconds", "Resume until the auth app exited")
+AUTH_SECONDS = histogram("service_auth_app_seconds", "Auth app shown until it exited, by launch mode")
+TRACKER_START = histogram("service_tracker_start_seconds", "Tracker start command round trip")
+SUSPEND_SECONDS = histogram("service_suspend_seconds", "Suspend broadcast handled, tracker rotated or killed, by outcome")
+
+
+class PowerEventSource:
+    """Where the supervisor's power events come from.
+
+    Subclasses call emit() from any thread once start() was called;
+    stop() is called when the supervisor shuts down.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+
+    def attach(self, loop, queue):
+        self._loop = loop
+        self._queue = queue
+
+    def emit(self, event):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, time.perf_counter()))
+        except RuntimeError:
+            # Loop already closed; the supervisor is gone
+            pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class SimulatedPowerSource(PowerEventSource):
+    """Scripted power events, so the supervisor runs anywhere.
+
+    script is a list of (delay_seconds, event) pairs played in order once
+    the supervisor starts; emit() can inject further events at any time.
+    """
+
+    def __init__(self, script=()):
+        super().__init__()
+        self.script = list(script)
+        self._task = None
+
+    def start(self):
+        self._task = self._loop.create_task(self._play())
+
+    async def _play(self):
+        for delay, event in self.script:
+            await asyncio.sleep(delay)
+            self.emit(event)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class RestartPolicy:
+    """Exponential backoff between restarts of a child that keeps exiting.
+
+    A child that stayed up for healthy_after seconds starts again from the
+    initial delay.
+    """
+
+    def __init__(self, initial=1.0, maximum=60.0, factor=2.0, healthy_after=30.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.healthy_after = healthy_after
+        self.failures = 0
+
+    def delay(self, uptime):
+        if uptime >= self.healthy_after:
+            self.failures = 0
+        delay = min(self.initial * self.factor ** self.failures, self.maximum)
+        self.failures += 1
+        return delay
+
+
+def in_thread(call, *args):
+    """Run a blocking call on a daemon thread and await its result.
+
+    Used for process waits and tracker pipe round trips. Daemon threads
+    (rather than the loop's executor) never hold up shutdown when a child
+    is still running.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run():
+        try:
+            result, error = call(*args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            pass
+
+    threading.Thread(target=run, name=getattr(call, "__name__", "blocking call"), daemon=True).start()
+    return future
+
+
+class Supervisor:
+    """The service: reacts to power events and runs the tracker and auth app.
+
+    Events are handled on an asyncio loop while the auth app is on screen,
+    so a suspend or resume during the challenge is acted on at once instead
+    of after the user unlocked. Children are waited on without blocking the
+    loop and restarted with backoff when they exit unexpectedly; an auth
+    app that crashes is launched again, since exiting it unlocks.
+    """
+
+    def __init__(self, source, store, device_state, tracker, standby=None,
+                 auth_command=None, tracker_policy=None, standby_policy=None, auth_policy=None,
+                 auth_popen_kwargs=None, suspend_deadline=SUSPEND_DEADLINE):
+        self.source = source
+        self.store = store
+        self.device_state = device_state
+        self.tracker = tracker
+        self.standby = standby
+        self.auth_command = auth_command or [sys.executable, AUTH_APP]
+        # Extra Popen arguments for cold auth app launches, as StandbyAuthApp takes them
+        self.auth_popen_kwargs = auth_popen_kwargs or {}
+        self.suspend_deadline = suspend_deadline
+        self.tracker_policy = tracker_policy or RestartPolicy()
+        self.standby_policy = standby_policy or RestartPolicy()
+        self.auth_policy = auth_policy or RestartPolicy(initial=0.5, maximum=10.0)
+
+        self.handled_awake = None
+        self.tracking = False
+        self.stopping = False
+        self.auth_task = None
+        self.queue = None
+        self._tracker_lock = None
+        self._tasks = set()
+
+    # Device state
+
+    def load_device_state(self, set_awake=False):
+        """Load the device state, initialize if not present."""
+        try:
+            state = self.store.load_device_state()
+        except sqlite3.Error as e:
+            print(f"[Service] Error loading device state: {e}")
+            return None
+        if state is None:
+            return self.update_device_state(last_awake=datetime.now().isoformat(), last_sleep=None)
+        if set_awake:
+            state = self.update_device_state(last_awake=datetime.now().isoformat())
+        return state
+
+    def update_device_state(self, **fields):
+        """Update some device state fields in a single transaction."""
+        try:
+            state = self.store.update_device_state(**fields)
+        except sqlite3.Error as e:
+            print(f"[Service] Error saving device state: {e}")
+            return None
+        self.device_state.apply(state)
+        return state
+
+    def report_state_reads(self):
+        stats = self.device_state.stats()
+        print(f"[Service] Device state: {stats['wakeups_per_sec']:.3f} wakeups/s, "
+              f"{stats['reads_per_hour']:.1f} reads/hour ({stats['checks']} checks, {stats['reads']} reads)")
+
+    # Children
+
+    def _spawn_task(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _tracker_call(self, call):
+        # The control pipe carries one command at a time
+        async with self._tracker_lock:
+            return await in_thread(call)
+
+    async def start_tracker(self):
+        self.tracking = True
+        print("[Service] Starting file tracker...")
+        try:
+            elapsed = await self._tracker_call(self.tracker.start)
+            TRACKER_START.observe(elapsed)
+            print(f"[Service] File tracker ready in {elapsed * 1000:.1f} ms")
+        except (OSError, EOFError, TimeoutError, RuntimeError) as e:
+            print(f"[Service] Error starting file tracker: {e}")
+
+    async def stop_tracker(self):
+        """Release the tracker's watches; the worker stays loaded for the next start."""
+        self.tracking = False
+        try:
+            await self._tracker_call(self.tracker.stop)
+        except (OSError, EOFError, TimeoutError, RuntimeError) as e:
+            print(f"[Service] Error stopping file tracker: {e}")
+
+    async def suspend_tracker(self):
+        """Have the tracker end its session before sleep; returns "rotated", "killed" or "idle".
+
+        The deadline covers waiting for a command already on the pipe as
+        well as the rotation, so sleep is never held up for longer.
+        """
+        self.tracking = False
+        if not self.tracker.alive():
+            return "idle"
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._tracker_lock.acquire(), self.suspend_deadline)
+        except asyncio.TimeoutError:
+            print("[Service] Tracker busy at suspend, killing it")
+            self.tracker.kill()
+            return "killed"
+        try:
+            remaining = max(self.suspend_deadline - (time.monotonic() - started), 0.0)
+            return await in_thread(self.tracker.suspend, remaining)
+        finally:
+            self._tracker_lock.release()
+
+    async def _supervise_tracker(self):
+        while not self.stopping:
+            if not self.tracker.alive():
+                started = time.perf_counter()
+                try:
+                    await self._tracker_call(self.tracker.spawn)
+                    print(f"[Service] Tracker worker loaded in {time.perf_counter() - started:.2f}s")
+                except (OSError, EOFError, TimeoutError, RuntimeError) as e:
+                    print(f"[Service] Error loading tracker worker: {e}")
+                if self.tracking and self.tracker.alive():
+                    await self.start_tracker()
+            process = self.tracker.process
+            started = time.monotonic()
+            if process is not None:
+                # Wait on the sentinel rather than join(): shutdown() joins the same child
+                await in_thread(wait, [process.sentinel])
+            if self.stopping:
+                return
+            if self.tracker.process is not process and self.tracker.alive():
+                # Respawned by a command in the meantime
+                continue
+            delay = self.tracker_policy.delay(time.monotonic() - started)
+            exitcode = None
+            if process is not None:
+                # The sentinel fires before the exit status can be collected
+                process.join(1)
+                exitcode = process.exitcode
+            print(f"[Service] Tracker worker exited with code {exitcode}, restarting in {delay:g}s")
+            RESTARTS.inc(child="tracker")
+            await asyncio.sleep(delay)
+
+    def ensure_standby(self):
+        """Have a hidden auth app imported and waiting for the next resume."""
+        if self.standby is None or self.stopping or self.standby.alive() or self.auth_task:
+            return
+        try:
+            with SPAWN_LOCK:
+                process = self.standby.spawn()
+        except OSError as e:
+            print(f"[Service] Error starting standby auth app: {e}")
+            return
+        print("[Service] Standby auth app started")
+        self._spawn_task(self._watch_standby(process, time.monotonic()))
+
+    async def _watch_standby(self, process, started):
+        await in_thread(process.wait)
+        if self.stopping or self.standby.process is not process:
+            # Shown, or replaced; the auth flow owns it now
+            return
+        delay = self.standby_policy.delay(time.monotonic() - started)
+        print(f"[Service] Standby auth app exited with code {process.returncode}, restarting in {delay:g}s")
+        RESTARTS.inc(child="standby")
+        await asyncio.sleep(delay)
+        self.ensure_standby()
+
+    def launch_auth_app(self, resumed_at):
+        """Show the standby auth app or start a cold one; returns (process, mode)."""
+        if self.standby and self.standby.alive():
+            print("[Service] Showing standby auth app...")
+            try:
+                return self.standby.show(resumed_at), "standby"
+            except OSError as e:
+                print(f"[Service] Standby auth app unavailable: {e}")
+        print("[Service] Starting auth app...")
+        with SPAWN_LOCK:
+            return Popen(self.auth_command + [f"--resumed-at={resumed_at}"], **self.auth_popen_kwargs), "cold"
+
+    async def authenticate(self, awake):
+        if self.tracking:
+            print("[Service] Stopping file tracker before auth.")
+            await self.stop_tracker()
+
+        while not self.stopping:
+            started = time.monotonic()
+            try:
+                process, mode = self.launch_auth_app(awake.timestamp())
+            except OSError as e:
+                print(f"[Service] Error starting auth app: {e}")
+                returncode = None
+            else:
+                returncode = await in_thread(process.wait)
+                AUTH_SECONDS.observe(time.monotonic() - started, mode=mode)
+                print(f"[Service] Auth app exited with code {returncode}.")
+            if returncode == 0:
+                break
+            # Anything but a clean exit is a crash or a kill, not an unlock
+            delay = self.auth_policy.delay(time.monotonic() - started)
+            print(f"[Service] Auth app did not complete, relaunching in {delay:g}s")
+            RESTARTS.inc(child="auth")
+            await asyncio.sleep(delay)
+        if self.stopping:
+            return
+        RESUME_TO_UNLOCK.observe(max(time.time() - awake.timestamp(), 0.0))
+
+        print("[Service] Starting file tracker after auth.")
+        await self.start_tracker()
+        self.update_device_state(last_sleep=None)
+
+    def _auth_done(self, task):
+        self.auth_task = None
+        if not task.cancelled() and task.exception():
+            print(f"[Service] Error during authentication: {task.exception()}")
+        self.ensure_standby()
+
+    # Events
+
+    async def on_suspend(self):
+        print("[Service] System entering sleep state")
+        started = time.perf_counter()
+        # Also while stopped: whatever the session recorded ends with this sleep
+        outcome = await self.suspend_tracker()
+        self.update_device_state(last_sleep=datetime.now().isoformat())
+        elapsed = time.perf_counter() - started
+        SUSPEND_SECONDS.observe(elapsed, outcome=outcome)
+        print(f"[Service] Suspend handled in {elapsed * 1000:.1f} ms (tracker {outcome})")
+        # Have the auth app imported and waiting before the user comes back
+        self.ensure_standby()
+
+    def on_resume(self):
+        print("[Service] System resuming from sleep state")
+        self.update_device_state(last_awake=datetime.now().isoformat())
+        # Clear the handled wake marker to force authentication
+        try:
+            self.store.clear_last_handled_awake()
+        except sqlite3.Error as e:
+            print(f"[Service] Error clearing handled state: {e}")
+
+    def check_wake(self):
+        reads = self.device_state.reads
+        changed = self.device_state.refresh()
+        STATE_READS.inc(self.device_state.reads - reads)
+        if not changed:
+            return
+
+        current_awake = self.device_state.last_awake
+        current_sleep = self.device_state.last_sleep
+        is_new_wake = (
+            current_awake and
+            (
+                (not current_sleep) or
+                (current_awake > current_sleep)
+            ) and
+            (not self.handled_awake or current_awake > self.handled_awake)
+        )
+        if not is_new_wake:
+            return
+
+        print(f"[Service] Device wake detected at {current_awake}")
+        WAKES_DETECTED.inc()
+        self.handled_awake = current_awake
+        try:
+            self.store.save_last_handled_awake(current_awake)
+        except sqlite3.Error as e:
+            print(f"[Service] Error saving handled state: {e}")
+        if self.auth_task:
+            print("[Service] Auth app already on screen")
+            return
+        self.auth_task = self._spawn_task(self.authenticate(current_awake))
+        self.auth_task.add_done_callback(self._auth_done)
+
+    async def handle(self, event):
+        if event == SUSPEND:
+            POWER_EVENTS.inc(event="suspend")
+            await self.on_suspend()
+        elif event == RESUME:
+            POWER_EVENTS.inc(event="resume")
+            self.on_resume()
+
+    def request_stop(self):
+        """Thread-safe; the supervisor finishes the current event and shuts down."""
+        self.source.emit(STOP)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._tracker_lock = asyncio.Lock()
+        self.source.attach(loop, self.queue)
+
+        print("[Service] Initializing device state monitoring...")
+        try:
+            self.handled_awake = self.store.load_last_handled_awake()
+        except sqlite3.Error as e:
+            print(f"[Service] Error loading handled state: {e}")
+        print("[Service] Loaded last handled awake:", self.handled_awake)
+        self.load_device_state(set_awake=True)
+        print("[Service] Set new wake time on startup")
+
+        # The tracker worker imports and loads its sessions once, here; every
+        # later start only schedules the watches
+        self._spawn_task(self._supervise_tracker())
+        self.ensure_standby()
+        self.source.start()
+
+        last_report = time.monotonic()
+        try:
+            # The wake recorded above is acted on now, not after the first event or timeout
+            try:
+                self.check_wake()
+            except Exception as e:
+                print(f"[Service] Error checking wake on startup: {e}")
+            while True:
+                try:
+                    event, emitted = await asyncio.wait_for(self.queue.get(), STATE_WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    event, emitted = None, None
+                LOOP_WAKEUPS.inc()
+                if event == STOP:
+                    break
+                try:
+                    await self.handle(event)
+                    if emitted is not None:
+                        EVENT_SECONDS.observe(time.perf_counter() - emitted)
+                    if not self.device_state.state:
+                        print("[Service] Unable to load device state, retrying...")
+                        self.load_device_state()
+                    self.check_wake()
+                except Exception as e:
+                    print(f"[Service] Error handling {event or 'timeout'}: {e}")
+
+                if time.monotonic() - last_report >= STATS_INTERVAL:
+                    self.report_state_reads()
+                    last_report = time.monotonic()
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Handle cleanup when service is shutting down."""
+        print("[Service] Performing cleanup...")
+        self.stopping = True
+        self.source.stop()
+        if self.auth_task:
+            # The auth app itself stays up; only the waiting stops
+            self.auth_task.cancel()
+        if self.tracker.alive():
+            print("[Service] Stopping file tracker...")
+            await self._tracker_call(self.tracker.shutdown)
+        if self.standby:
+            self.standby.terminate()
+        for task in list(self._tasks):
+            task.cancel()
+        if self.update_device_state(last_sleep=datetime.now().isoformat()):
+            print("[Service] Updated device state with sleep time")
+        self.report_state_reads()
@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+from activity_journal import ActivityJournal
+from state_store import StateStore
+
+
+def test_batch_survives_a_locked_database(tmp_path):
+    path = str(tmp_path / "state.db")
+    journal = ActivityJournal(StateStore(path, timeout=0.1))
+    journal.append_many([("main.py", 100), ("notes.txt", 101)])
+    journal.append_rotation(replace=True)
+    journal.append("report.docx", 102)
+
+    # Another process holds the write lock past the busy timeout
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        journal.flush()
+    assert len(journal._pending) == 4
+    assert journal.flushes == 0
+
+    # Appended while the database was locked: stays behind the failed batch
+    journal.append("later.txt", 103)
+    blocker.execute("ROLLBACK")
+    blocker.close()
+    journal.flush()
+    assert journal._pending == []
+    assert journal.records_written == 4
+    assert journal.rotations == 1
+    store = journal.store
+    assert store.session_size("previous_session") == 2
+    assert store.session_size("current_session") == 2
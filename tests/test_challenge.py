@@ -0,0 +1,144 @@
+import os
+import random
+import time
+from collections import Counter
+
+import pytest
+
+from challenge import (CHALLENGE_VERSION, CORRECT_COUNT, DECOY_COUNT, DECOY_FILES, FALLBACK_FILES,
+                       RANKED_CANDIDATES, build_challenge, choose_decoys, is_valid, next_challenge,
+                       pick_correct_files, precompute_challenge)
+from state_store import StateStore
+
+
+def extension(name):
+    return os.path.splitext(name)[1].lower()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def record_previous_session(store, names):
+    """Record names in the previous session, the first one worked on most."""
+    now = int(time.time())
+    touches = {os.path.join("C:\\Users\\dev\\work", name): [now, now - i, len(names) - i]
+               for i, name in enumerate(names)}
+    with store.transaction() as conn:
+        store.record_touches(conn, touches, "previous_session")
+
+
+# choose_decoys
+
+def test_decoys_follow_the_extension_mix_of_real_files():
+    real = [f"module_{i}.py" for i in range(9)] + ["notes.txt"]
+    rng = random.Random(7)
+    counts = Counter(extension(name) for _ in range(300) for name in choose_decoys(real, DECOY_COUNT, rng))
+    assert set(counts) <= {".py", ".txt"}
+    assert counts[".py"] > 5 * counts[".txt"] > 0
+
+
+def test_decoys_never_collide_with_real_files():
+    # Real files named like pool entries, with the only extensions the pool is weighted towards
+    real = ["user_auth_handler.py", "style_guide_v1.css", "project_plan_v2.py", "dashboard_component.css"]
+    for seed in range(200):
+        decoys = choose_decoys(real, DECOY_COUNT, random.Random(seed), exclude=["database_migration.py"])
+        assert len(decoys) == DECOY_COUNT
+        assert len(set(decoys)) == DECOY_COUNT
+        assert not set(decoys) & set(real)
+        assert "database_migration.py" not in decoys
+        assert {extension(name) for name in decoys} <= {".py", ".css"}
+
+
+def test_decoys_without_real_files_come_from_the_pool():
+    decoys = choose_decoys([], DECOY_COUNT, random.Random(1))
+    assert len(set(decoys)) == DECOY_COUNT
+    assert set(decoys) <= set(DECOY_FILES)
+
+
+# pick_correct_files
+
+@pytest.mark.parametrize("recent", [[], ["a.py"], ["a.py", "b.txt"]])
+def test_fewer_files_than_answers_are_all_correct(recent):
+    assert pick_correct_files(recent, random.Random(1)) == recent
+
+
+def test_correct_files_come_from_the_top_candidates():
+    recent = [f"file_{i}.py" for i in range(RANKED_CANDIDATES * 3)]
+    for seed in range(50):
+        correct = pick_correct_files(recent, random.Random(seed))
+        assert len(set(correct)) == CORRECT_COUNT
+        assert set(correct) <= set(recent[:RANKED_CANDIDATES])
+
+
+def test_challenge_with_two_recent_files():
+    payload = build_challenge(["a.py", "b.py"], random.Random(3))
+    assert sorted(payload["correct"]) == ["a.py", "b.py"]
+    assert len(payload["choices"]) == 2 + DECOY_COUNT
+    assert is_valid(payload)
+
+
+# is_valid / next_challenge
+
+def test_built_challenge_is_valid():
+    payload = build_challenge(["a.py", "b.txt", "c.html", "d.css"], random.Random(5))
+    assert is_valid(payload)
+    assert payload["version"] == CHALLENGE_VERSION
+    assert set(payload["correct"]) <= set(payload["choices"])
+
+
+@pytest.mark.parametrize("payload", [
+    None,
+    "not a challenge",
+    {"version": CHALLENGE_VERSION - 1, "correct": ["a.py"], "choices": ["a.py"]},
+    {"version": CHALLENGE_VERSION, "correct": "a.py", "choices": ["a.py"]},
+    {"version": CHALLENGE_VERSION, "correct": ["a.py"]},
+    {"version": CHALLENGE_VERSION, "correct": ["a.py", "gone.py"], "choices": ["a.py", "b.py"]},
+])
+def test_stale_or_malformed_payloads_are_invalid(payload):
+    assert not is_valid(payload)
+
+
+def test_next_challenge_rebuilds_a_stale_payload(store):
+    record_previous_session(store, ["main.py", "report.docx", "index.html"])
+    store.save_challenge({"version": CHALLENGE_VERSION - 1, "correct": ["old.py"], "choices": ["old.py"]})
+    payload = next_challenge(store, random.Random(2))
+    assert is_valid(payload)
+    assert sorted(payload["correct"]) == ["index.html", "main.py", "report.docx"]
+    assert store.load_challenge() == payload
+
+
+def test_next_challenge_rebuilds_unparseable_json(store):
+    store.set_meta("next_challenge", "{not json")
+    payload = next_challenge(store, random.Random(2))
+    assert is_valid(payload)
+    # Nothing recorded yet: the placeholders are the answers
+    assert sorted(payload["correct"]) == FALLBACK_FILES
+
+
+def test_next_challenge_uses_a_valid_stored_payload(store):
+    stored = build_challenge(["a.py", "b.py", "c.py"], random.Random(4))
+    store.save_challenge(stored)
+    record_previous_session(store, ["other.py", "files.py", "now.py"])
+    assert next_challenge(store) == stored
+
+
+# precompute_challenge / clear_challenge
+
+def test_precompute_then_clear(store):
+    record_previous_session(store, ["main.py", "utils.py", "notes.txt", "style.css"])
+    payload = precompute_challenge(store, random.Random(9))
+    assert is_valid(payload)
+    assert set(payload["correct"]) <= {"main.py", "utils.py", "notes.txt", "style.css"}
+    decoys = set(payload["choices"]) - set(payload["correct"])
+    assert not decoys & {"main.py", "utils.py", "notes.txt", "style.css"}
+    assert store.load_challenge() == payload
+
+    store.clear_challenge()
+    assert store.load_challenge() is None
+    rebuilt = next_challenge(store, random.Random(10))
+    assert is_valid(rebuilt)
+    assert store.load_challenge() == rebuilt
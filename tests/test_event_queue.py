@@ -0,0 +1,37 @@
+import threading
+import time
+
+from event_queue import CoalescingQueue
+
+
+def test_repeated_paths_are_coalesced_into_one_batch():
+    batches = []
+    queue = CoalescingQueue(coalesce_window=0.05)
+    queue.start(batches.append)
+    for path in ["a.py", "b.py", "a.py", "a.py"]:
+        queue.put(path)
+    queue.stop()
+    assert batches == [["a.py", "b.py"]]
+    assert queue.stats()["coalesce_ratio"] == 2.0
+
+
+def test_drop_oldest_keeps_the_newest_paths():
+    queue = CoalescingQueue(maxsize=2)
+    for path in ["a.py", "b.py", "c.py"]:
+        queue.put(path)
+    assert list(queue._items) == ["b.py", "c.py"]
+    assert queue.dropped == 1
+
+
+def test_a_producer_blocked_at_stop_does_not_enqueue():
+    queue = CoalescingQueue(maxsize=1, policy="block")
+    queue.put("a.py")
+    producer = threading.Thread(target=queue.put, args=("b.py",))
+    producer.start()
+    time.sleep(0.1)
+    assert producer.is_alive()
+    queue.stop()
+    producer.join(1)
+    assert not producer.is_alive()
+    assert list(queue._items) == ["a.py"]
+    assert queue.dropped == 1
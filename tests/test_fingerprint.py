@@ -0,0 +1,68 @@
+import os
+
+from fingerprint import FingerprintCache, fingerprint
+
+
+def write(path, data, mtime=None):
+    with open(path, "wb") as file:
+        file.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_first_event_and_real_edits_are_changes(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    cache = FingerprintCache()
+    write(path, b"first", 1000)
+    assert cache.changed(path)
+    write(path, b"second", 2000)
+    assert cache.changed(path)
+
+
+def test_repeated_events_for_one_write_hit_the_stat_check(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    cache = FingerprintCache()
+    write(path, b"content", 1000)
+    cache.changed(path)
+    assert not cache.changed(path)
+    assert cache.stats()["stat_hits"] == 1
+    assert cache.hashes == 1
+
+
+def test_touch_with_the_same_bytes_is_dropped(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    cache = FingerprintCache()
+    write(path, b"content", 1000)
+    cache.changed(path)
+    write(path, b"content", 2000)
+    assert not cache.changed(path)
+    assert cache.stats()["content_hits"] == 1
+
+
+def test_missing_file_counts_as_a_change(tmp_path):
+    assert FingerprintCache().changed(str(tmp_path / "gone.txt"))
+
+
+def test_large_files_are_sampled(tmp_path):
+    path = str(tmp_path / "video.bin")
+    size = 1024 * 1024
+    write(path, bytes(size))
+    digest, read = fingerprint(path, size, threshold=256 * 1024, block=4096, blocks=8)
+    assert read == 8 * 4096
+    # A change inside a sampled block (the last one) changes the digest
+    with open(path, "r+b") as file:
+        file.seek(size - 1)
+        file.write(b"x")
+    assert fingerprint(path, size, threshold=256 * 1024, block=4096, blocks=8)[0] != digest
+
+
+def test_least_recently_seen_paths_are_evicted(tmp_path):
+    cache = FingerprintCache(max_entries=2)
+    paths = [str(tmp_path / f"{name}.txt") for name in "abc"]
+    for path in paths:
+        write(path, path.encode(), 1000)
+        cache.changed(path)
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    # "a" was evicted, so its next event is read again
+    assert cache.changed(paths[0])
@@ -0,0 +1,34 @@
+from hit_test import CLICK_RADIUS, WM_LBUTTONDOWN, WM_MOUSEMOVE, MouseFilter, build_rects
+
+
+def test_rects_are_sorted_by_top_edge():
+    rects = build_rects([(960, 600), (961, 200), (100, 400)])
+    assert [top for _left, top, _right, _bottom in rects] == [150, 350, 550]
+
+
+def test_click_on_a_centre_left_of_a_higher_one():
+    # The button centre is left of the checkbox and lower: sorting by left edge put it first
+    mouse_filter = MouseFilter(lambda: [(960, 600), (961, 200)])
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (961, 200))
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (960, 600))
+
+
+def test_only_clicks_inside_a_rectangle_pass_while_locked():
+    mouse_filter = MouseFilter(lambda: [(500, 500)])
+    assert not mouse_filter.allow(WM_MOUSEMOVE, (500, 500))
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (500 + CLICK_RADIUS, 500 - CLICK_RADIUS))
+    assert not mouse_filter.allow(WM_LBUTTONDOWN, (500 + CLICK_RADIUS + 1, 500))
+    mouse_filter.unlocked = True
+    assert mouse_filter.allow(WM_MOUSEMOVE, (0, 0))
+
+
+def test_rectangles_follow_the_layout_after_invalidate():
+    centres = [(100, 100)]
+    mouse_filter = MouseFilter(lambda: centres)
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (100, 100))
+    centres[:] = [(800, 800)]
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (100, 100))
+    mouse_filter.invalidate()
+    assert not mouse_filter.allow(WM_LBUTTONDOWN, (100, 100))
+    assert mouse_filter.allow(WM_LBUTTONDOWN, (800, 800))
+    assert mouse_filter.stats()["rebuilds"] == 2
@@ -0,0 +1,69 @@
+import json
+import threading
+
+import pytest
+
+from metrics import MetricsExporter, Registry
+
+
+def test_counter_sums_the_cells_of_every_thread():
+    registry = Registry()
+    events = registry.counter("events_total")
+
+    def work():
+        for _ in range(1000):
+            events.inc(kind="modified")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    events.inc(5)
+    assert events.value(kind="modified") == 4000
+    assert events.value() == 5
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, mode="cold")
+    samples = {(name, dict(key).get("le")): value for name, key, value in latency.samples()}
+    assert samples[("latency_seconds_bucket", "0.1")] == 2
+    assert samples[("latency_seconds_bucket", "1.0")] == 3
+    assert samples[("latency_seconds_bucket", "+Inf")] == 4
+    assert samples[("latency_seconds_count", None)] == 4
+    assert latency.count(mode="cold") == 4
+
+
+def test_a_name_keeps_its_kind():
+    registry = Registry()
+    assert registry.counter("restarts_total") is registry.counter("restarts_total")
+    with pytest.raises(ValueError):
+        registry.gauge("restarts_total")
+
+
+def test_exporter_writes_prometheus_text_and_json(tmp_path):
+    registry = Registry()
+    registry.counter("wakes_total", "Wakes").inc(2, source="resume")
+    MetricsExporter(str(tmp_path / "service.prom"), registry=registry).write()
+    MetricsExporter(str(tmp_path / "service.json"), registry=registry).write()
+
+    text = (tmp_path / "service.prom").read_text()
+    assert "# TYPE wakes_total counter" in text
+    assert 'wakes_total{source="resume"} 2' in text
+    data = json.loads((tmp_path / "service.json").read_text())
+    assert data["wakes_total"]["samples"] == [{"name": "wakes_total", "labels": {"source": "resume"}, "value": 2}]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["service.json", "service.prom"]
+
+
+def test_label_values_are_escaped_for_the_text_format():
+    registry = Registry()
+    registry.counter("restarts_total", "Restarts\nby child").inc(root='C:\\Users\\"quoted"\nname')
+    text = registry.to_prometheus()
+    assert "# HELP restarts_total Restarts\\nby child\n" in text
+    assert 'restarts_total{root="C:\\\\Users\\\\\\"quoted\\"\\nname"} 1\n' in text
+    # One sample line: nothing in a value can break it up
+    assert [line for line in text.splitlines() if line.startswith("restarts_total")] == \
+        ['restarts_total{root="C:\\\\Users\\\\\\"quoted\\"\\nname"} 1']
@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from file_tracker import FileMonitorHandler
+from rules_config import RULE_DEFAULTS, RulesWatcher, load_rules
+from watch_roots import WatchRoot, normalize
+
+
+def write_rules(path, rules, stamp):
+    with open(path, "w") as file:
+        file.write(rules if isinstance(rules, str) else json.dumps(rules))
+    # Distinct mtimes even on file systems with coarse timestamps
+    os.utime(path, (stamp, stamp))
+
+
+def test_missing_keys_keep_their_defaults(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, {"allowed_extensions": [".md"]}, 1_700_000_000)
+    rules = load_rules(str(path))
+    assert rules["allowed_extensions"] == [".md"]
+    assert rules["excluded_dirs"] == RULE_DEFAULTS["excluded_dirs"]
+
+
+@pytest.mark.parametrize("content", ['["not", "an object"]', '{"allowed": [".py"]}',
+                                     '{"excluded_dirs": "C:\\\\Windows"}', '{"junk_patterns": [1]}'])
+def test_invalid_rules_are_rejected(tmp_path, content):
+    path = tmp_path / "rules.json"
+    write_rules(path, content, 1_700_000_000)
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+
+
+def test_watcher_applies_changes_and_keeps_rules_on_errors(tmp_path):
+    path = str(tmp_path / "rules.json")
+    applied = []
+    watcher = RulesWatcher(path, applied.append)
+    # No file at the first check: the built-in rules already apply
+    assert not watcher.check()
+    write_rules(path, {"allowed_extensions": [".md"]}, 1_700_000_000)
+    assert watcher.check()
+    assert not watcher.check()
+    write_rules(path, "{broken", 1_700_000_100)
+    assert not watcher.check()
+    assert watcher.errors == 1
+    os.remove(path)
+    assert watcher.check()
+    assert [rules and rules["allowed_extensions"] for rules in applied] == [[".md"], None]
+
+
+def test_handler_filters_with_the_new_rules(tmp_path):
+    handler = FileMonitorHandler({})
+    root = WatchRoot(str(tmp_path))
+    handler.set_roots([root])
+    note = str(tmp_path / "notes.md")
+    script = str(tmp_path / "main.py")
+    assert not handler.matcher_for(note).matches(note)
+    handler.apply_rules(dict(RULE_DEFAULTS, allowed_extensions=[".md"], excluded_dirs=[str(tmp_path / "skip")]))
+    assert handler.matcher_for(note).matches(note)
+    assert not handler.matcher_for(script).matches(script)
+    skipped = str(tmp_path / "skip" / "notes.md")
+    assert not handler.matcher_for(skipped).matches(skipped)
+    # Roots read by the pollers and the warm-start scan follow too
+    assert root.matcher.matches(note)
+
+
+def test_plan_leaves_out_directories_the_rules_exclude(tmp_path):
+    for name in ("keep", "skip"):
+        (tmp_path / name).mkdir()
+    root = WatchRoot(str(tmp_path))
+    assert root.plan() == [(str(tmp_path), True)]
+    watches = root.plan(dict(RULE_DEFAULTS, excluded_dirs=[str(tmp_path / "skip")]))
+    assert sorted(watches) == [(str(tmp_path), False), (str(tmp_path / "keep"), True)]
+    assert normalize(str(tmp_path / "skip")) in root.planned_exclude
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+
+from adaptive_watch import AdaptiveWatcher
+from snapshot_index import SnapshotIndex
+from watch_roots import WatchRoot
+
+
+def build_tree(base, dirs=20):
+    paths = []
+    for i in range(dirs):
+        directory = base / f"dir{i}"
+        directory.mkdir(parents=True)
+        (directory / "main.py").write_text("x")
+        paths.append(directory)
+    return paths
+
+
+def scan(index, root):
+    return index.scan(root.path, root.matcher, root.exclude, root.recursive)
+
+
+def read_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0]: row[1:] for row in conn.execute("SELECT path, mtime, files FROM dirs")}
+    finally:
+        conn.close()
+
+
+def rows_written(path, action):
+    """Directories whose row the action inserted, changed or deleted."""
+    before = read_rows(path)
+    action()
+    after = read_rows(path)
+    return {directory for directory in set(before) | set(after) if before.get(directory) != after.get(directory)}
+
+
+def test_a_pass_saves_only_the_directories_that_changed(tmp_path):
+    dirs = build_tree(tmp_path / "tree")
+    root = WatchRoot(str(tmp_path / "tree"))
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    events, _stats = scan(index, root)
+    assert events == []
+    index.save()
+
+    (dirs[3] / "main.py").write_text("edited")
+    os.utime(dirs[3] / "main.py", (1, 1))
+    events, _stats = scan(index, root)
+    assert events == [("modified", str(dirs[3] / "main.py"))]
+    assert rows_written(index.path, index.save) == {str(dirs[3])}
+    # Nothing changed: nothing is written
+    scan(index, root)
+    assert not index.dirty
+    index.close()
+
+
+def test_changes_while_stopped_are_found_after_a_reload(tmp_path):
+    dirs = build_tree(tmp_path / "tree")
+    root = WatchRoot(str(tmp_path / "tree"))
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    scan(index, root)
+    index.save()
+    index.close()
+
+    (dirs[0] / "notes.txt").write_text("new")
+    for name in os.listdir(dirs[1]):
+        os.remove(dirs[1] / name)
+    os.rmdir(dirs[1])
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    assert len(index.dirs) == 21
+    events, _stats = scan(index, root)
+    assert events == [("created", str(dirs[0] / "notes.txt"))]
+    index.save()
+    index.close()
+    assert len(SnapshotIndex(str(tmp_path / "index.db")).load().dirs) == 20
+
+
+class FakeObserver:
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, handler, path, recursive=False):
+        watch = type("Watch", (), {"path": path})()
+        self.scheduled.append(path)
+        return watch
+
+    def unschedule(self, watch):
+        self.scheduled.remove(watch.path)
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.paths = []
+
+    def dispatch_path(self, path):
+        self.paths.append(path)
+
+
+def test_changes_in_a_promoted_directory_are_not_dispatched_twice(tmp_path):
+    dirs = build_tree(tmp_path / "tree")
+    handler = RecordingHandler()
+    watcher = AdaptiveWatcher(WatchRoot(str(tmp_path / "tree"), adaptive=True), handler, FakeObserver(),
+                              state_dir=str(tmp_path))
+    watcher.poll_once()
+
+    (dirs[5] / "notes.txt").write_text("first")
+    watcher.poll_once()
+    assert handler.paths == [str(dirs[5] / "notes.txt")]
+    assert watcher.observer.scheduled == [str(dirs[5])]
+
+    # The native watch delivers this write; the next pass must not dispatch it again
+    (dirs[5] / "todo.txt").write_text("second")
+    watcher.poll_once()
+    assert handler.paths == [str(dirs[5] / "notes.txt")]
+    watcher.stop()
+
+
+def rules(**overrides):
+    from rules_config import RULE_DEFAULTS
+    return dict({key: list(value) for key, value in RULE_DEFAULTS.items()}, **overrides)
+
+
+def test_new_rules_relist_unchanged_directories_without_events(tmp_path):
+    dirs = build_tree(tmp_path / "tree")
+    (dirs[2] / "README.md").write_text("old")
+    os.utime(dirs[2] / "README.md", (1, 1))
+    root = WatchRoot(str(tmp_path / "tree"))
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    scan(index, root)
+    assert "README.md" not in index.dirs[str(dirs[2])]["files"]
+
+    root.matcher = root.compile(rules(allowed_extensions=[".py", ".md"]))
+    (dirs[4] / "notes.md").write_text("written after the last pass")
+    events, stats = scan(index, root)
+    assert stats["relisted"]
+    # The old .md file only now matches: indexed, but not reported as created
+    assert "README.md" in index.dirs[str(dirs[2])]["files"]
+    assert events == [("created", str(dirs[4] / "notes.md"))]
+    index.save()
+    index.close()
+
+    # Same rules after a restart: no second relist
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    assert not scan(index, root)[1]["relisted"]
+    index.close()
+
+
+def test_excluded_dirs_from_the_rules_prune_the_walk(tmp_path):
+    dirs = build_tree(tmp_path / "tree")
+    root = WatchRoot(str(tmp_path / "tree"))
+    index = SnapshotIndex(str(tmp_path / "index.db")).load()
+    scan(index, root)
+
+    root.matcher = root.compile(rules(excluded_dirs=[str(dirs[7])]))
+    scan(index, root)
+    assert str(dirs[7]) not in index.dirs
+    # Excluded no longer: listed again, and its existing files are not news
+    root.matcher = root.compile(None)
+    events, _stats = scan(index, root)
+    assert str(dirs[7]) in index.dirs
+    assert events == []
+    index.close()
@@ -0,0 +1,197 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from state_store import StateStore, DeviceStateWatcher
+from supervisor import Supervisor, SimulatedPowerSource, RestartPolicy, SUSPEND, RESUME, STOP
+
+
+class FakeProcess:
+    """A child that never exits until shutdown; sentinel is a pipe that closes then."""
+
+    def __init__(self):
+        self.sentinel, self._write = os.pipe()
+
+    def exit(self):
+        if self._write is not None:
+            os.close(self._write)
+            self._write = None
+
+
+class IdleTracker:
+    """Tracker worker stand-in: always loaded, records the commands it gets.
+
+    block() makes the next start() hang until release(), like a command
+    the child never answers.
+    """
+
+    def __init__(self):
+        self.process = FakeProcess()
+        self.commands = []
+        self.killed = False
+        self._hang = None
+
+    def alive(self):
+        return self.process is not None and not self.killed
+
+    def spawn(self):
+        return 0.0
+
+    def block(self):
+        self._hang = threading.Event()
+
+    def release(self):
+        if self._hang:
+            self._hang.set()
+
+    def start(self):
+        self.commands.append("start")
+        if self._hang:
+            self._hang.wait(10)
+        return 0.0
+
+    def stop(self):
+        self.commands.append("stop")
+
+    def suspend(self, deadline):
+        self.commands.append("suspend")
+        return "rotated"
+
+    def kill(self):
+        self.killed = True
+        self.release()
+
+    def shutdown(self):
+        self.commands.append("shutdown")
+        self.process.exit()
+
+
+class ScriptedSupervisor(Supervisor):
+    """Cold auth launches of a stand-in app exiting with the next code in exit_codes (then 0)."""
+
+    def __init__(self, *args, exit_codes=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exit_codes = list(exit_codes)
+        self.launches = []
+
+    def launch_auth_app(self, resumed_at):
+        code = self.exit_codes.pop(0) if self.exit_codes else 0
+        self.auth_command = [sys.executable, "-c", f"raise SystemExit({code})"]
+        self.launches.append((time.monotonic(), resumed_at, code))
+        return super().launch_auth_app(resumed_at)
+
+
+def make_supervisor(tmp_path, script=(), tracker=None, **kwargs):
+    store = StateStore(str(tmp_path / "state.db"))
+    return ScriptedSupervisor(SimulatedPowerSource(script), store, DeviceStateWatcher(store),
+                              tracker or IdleTracker(), auth_policy=RestartPolicy(initial=0.05), **kwargs)
+
+
+def test_startup_wake_launches_auth_at_once(tmp_path):
+    # No events at all: only the startup check can launch the auth app
+    supervisor = make_supervisor(tmp_path, [(1.5, STOP)])
+    started = time.monotonic()
+    asyncio.run(supervisor.run())
+    assert len(supervisor.launches) == 1
+    assert supervisor.launches[0][0] - started < 1.0
+    assert supervisor.tracker.commands.count("start") == 1
+
+
+def test_resume_triggers_one_auth_launch(tmp_path):
+    supervisor = make_supervisor(tmp_path, [(0.5, SUSPEND), (0.3, RESUME), (1.0, STOP)])
+    asyncio.run(supervisor.run())
+    # The startup wake, then exactly one for the resume
+    assert len(supervisor.launches) == 2
+    startup, resume = supervisor.launches
+    assert resume[1] > startup[1]
+    assert supervisor.tracker.commands.count("suspend") == 1
+    assert supervisor.tracker.commands.count("start") == 2
+
+
+def test_failed_auth_app_is_relaunched(tmp_path):
+    supervisor = make_supervisor(tmp_path, [(2.0, STOP)], exit_codes=[1, 3])
+    asyncio.run(supervisor.run())
+    assert [code for _at, _awake, code in supervisor.launches] == [1, 3, 0]
+    # Same wake each time, and the tracker only starts after the clean exit
+    assert len({awake for _at, awake, _code in supervisor.launches}) == 1
+    assert supervisor.tracker.commands.count("start") == 1
+
+
+def test_suspend_kills_a_tracker_stuck_on_a_command(tmp_path):
+    tracker = IdleTracker()
+    supervisor = make_supervisor(tmp_path, tracker=tracker, suspend_deadline=0.3)
+
+    async def scenario():
+        supervisor._tracker_lock = asyncio.Lock()
+        tracker.block()
+        busy = asyncio.ensure_future(supervisor.start_tracker())
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        outcome = await supervisor.suspend_tracker()
+        elapsed = time.monotonic() - started
+        await busy
+        return outcome, elapsed
+
+    outcome, elapsed = asyncio.run(scenario())
+    assert outcome == "killed"
+    assert tracker.killed
+    assert 0.3 <= elapsed < 0.8
+    assert "suspend" not in tracker.commands
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the hang is patched into the parent and inherited by a forked worker")
+def test_suspend_kills_a_worker_that_hangs_while_rotating(tmp_path, monkeypatch):
+    import file_tracker
+    from tracker_worker import TrackerWorker
+    from watch_roots import WatchRoot
+
+    monkeypatch.setattr(file_tracker.FileTracker, "suspend", lambda self: time.sleep(60))
+    (tmp_path / "profile").mkdir()
+    worker = TrackerWorker({"watch_roots": [WatchRoot(str(tmp_path / "profile"))],
+                            "state_path": str(tmp_path / "tracker.db")})
+    supervisor = make_supervisor(tmp_path, tracker=worker, suspend_deadline=0.5)
+
+    async def scenario():
+        supervisor._tracker_lock = asyncio.Lock()
+        await supervisor._tracker_call(worker.spawn)
+        await supervisor.start_tracker()
+        started = time.monotonic()
+        outcome = await supervisor.suspend_tracker()
+        return outcome, time.monotonic() - started
+
+    try:
+        outcome, elapsed = asyncio.run(scenario())
+        assert outcome == "killed"
+        assert elapsed < 1.5
+        assert not worker.alive()
+    finally:
+        worker.kill()
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="only a forked worker inherits the auth app's pipes")
+def test_startup_launch_while_the_worker_forks(tmp_path):
+    from tracker_worker import TrackerWorker
+    from watch_roots import WatchRoot
+
+    (tmp_path / "profile").mkdir()
+    worker = TrackerWorker({"watch_roots": [WatchRoot(str(tmp_path / "profile"))],
+                            "state_path": str(tmp_path / "tracker.db")})
+    # The startup wake launches the auth app as the worker is being forked
+    supervisor = make_supervisor(tmp_path, [(3.0, STOP)], tracker=worker)
+    # On a thread: a Popen stuck on an inherited pipe would block the loop for good
+    service = threading.Thread(target=asyncio.run, args=(supervisor.run(),), daemon=True)
+    try:
+        service.start()
+        service.join(10)
+        assert not service.is_alive()
+    finally:
+        worker.kill()
+    assert len(supervisor.launches) == 1
+    assert supervisor.tracker.spawns == 1
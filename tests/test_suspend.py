@@ -0,0 +1,66 @@
+import multiprocessing
+import time
+
+import pytest
+
+from challenge import load_recent_files
+from state_store import StateStore
+from tracker_worker import TrackerWorker
+from watch_roots import WatchRoot
+
+
+def test_suspend_rotates_the_session_before_sleep(tmp_path):
+    profile = tmp_path / "profile"
+    profile.mkdir()
+    state_path = str(tmp_path / "tracker.db")
+    worker = TrackerWorker({"watch_roots": [WatchRoot(str(profile))], "state_path": state_path})
+    try:
+        worker.spawn()
+        worker.start()
+        for name in ("main.py", "notes.txt", "report.docx"):
+            (profile / name).write_text("edited")
+        time.sleep(0.5)  # Let the observer deliver the events
+        assert worker.suspend(5.0) == "rotated"
+        # Still loaded: the next start needs no respawn
+        assert worker.alive()
+        worker.start()
+        assert worker.spawns == 1
+    finally:
+        worker.kill()
+    store = StateStore(state_path)
+    assert sorted(load_recent_files(store)) == ["main.py", "notes.txt", "report.docx"]
+    assert store.session_size("current_session") == 0
+
+
+def test_suspend_of_a_dead_worker_reports_killed(tmp_path):
+    worker = TrackerWorker({"watch_roots": [WatchRoot(str(tmp_path))], "state_path": str(tmp_path / "tracker.db")})
+    assert worker.suspend(1.0) == "killed"
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the delay is patched into the parent and inherited by a forked worker")
+def test_a_late_reply_is_never_read_as_the_next_one(tmp_path, monkeypatch):
+    import file_tracker
+
+    start = file_tracker.FileTracker.start
+    marker = tmp_path / "slow_once"
+
+    def slow_first_start(self):
+        if not marker.exists():
+            marker.write_text("")
+            time.sleep(1.0)
+        return start(self)
+
+    monkeypatch.setattr(file_tracker.FileTracker, "start", slow_first_start)
+    worker = TrackerWorker({"watch_roots": [WatchRoot(str(tmp_path))], "state_path": str(tmp_path / "tracker.db")},
+                           timeout=0.3)
+    try:
+        worker.spawn()
+        with pytest.raises(TimeoutError):
+            worker.start()
+        time.sleep(1.0)  # The "ready" arrives after the caller gave up
+        worker.start()
+        worker.stop()
+        assert worker.spawns == 2
+    finally:
+        worker.kill()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from file_tracker import FileMonitorHandler
+from state_store import open_user_store, profile_user, user_state_path
+from user_partitions import UserRouter
+
+
+@pytest.fixture
+def router(tmp_path):
+    router = UserRouter(FileMonitorHandler, str(tmp_path / "Users"), str(tmp_path / "users"))
+    yield router
+    for partition in router.partitions.values():
+        partition.journal.close()
+
+
+def test_events_go_to_the_profile_folder_user(tmp_path, router):
+    profiles = tmp_path / "Users"
+    router.process_batch([str(profiles / "Name.DOMAIN" / "work" / "main.py"),
+                          str(profiles / "other" / "notes.txt"),
+                          str(tmp_path / "elsewhere" / "report.txt")])
+    router.flush()
+    assert sorted(router.partitions) == ["Name.DOMAIN", "other"]
+    assert router.unrouted == 1
+    assert os.path.exists(user_state_path("Name.DOMAIN", str(tmp_path / "users")))
+
+
+def test_auth_side_finds_the_database_of_a_domain_profile(tmp_path, router, monkeypatch):
+    # The login name differs from the profile folder, as for domain profiles
+    monkeypatch.setenv("USERPROFILE", str(tmp_path / "Users" / "Name.DOMAIN"))
+    monkeypatch.setattr("getpass.getuser", lambda: "name")
+    router.process_batch([str(tmp_path / "Users" / "Name.DOMAIN" / "work" / "main.py")])
+    router.flush()
+
+    assert profile_user() == "Name.DOMAIN"
+    store = open_user_store(directory=str(tmp_path / "users"), partitioned=True)
+    assert store is not None
+    assert store.session_size("current_session") == 1
+    store.close()
+
+
+def test_console_session_owner_comes_before_userprofile(tmp_path, monkeypatch):
+    # Started by the service: USERPROFILE is the service account's profile
+    monkeypatch.setenv("USERPROFILE", str(tmp_path / "config" / "systemprofile"))
+    monkeypatch.setattr("state_store.session_profile_user", lambda: "Name.DOMAIN")
+    assert profile_user() == "Name.DOMAIN"
+    # No access to the session token: the app runs as the user
+    monkeypatch.setattr("state_store.session_profile_user", lambda: None)
+    assert profile_user() == "systemprofile"
+
+
+def test_missing_user_database_is_reported_when_partitioned(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("USERPROFILE", str(tmp_path / "Users" / "nobody"))
+    assert open_user_store(directory=str(tmp_path / "users")) is None
+    assert capsys.readouterr().out == ""
+    assert open_user_store(directory=str(tmp_path / "users"), partitioned=True) is None
+    assert "No session database" in capsys.readouterr().out
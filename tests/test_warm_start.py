@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+from challenge import load_recent_files
+from file_tracker import FileTracker
+from state_store import StateStore
+from warm_start import WarmStartScan
+from watch_roots import WatchRoot
+
+
+def write_files(directory, names, start):
+    os.makedirs(directory, exist_ok=True)
+    for i, name in enumerate(names):
+        path = os.path.join(directory, name)
+        with open(path, "w") as file:
+            file.write("x")
+        os.utime(path, (start + i, start + i))
+
+
+def test_scan_keeps_the_newest_tracked_files(tmp_path):
+    start = int(time.time()) - 1000
+    write_files(str(tmp_path / "a"), [f"old_{i}.py" for i in range(5)], start)
+    write_files(str(tmp_path / "a" / "b"), [f"new_{i}.txt" for i in range(5)], start + 100)
+    write_files(str(tmp_path / "b"), ["ignored.exe", "ignored.tmp"], start + 500)
+    found = WarmStartScan([WatchRoot(str(tmp_path))], workers=2, limit=3).run()
+    assert [os.path.basename(path) for _mtime, path in found[None]] == ["new_4.txt", "new_3.txt", "new_2.txt"]
+
+
+def test_fresh_install_is_seeded_from_the_scan(tmp_path):
+    profile = str(tmp_path / "profile")
+    write_files(profile, ["main.py", "notes.txt", "index.html", "style.css"], int(time.time()) - 100)
+    tracker = FileTracker(watch_roots=[WatchRoot(profile)], state_path=str(tmp_path / "state.db"), warm_start=True)
+    try:
+        tracker.start()
+        tracker.warm_thread.join(10)
+    finally:
+        tracker.close()
+    store = StateStore(str(tmp_path / "state.db"))
+    assert sorted(load_recent_files(store)) == ["index.html", "main.py", "notes.txt", "style.css"]
+    assert set(store.load_challenge()["correct"]) <= {"index.html", "main.py", "notes.txt", "style.css"}
+
+
+def test_history_imported_from_json_is_not_overwritten(tmp_path):
+    # An upgrade from the JSON state files: the imported session is real history
+    with open(tmp_path / "file_activity.json", "w") as file:
+        json.dump({"previous_session": {"report.docx":"2025-01-17T16:13:29"}, "current_session": {}}, file)
+    profile = str(tmp_path / "profile")
+    write_files(profile, ["main.py"], int(time.time()) - 100)
+    tracker = FileTracker(watch_roots=[WatchRoot(profile)], state_path=str(tmp_path / "state.db"), warm_start=True)
+    try:
+        assert not tracker.handler.needs_seed()
+        tracker.start()
+        tracker.warm_thread.join(10)
+    finally:
+        tracker.stop()
+        tracker.journal.close()
+    assert load_recent_files(StateStore(str(tmp_path / "state.db"))) == ["report.docx"]
+
+
+def test_scan_skips_directories_the_rules_exclude(tmp_path):
+    start = int(time.time()) - 1000
+    write_files(str(tmp_path / "src"), ["main.py"], start)
+    write_files(str(tmp_path / "build"), ["generated.py"], start + 100)
+    root = WatchRoot(str(tmp_path))
+    rules = {"allowed_extensions": [".py"], "excluded_dirs": [str(tmp_path / "build")], "junk_patterns": []}
+    root.matcher = root.compile(rules)
+    scan = WarmStartScan([root], workers=1)
+    found = scan.run()
+    assert [os.path.basename(path) for _mtime, path in found[None]] == ["main.py"]
+    # The root and src only: build was never listed
+    assert scan.dirs_scanned == 2
@@ -0,0 +1,161 @@
+import multiprocessing
+import threading
+import time
+
+START = "start"
+STOP = "stop"
+# Stop watching, rotate the session and flush it, ahead of sleep
+SUSPEND = "suspend"
+EXIT = "exit"
+# Held while the worker is forked and while the supervisor starts the auth app.
+# A fork copies every open descriptor, so a worker forked in the middle of a
+# Popen keeps that child's pipes open and Popen (or the reader) never returns.
+SPAWN_LOCK = threading.Lock()
+
+
+def worker_main(conn, options):
+    """Child process: build the tracker once, then obey commands from the pipe."""
+    # Imported here so the supervisor never pays for watchdog itself
+    from file_tracker import FileTracker
+    from metrics import start_exporter
+
+    tracker = FileTracker(**options)
+    exporter = start_exporter("tracker")
+    conn.send(("loaded", None))
+    while True:
+        try:
+            command = conn.recv()
+        except (EOFError, OSError):
+            # Supervisor went away; shut down cleanly instead of lingering
+            command = EXIT
+        try:
+            if command == START:
+                reply = ("ready", tracker.start())
+            elif command == STOP:
+                tracker.stop()
+                reply = ("stopped", None)
+            elif command == SUSPEND:
+                reply = ("suspended", tracker.suspend())
+            elif command == EXIT:
+                tracker.close()
+                reply = ("exited", None)
+            else:
+                reply = ("error", f"unknown command {command!r}")
+        except Exception as e:
+            reply = ("error", str(e))
+        try:
+            conn.send(reply)
+        except (BrokenPipeError, OSError):
+            pass
+        if command == EXIT:
+            exporter.stop()
+            return
+
+
+class TrackerWorker:
+    """Supervisor side of the warm tracker child process.
+
+    The child imports watchdog, loads the sessions and compiles the rules
+    once, at spawn(); start() and stop() then only add or release the
+    watches, so resume -> tracker ready is a pipe round trip plus observer
+    scheduling. A dead child is respawned on the next command.
+    """
+
+    def __init__(self, options=None, timeout=30.0):
+        self.options = options or {}
+        self.timeout = timeout
+        self.process = None
+        self.conn = None
+        self.running = False
+        self.spawns = 0
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def spawn(self):
+        """Start the child and wait until it has loaded; returns the seconds it took."""
+        started = time.perf_counter()
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_conn, self.options),
+                                               name="FileTracker", daemon=True)
+        with SPAWN_LOCK:
+            self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.running = False
+        self.spawns += 1
+        self._reply("loaded")
+        return time.perf_counter() - started
+
+    def _reply(self, expected, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        if not self.conn.poll(timeout):
+            # Its late answer would be read as the reply to the next command;
+            # killed, it is respawned on a clean pipe instead
+            self.kill()
+            raise TimeoutError(f"tracker worker did not answer within {timeout:g}s")
+        status, value = self.conn.recv()
+        if status != expected:
+            raise RuntimeError(f"tracker worker replied {status}: {value}")
+        return value
+
+    def command(self, name, expected):
+        if not self.alive():
+            if self.process is not None:
+                print(f"[Service] Tracker worker exited with code {self.process.exitcode}, respawning")
+            self.spawn()
+        self.conn.send(name)
+        return self._reply(expected)
+
+    def start(self):
+        """Begin watching; returns the round trip in seconds."""
+        started = time.perf_counter()
+        self.command(START, "ready")
+        self.running = True
+        return time.perf_counter() - started
+
+    def stop(self):
+        if not self.running or not self.alive():
+            self.running = False
+            return
+        self.command(STOP, "stopped")
+        self.running = False
+
+    def suspend(self, deadline):
+        """Have the child stop, rotate and flush within deadline seconds, or kill it.
+
+        Returns "rotated", or "killed" when the child missed the deadline or
+        the pipe broke; a killed child is respawned by the next command.
+        """
+        self.running = False
+        if not self.alive():
+            return "killed"
+        try:
+            self.conn.send(SUSPEND)
+            self._reply("suspended", deadline)
+            return "rotated"
+        except (OSError, EOFError, TimeoutError, RuntimeError) as e:
+            print(f"[Service] Tracker worker did not suspend in time, killing it: {e}")
+            self.kill()
+            return "killed"
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+            self.process.join()
+        self.running = False
+
+    def shutdown(self):
+        """Let the child close its journal, then make sure it is gone."""
+        if self.alive():
+            try:
+                self.conn.send(EXIT)
+                self._reply("exited")
+            except (OSError, EOFError, TimeoutError, RuntimeError) as e:
+                print(f"[Service] Tracker worker did not exit cleanly: {e}")
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.process = None
+        self.running = False
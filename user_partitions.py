@@ -0,0 +1,152 @@
+import os
+import threading
+from watchdog.events import FileSystemEventHandler
+from activity_journal import ActivityJournal, FSYNC_POLICIES
+from state_store import StateStore, USERS_DIR, user_state_path
+from watch_roots import normalize, with_sep
+from metrics import counter, gauge
+
+# Where user profiles live; a path's first component below it names its user
+PROFILES_DIR = os.path.join(os.environ.get("SystemDrive", "C:") + os.sep, "Users")
+
+USER_PARTITIONS = gauge("tracker_user_partitions", "Users with their own session store in this tracker")
+EVENTS_UNROUTED = counter("tracker_events_unrouted_total", "Event paths outside every user profile")
+
+
+class UserPartition:
+    """One user's sessions: its own database, journal, session stores and lock."""
+
+    def __init__(self, user, path, handler_class, roots=(), fsync_policy="compact", max_entries=None,
+                 handler_options=None):
+        self.user = user
+        store = StateStore(path, synchronous=FSYNC_POLICIES[fsync_policy])
+        self.journal = ActivityJournal(store, fsync=fsync_policy, max_entries=max_entries)
+        self.tracked_files = self.journal.load()
+        self.handler = handler_class(self.tracked_files, journal=self.journal, **(handler_options or {}))
+        if roots:
+            self.handler.set_roots(roots)
+        self.journal.start()
+
+
+class UserRouter(FileSystemEventHandler):
+    """Sends each event path to the partition of the user whose profile holds it.
+
+    One tracker process and one observer serve every session on the host,
+    and only one may run: a second tracker would write the same user
+    databases. The consumer thread only groups a batch by user. Filtering, recording
+    and the database writes then happen per partition, under that user's
+    lock and in that user's journal writer, so users never wait on each
+    other's state. Partitions are created on a user's first event.
+    Paths outside the profiles directory go to fallback_user, or are
+    dropped when it is None.
+    """
+
+    def __init__(self, handler_class, profiles_dir=PROFILES_DIR, directory=USERS_DIR,
+                 fsync_policy="compact", max_entries=None, fallback_user=None, event_queue=None,
+                 handler_options=None):
+        super().__init__()
+        self.handler_class = handler_class
+        # Extra keyword arguments for every partition's handler
+        self.handler_options = handler_options or {}
+        self.profiles_prefix = with_sep(normalize(profiles_dir))
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.max_entries = max_entries
+        self.fallback_user = fallback_user
+        self.event_queue = event_queue
+        self.partitions = {}
+        self.roots = []
+        self.rules = None
+        self._lock = threading.Lock()
+        self.unrouted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def set_roots(self, roots):
+        self.roots = list(roots)
+        for partition in list(self.partitions.values()):
+            partition.handler.set_roots(self.roots)
+
+    def apply_rules(self, rules):
+        # Under the lock so a partition created meanwhile cannot miss the change
+        with self._lock:
+            self.rules = rules
+            for partition in self.partitions.values():
+                partition.handler.apply_rules(rules)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.dispatch_path(event.src_path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.dispatch_path(event.src_path)
+
+    def dispatch_path(self, file_path):
+        if self.event_queue:
+            self.event_queue.put(file_path)
+        else:
+            self.process_batch([file_path])
+
+    def user_of(self, file_path):
+        key = normalize(file_path)
+        if not key.startswith(self.profiles_prefix):
+            return self.fallback_user
+        user, sep, rest = key[len(self.profiles_prefix):].partition(os.sep)
+        return user if sep else self.fallback_user
+
+    def partition(self, user):
+        partition = self.partitions.get(user)
+        if partition is None:
+            with self._lock:
+                partition = self.partitions.get(user)
+                if partition is None:
+                    partition = UserPartition(user, user_state_path(user, self.directory), self.handler_class,
+                                              self.roots, self.fsync_policy, self.max_entries,
+                                              self.handler_options)
+                    if self.rules is not None:
+                        partition.handler.apply_rules(self.rules)
+                    self.partitions[user] = partition
+                    USER_PARTITIONS.set(len(self.partitions))
+        return partition
+
+    def process_batch(self, file_paths):
+        by_user = {}
+        for file_path in file_paths:
+            by_user.setdefault(self.user_of(file_path), []).append(file_path)
+        unrouted = by_user.pop(None, None)
+        if unrouted:
+            self.unrouted += len(unrouted)
+            EVENTS_UNROUTED.inc(len(unrouted))
+        for user, paths in by_user.items():
+            self.partition(user).handler.process_batch(paths)
+
+    def needs_seed(self):
+        """True until some user has a database, so a fresh install is warm-started once."""
+        return not any(name.endswith(".db") for name in os.listdir(self.directory))
+
+    def seed(self, found):
+        """Hand each user's warm-start [(mtime, path)] to their partition; returns the files recorded."""
+        return sum(self.partition(user).handler.seed(files) for user, files in found.items() if user is not None)
+
+    def flush(self):
+        for partition in list(self.partitions.values()):
+            partition.journal.flush()
+
+    def rotate(self, transfer):
+        """Rotate each user's sessions with transfer(tracked_files, journal, lock) and checkpoint them."""
+        for partition in list(self.partitions.values()):
+            transfer(partition.tracked_files, partition.journal, partition.handler.lock)
+            partition.journal.compact()
+
+    def close(self, transfer):
+        """Rotate each user's sessions, then close their journals."""
+        self.rotate(transfer)
+        for partition in list(self.partitions.values()):
+            partition.journal.close()
+
+    def stats(self):
+        return {
+            user: {"files": len(partition.tracked_files.get("current_session", ())),
+                   "records": partition.journal.records_written}
+            for user, partition in list(self.partitions.items())
+        }
@@ -0,0 +1,168 @@
+import heapq
+import os
+import threading
+import time
+from watch_roots import normalize
+from metrics import counter, histogram
+
+WARM_START_BUDGET = 30.0
+WARM_START_DEPTH = 8
+# Most recently modified files kept per user (or overall)
+WARM_START_FILES = 200
+PROGRESS_INTERVAL = 5.0
+
+DIRS_SCANNED = counter("tracker_warm_start_dirs_total", "Directories listed by the warm-start scan")
+SCAN_SECONDS = histogram("tracker_warm_start_seconds", "Duration of one warm-start scan")
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class WarmStartScan:
+    """Parallel os.scandir walk over the watch roots for recently modified files.
+
+    Workers share one stack of (directory, depth, root) entries, so a deep
+    subtree is split across them as soon as its directories are listed.
+    Directories the root or the rules in force exclude are never entered,
+    and files pass the root's own matcher, the same rules the tracker
+    applies to events. The
+    walk stops at max_depth below a root, or when the time budget runs
+    out; whatever was found by then is kept. key (a path -> name function,
+    or None) keeps the newest `limit` files per name instead of overall.
+    """
+
+    def __init__(self, roots, workers=None, budget=WARM_START_BUDGET, max_depth=WARM_START_DEPTH,
+                 limit=WARM_START_FILES, key=None, progress_interval=PROGRESS_INTERVAL):
+        self.roots = list(roots)
+        self.workers = workers or default_workers()
+        self.budget = budget
+        self.max_depth = max_depth
+        self.limit = limit
+        self.key = key
+        self.progress_interval = progress_interval
+
+        self._stack = []
+        self._cond = threading.Condition()
+        self._active = 0
+        self._stopped = threading.Event()
+        self._deadline = None
+
+        self.dirs_scanned = 0
+        self.files_matched = 0
+        self.errors = 0
+        self.truncated = False
+        self.elapsed = 0.0
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self):
+        """Walk the roots; return {key: [(mtime, path)]} newest first."""
+        started = time.perf_counter()
+        self._deadline = time.monotonic() + self.budget
+        for root in self.roots:
+            excluded = {normalize(path) for path in root.exclude}
+            if normalize(root.path) not in excluded:
+                self._stack.append((root.path, 0, root, excluded))
+        results = [{} for _ in range(self.workers)]
+        threads = [threading.Thread(target=self._work, args=(found,), name=f"WarmStart-{i}", daemon=True)
+                   for i, found in enumerate(results)]
+        for thread in threads:
+            thread.start()
+        last_report = time.perf_counter()
+        while True:
+            alive = [thread for thread in threads if thread.is_alive()]
+            if not alive:
+                break
+            alive[0].join(0.1)
+            if time.perf_counter() - last_report >= self.progress_interval:
+                last_report = time.perf_counter()
+                self.report("progress", last_report - started)
+        self.elapsed = time.perf_counter() - started
+        SCAN_SECONDS.observe(self.elapsed)
+
+        merged = {}
+        for found in results:
+            for name, heap in found.items():
+                merged.setdefault(name, []).extend(heap)
+        return {name: heapq.nlargest(self.limit, heap) for name, heap in merged.items()}
+
+    def _next(self):
+        """Pop the next directory, waiting while others may still push some."""
+        with self._cond:
+            while True:
+                if self._stopped.is_set() or time.monotonic() >= self._deadline:
+                    if self._stack:
+                        self.truncated = True
+                    return None
+                if self._stack:
+                    self._active += 1
+                    return self._stack.pop()
+                if not self._active:
+                    # Nothing left and nobody listing: the walk is complete
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait(0.1)
+
+    def _work(self, found):
+        limit = self.limit
+        key = self.key
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            directory, depth, root, excluded = entry
+            subdirs = []
+            listed = matched = failed = 0
+            try:
+                with os.scandir(directory) as entries:
+                    for item in entries:
+                        try:
+                            if item.is_dir(follow_symlinks=False):
+                                if (depth < self.max_depth and normalize(item.path) not in excluded
+                                        and not root.matcher.is_excluded(item.path)):
+                                    subdirs.append((item.path, depth + 1, root, excluded))
+                            elif root.matcher.matches(item.path):
+                                mtime = item.stat(follow_symlinks=False).st_mtime
+                                heap = found.setdefault(key(item.path) if key else None, [])
+                                if len(heap) < limit:
+                                    heapq.heappush(heap, (mtime, item.path))
+                                elif mtime > heap[0][0]:
+                                    heapq.heapreplace(heap, (mtime, item.path))
+                                matched += 1
+                        except OSError:
+                            continue
+                listed = 1
+            except OSError:
+                failed = 1
+            with self._cond:
+                self._active -= 1
+                self._stack.extend(subdirs)
+                self.dirs_scanned += listed
+                self.files_matched += matched
+                self.errors += failed
+                # Wake idle workers for the new directories, or to see the walk is over
+                if subdirs or not self._active:
+                    self._cond.notify_all()
+            if listed:
+                DIRS_SCANNED.inc()
+
+    def stats(self):
+        return {
+            "dirs_scanned": self.dirs_scanned,
+            "files_matched": self.files_matched,
+            "errors": self.errors,
+            "truncated": self.truncated,
+            "elapsed": self.elapsed,
+            "dirs_per_sec": self.dirs_scanned / self.elapsed if self.elapsed else 0.0,
+            "workers": self.workers,
+        }
+
+    def report(self, label="done", elapsed=None):
+        elapsed = max(elapsed or self.elapsed, 1e-9)
+        print(f"Warm start {label}: {self.dirs_scanned} dirs, {self.files_matched} files matched "
+              f"in {elapsed:.1f}s ({self.dirs_scanned / elapsed:.0f} dirs/sec, {self.workers} workers)"
+              + (", time budget reached" if self.truncated else ""))
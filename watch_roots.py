@@ -0,0 +1,140 @@
+import os
+import time
+from watchdog.events import FileSystemEventHandler
+from path_filter import PathMatcher, DEFAULT_ALLOWED_EXTENSIONS, DEFAULT_EXCLUDED_DIRS, DEFAULT_JUNK_PATTERNS
+
+
+def normalize(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def with_sep(path):
+    return path if path.endswith(os.sep) else path + os.sep
+
+
+class WatchRoot:
+    """One watched directory with its own recursion flag and include/exclude rules.
+
+    polling=True watches the root with the incremental snapshot poller instead
+    of native change notification (network shares, removable drives).
+    adaptive=True samples it the same way but gives directories with
+    tracked activity a native watch of their own (see adaptive_watch.py).
+    """
+
+    def __init__(self, path, recursive=True, include=None, exclude=(), polling=False, poll_interval=30.0,
+                 adaptive=False):
+        self.path = path
+        self.recursive = recursive
+        self.polling = polling
+        self.adaptive = adaptive
+        self.poll_interval = poll_interval
+        # Roots without their own extensions follow the rules file
+        self.own_include = include is not None
+        self.include = list(include) if include is not None else list(DEFAULT_ALLOWED_EXTENSIONS)
+        self.exclude = list(exclude)
+        self.key = normalize(path)
+        self.matcher = self.compile()
+        self.events = 0
+        self.watches = []
+        self.planned_exclude = set()
+        self.started_at = None
+
+    def compile(self, rules=None):
+        """Matcher for this root under the given rules file contents, or the built-in rules."""
+        if rules is None:
+            return PathMatcher(self.include, self.exclude, DEFAULT_JUNK_PATTERNS)
+        include = self.include if self.own_include else rules["allowed_extensions"]
+        return PathMatcher(include, self.exclude + rules["excluded_dirs"], rules["junk_patterns"])
+
+    def contains(self, file_path):
+        return normalize(file_path).startswith(with_sep(self.key))
+
+    def event_rate(self):
+        if self.started_at is None:
+            return 0.0
+        return self.events / max(time.monotonic() - self.started_at, 1e-9)
+
+    def plan(self, rules=None):
+        """Return (path, recursive) watches covering the root minus its excluded subtrees.
+
+        rules is the rules file in force; its excluded_dirs are left out too.
+        """
+        excluded = self.exclude + (rules["excluded_dirs"] if rules else [])
+        self.planned_exclude = {normalize(path) for path in excluded}
+        self.watches = plan_watches(self.path, self.recursive, self.planned_exclude)
+        return self.watches
+
+
+def plan_watches(path, recursive, excluded):
+    key = normalize(path)
+    if key in excluded:
+        return []
+    if not recursive:
+        return [(path, False)]
+
+    prefix = with_sep(key)
+    nested = {e for e in excluded if e.startswith(prefix)}
+    if not nested:
+        return [(path, True)]
+
+    # Split the recursive watch: this level non-recursively, and each child on
+    # its own, so nothing below an excluded directory is ever scheduled.
+    watches = [(path, False)]
+    try:
+        with os.scandir(path) as entries:
+            children = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except OSError:
+        return watches
+    for child in children:
+        watches.extend(plan_watches(child, True, nested))
+    return watches
+
+
+def default_watch_roots(adaptive=False):
+    """Whole system drive, with the system trees never scheduled."""
+    return [WatchRoot("C:\\", recursive=True, exclude=DEFAULT_EXCLUDED_DIRS, adaptive=adaptive)]
+
+
+class ScopedEventHandler(FileSystemEventHandler):
+    """Per-root front of the tracker handler: counts events and fills gaps in split watches."""
+
+    def __init__(self, root, handler, observer):
+        super().__init__()
+        self.root = root
+        self.handler = handler
+        self.observer = observer
+        self.split_dirs = {normalize(path) for path, recursive in root.watches if not recursive}
+        self.excluded = root.planned_exclude
+
+    def on_modified(self, event):
+        self.root.events += 1
+        self.handler.on_modified(event)
+
+    def on_created(self, event):
+        self.root.events += 1
+        if event.is_directory and self.root.recursive:
+            # A directory created under a non-recursive split level would
+            # otherwise never be watched
+            key = normalize(event.src_path)
+            if os.path.dirname(key) in self.split_dirs and key not in self.excluded:
+                self.observer.schedule(self, event.src_path, recursive=True)
+        self.handler.on_created(event)
+
+
+def schedule_roots(observer, handler, roots, rules=None):
+    """Schedule every root's planned watches; returns the number of watches.
+
+    rules is the rules file in force, so its exclusions are not scheduled.
+    """
+    count = 0
+    for root in roots:
+        if root.polling or root.adaptive:
+            continue
+        root.plan(rules)
+        scoped = ScopedEventHandler(root, handler, observer)
+        for path, recursive in root.watches:
+            observer.schedule(scoped, path, recursive=recursive)
+            count += 1
+        root.started_at = time.monotonic()
+    handler.set_roots(roots)
+    return count